@@ -0,0 +1,356 @@
+"""
+מדידת ביצועים של הנתיבים החמים על ספריות מתכונים סינתטיות.
+
+לכל גודל (--sizes) נבנית בתיקייה זמנית ספרייה עם recipes.json / ingredients.json בפורמט של
+האפליקציה (שמות מתכונים ומצרכים בעברית, 3-12 שורות מצרכים למתכון), ואז נמדדים: טעינה,
+פענוח וחישוב תזונתי, חישוב מחדש של כל הספרייה, החיפוש והסינונים של לשונית ספר המתכונים,
+שאילתות טווח ו-top-k על הערכים התזונתיים, תכנון תפריט שבועי, רשימת קניות,
+שמירה וגיבוי.
+הפלט הוא JSON, כדי שאפשר יהיה להשוות בין קומיטים:
+
+    python benchmark.py --out bench_before.json
+    git checkout my-branch
+    python benchmark.py --out bench_after.json --compare bench_before.json
+
+מיליון מתכונים דורשים כמה GB זיכרון, ולכן הגודל הזה רק לפי בקשה (--sizes 1000000).
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import recipe_core
+from recipe_core import (
+    RECIPES_FILE, INGREDIENTS_FILE, CATEGORIES_FILE, DEFAULT_CATEGORIES, DEFAULT_INGREDIENTS,
+    load_json, save_json, write_json_array, parse_ingredients_list, calculate_nutrition,
+    recalc_all_recipes, new_recipe_id, build_search_index, search_recipes, build_category_index,
+    filter_by_categories, build_ingredient_index, filter_by_ingredients, build_recipe_summary,
+    build_macro_index, ids_to_mask, query_macros, plan_meals, build_shopping_list, create_backup_zip,
+)
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 3
+DEFAULT_SAMPLE = 1000
+DEFAULT_DB_SIZE = 400
+# יחס (זמן חדש / זמן בסיס) שמעליו מדידה מסומנת כנסיגה ב---compare
+DEFAULT_THRESHOLD = 1.2
+# זמן מינימלי להרצה אחת של מדידה. פעולה מהירה יותר נקראת בלולאה
+MIN_RUN_TIME = 0.05
+
+# --- חומרי גלם לנתונים הסינתטיים ---
+
+DISHES = [
+    "שקשוקה", "סלט", "פסטה", "מרק", "קציצות", "עוף בתנור", "אורז", "פשטידה", "חביתה", "מוקפץ",
+    "קערת", "טורטייה", "פיתה", "כריך", "עוגת", "פנקייק", "דייסת", "כדורי", "תבשיל", "סטייק",
+    "לזניה", "ריזוטו", "מג'דרה", "חומוס", "שניצל", "פלאפל", "קוסקוס", "בורקס", "מאפין", "שייק",
+]
+MODIFIERS = [
+    "ירוקה", "חריפה", "ביתית", "של סבתא", "ים תיכונית", "עם ירקות", "עם טחינה", "קלה", "חלבונית",
+    "מהירה", "בתנור", "על האש", "בסגנון תאילנדי", "טבעונית", "עם פטריות", "בלי גלוטן", "לילדים",
+    "עם גבינה", "מתובלת", "בקרם קוקוס", "עם עדשים", "בלימון ושום", "צלויה", "מעושנת",
+]
+FOODS = [
+    "חזה עוף", "שוק עוף", "בשר טחון", "סלמון", "טונה", "טופו", "ביצה", "קוטג'", "גבינה צהובה",
+    "גבינה לבנה", "יוגורט", "חלב", "אורז", "פסטה", "קינואה", "בורגול", "שיבולת שועל", "קמח",
+    "לחם", "פיתה", "תפוח אדמה", "בטטה", "גזר", "בצל", "שום", "עגבניה", "מלפפון", "פלפל אדום",
+    "קישוא", "חציל", "ברוקולי", "כרובית", "תרד", "פטריות", "עדשים", "חומוס", "שעועית", "אפונה",
+    "תירס", "אבוקדו", "בננה", "תפוח", "תמרים", "אגוזי מלך", "שקדים", "טחינה", "שמן זית",
+    "חמאה", "סוכר", "דבש", "רסק עגבניות", "חלב קוקוס", "פטרוזיליה", "כוסברה", "לימון",
+]
+VARIANTS = [
+    "", " (מבושל)", " (לפני בישול)", " אורגני", " קפוא",
+    " מלא", " דל שומן", " טרי", " קלוי", " משומר",
+]
+STEPS = [
+    "מחממים תנור ל-180 מעלות.", "קוצצים את הירקות דק.", "מטגנים את הבצל עד הזהבה.",
+    "מוסיפים את התבלינים ומערבבים היטב.", "מבשלים על אש קטנה כ-20 דקות.", "מעבירים לתבנית משומנת.",
+    "אופים עד שהחלק העליון משחים.", "מתבלים במלח ופלפל לפי הטעם.", "מגישים חם עם עשבי תיבול.",
+    "משרים את הקטניות במים למשך הלילה.", "טוחנים הכל בבלנדר למרקם חלק.", "מצננים ומגישים.",
+]
+EMOJIS = ["🥗", "🍲", "🍝", "🍳", "🥘", "🍛", "🥙", "🍚", "🥞", "🍰"]
+UNIT_AMOUNTS = {"גרם": (20, 400), "מ''ל": (50, 500), "כף": (1, 4), "כפית": (1, 3), "יחידה": (1, 4)}
+
+# שאילתות לחיפוש בלשונית 1: מילה שלמה, תחילית, שתי מילים, ומילה שלא קיימת
+SEARCH_QUERIES = ["סלט", "עוף", "פסטה עגב", "חרי", "קציצות של סבתא", "אין כזה מתכון"]
+
+
+def generate_ingredients_db(rng, size):
+    """מאגר מצרכים: מצרכי ברירת המחדל ועוד צירופי מצרך + וריאנט עד size מצרכים."""
+    db = {name: {"vals": list(d["vals"]), "measure_type": d["measure_type"]}
+          for name, d in DEFAULT_INGREDIENTS.items()}
+    for variant in VARIANTS:
+        for food in FOODS:
+            if len(db) >= size:
+                return db
+            protein, carbs, fats = rng.uniform(0, 30), rng.uniform(0, 80), rng.uniform(0, 40)
+            unit = food in ("ביצה", "פיתה", "תפוח", "בננה", "לימון")
+            calories = round(protein * 4 + carbs * 4 + fats * 9)
+            db[f"{food}{variant}"] = {
+                "vals": [calories, round(protein, 1), round(carbs, 1), round(fats, 1)],
+                "measure_type": "unit" if unit else "100g",
+            }
+    return db
+
+
+def generate_recipe(rng, ingredient_names, unit_names, categories):
+    """מתכון סינתטי בפורמט השמור (מצרכים מפורקים, מזהה קבוע). הערכים התזונתיים מחושבים בנפרד."""
+    ingredients = []
+    for name in rng.sample(ingredient_names, rng.randint(3, 12)):
+        if name in unit_names:
+            unit = "יחידה"
+        else:
+            unit = rng.choice(["גרם", "גרם", "גרם", "מ''ל", "כף", "כפית"])
+        low, high = UNIT_AMOUNTS[unit]
+        amount = float(rng.randint(low, high)) if unit != "גרם" else float(rng.randrange(low, high, 10))
+        ingredients.append({"ingredient": name, "amount": amount, "unit": unit})
+    return {
+        "id": new_recipe_id(),
+        "name": f"{rng.choice(DISHES)} {rng.choice(MODIFIERS)}",
+        "image": rng.choice(EMOJIS),
+        "category": rng.choice(categories),
+        "calories": 0, "protein": 0, "carbs": 0, "fats": 0,
+        "ingredients": ingredients,
+        "instructions": " ".join(rng.sample(STEPS, rng.randint(2, 5))),
+    }
+
+
+def generate_library(path, size, seed, db_size):
+    """כותב ספרייה סינתטית לתיקייה path. המתכונים נכתבים בזרימה, בלי להחזיק את כולם בזיכרון."""
+    rng = random.Random(seed)
+    db = generate_ingredients_db(rng, db_size)
+    ingredient_names = list(db)
+    unit_names = {name for name, d in db.items() if d["measure_type"] == "unit"}
+    with contextlib.chdir(path):
+        save_json(INGREDIENTS_FILE, db)
+        save_json(CATEGORIES_FILE, DEFAULT_CATEGORIES)
+        write_json_array(RECIPES_FILE, (generate_recipe(rng, ingredient_names, unit_names, DEFAULT_CATEGORIES)
+                                        for _ in range(size)))
+    return db
+
+
+def measure(func, repeat, setup=None):
+    """
+    מריץ func כמה פעמים ומחזיר (זמנים לקריאה בשניות, מספר קריאות בכל הרצה, התוצאה האחרונה).
+    פעולה מהירה נקראת כמה פעמים בכל הרצה (כמו timeit), כדי שהרעש של המדידה לא יבלע אותה.
+    setup רץ לפני כל הרצה ולא נמדד, ואז יש קריאה אחת בכל הרצה.
+    """
+    loops = 1
+    if setup is None:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        while elapsed * loops < MIN_RUN_TIME and loops < 10000:
+            loops *= 10
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(loops):
+            result = func()
+        runs.append((time.perf_counter() - start) / loops)
+    return runs, loops, result
+
+
+def clear_backup_cache():
+    with recipe_core._BACKUP_CACHE_LOCK:
+        for _, path in recipe_core._BACKUP_CACHE.values():
+            with contextlib.suppress(OSError):
+                os.remove(path)
+        recipe_core._BACKUP_CACHE.clear()
+
+
+def run_size(path, size, repeat, sample_size, selected):
+    """מריץ את כל המדידות על הספרייה שבתיקייה path. מחזיר רשימת תוצאות."""
+    results = []
+
+    def bench(name, func, items, setup=None):
+        if selected and name not in selected:
+            return None
+        runs, loops, result = measure(func, repeat, setup)
+        results.append({
+            "size": size, "bench": name, "items": items, "loops": loops,
+            "min_s": min(runs), "median_s": statistics.median(runs), "runs": runs,
+        })
+        print(f"  {name:<28} {min(runs) * 1000:10.2f} ms", file=sys.stderr, flush=True)
+        return result
+
+    with contextlib.chdir(path):
+        recipes = load_json(RECIPES_FILE, [])
+        ingredients_db = load_json(INGREDIENTS_FILE, {})
+        # הספרייה נוצרת בלי ערכים תזונתיים - מחשבים פעם אחת (בלי למדוד)
+        # כדי שהסינונים והתכנון יעבדו על ערכים אמיתיים
+        recalc_all_recipes(recipes, ingredients_db)
+        bench("load_json", lambda: load_json(RECIPES_FILE, []), size)
+
+        # פונקציות ברמת מתכון בודד נמדדות על מדגם קבוע, כדי שהזמן יהיה בר השוואה בין הגדלים
+        sample = recipes[:sample_size]
+        bench("parse_ingredients_list", lambda: [parse_ingredients_list(r['ingredients']) for r in sample],
+              len(sample))
+        tables = [parse_ingredients_list(r['ingredients']) for r in sample]
+        bench("calculate_nutrition", lambda: [calculate_nutrition(t, ingredients_db) for t in tables], len(sample))
+        bench("recalc_all_recipes", lambda: recalc_all_recipes(recipes, ingredients_db), size)
+
+        # לשונית 1: בניית האינדקסים (ברינדור הראשון) ואז השאילתות עצמן
+        search_index = bench("build_search_index", lambda: build_search_index(recipes), size)
+        search_index = search_index or build_search_index(recipes)
+        bench("search", lambda: [search_recipes(search_index, q) for q in SEARCH_QUERIES], len(SEARCH_QUERIES))
+
+        category_index = bench("build_category_index", lambda: build_category_index(recipes), size)
+        category_index = category_index or build_category_index(recipes)
+        category_queries = [DEFAULT_CATEGORIES[:1], DEFAULT_CATEGORIES[:2]]
+        bench("category_filter", lambda: [filter_by_categories(category_index, cats) for cats in category_queries],
+              len(category_queries))
+
+        ingredient_index = bench("build_ingredient_index", lambda: build_ingredient_index(recipes), size)
+        ingredient_index = ingredient_index or build_ingredient_index(recipes)
+        # המצרכים הנפוצים ביותר, כדי שהחיתוך יעבוד על רשימות ארוכות
+        common = sorted(ingredient_index, key=lambda name: len(ingredient_index[name]), reverse=True)[:3]
+        ingredient_queries = [common[:1], common[:2], common[:3]]
+        bench("ingredient_filter",
+              lambda: [filter_by_ingredients(ingredient_index, ings) for ings in ingredient_queries],
+              len(ingredient_queries))
+
+        def combined():
+            # אותו סדר כמו filter_recipe_ids באפליקציה: חיפוש, קטגוריה, מצרכים
+            result = search_recipes(search_index, "סלט")
+            result = filter_by_categories(category_index, DEFAULT_CATEGORIES[:2], result)
+            return filter_by_ingredients(ingredient_index, common[:1], result)
+        bench("combined_filter", combined, 1)
+        summary = bench("build_recipe_summary", lambda: build_recipe_summary(recipes), size)
+        summary = summary if summary is not None else build_recipe_summary(recipes)
+        macro_index = bench("build_macro_index", lambda: build_macro_index(summary), size)
+        macro_index = macro_index or build_macro_index(summary)
+        # "חלבון >= 30, קלוריות <= 500" ואז top 20 לפי חלבון לקלוריה, גם בשילוב עם סינון קטגוריה
+        macro_ranges = {"protein": (30, None), "calories": (None, 500)}
+        bench("macro_range", lambda: query_macros(macro_index, macro_ranges), size)
+        bench("macro_top_k", lambda: query_macros(macro_index, macro_ranges, "protein_density", 20), 20)
+        category_ids = filter_by_categories(category_index, DEFAULT_CATEGORIES[:1])
+        bench("macro_top_k_filtered",
+              lambda: query_macros(macro_index, {}, "protein_density", 20,
+                                   mask=ids_to_mask(macro_index, category_ids)),
+              20)
+        daily_targets = {"calories": 2000, "protein": 150, "carbs": 200, "fats": 65}
+        bench("meal_plan", lambda: plan_meals(summary, daily_targets, DEFAULT_CATEGORIES, 7), 7)
+        shopping_items = [(recipe, 1.5) for recipe in recipes[:500]]
+        bench("shopping_list", lambda: build_shopping_list(shopping_items, ingredients_db), len(shopping_items))
+
+        bench("save_json", lambda: save_json(RECIPES_FILE, recipes), size)
+        # גיבוי "קר" (הקבצים השתנו) וגיבוי מהמטמון (אותה חתימה)
+        bench("create_backup_zip", lambda: create_backup_zip().close(), size, setup=clear_backup_cache)
+        bench("create_backup_zip_cached", lambda: create_backup_zip().close(), size)
+        clear_backup_cache()
+    return results
+
+
+def git_commit():
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip()
+    return None
+
+
+def compare(results, baseline, threshold):
+    """משווה לקובץ תוצאות קודם (לפי גודל + מדידה, זמן מינימלי). מחזיר את מספר הנסיגות."""
+    base = {(r["size"], r["bench"]): r["min_s"] for r in baseline["results"]}
+    regressions = 0
+    print(f"\n{'size':>8} {'bench':<28} {'base ms':>10} {'new ms':>10} {'ratio':>7}", file=sys.stderr)
+    for r in results:
+        old = base.get((r["size"], r["bench"]))
+        if not old:
+            continue
+        ratio = r["min_s"] / old
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  <-- נסיגה"
+        print(f"{r['size']:>8} {r['bench']:<28} {old * 1000:10.2f} {r['min_s'] * 1000:10.2f} {ratio:7.2f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="מדידת ביצועים על ספריות מתכונים סינתטיות")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="גדלי ספרייה מופרדים בפסיקים (ברירת מחדל: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="הרצות לכל מדידה (נשמר המינימום והחציון)")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE,
+                        help="מספר המתכונים למדידות ברמת מתכון בודד (parse / calculate_nutrition)")
+    parser.add_argument("--db-size", type=int, default=DEFAULT_DB_SIZE,
+                        help="מספר המצרכים במאגר הסינתטי")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default="", help="רק המדידות האלה (שמות מופרדים בפסיקים)")
+    parser.add_argument("--data-dir", default=None,
+                        help="לשמור את הספריות שנוצרו כאן במקום בתיקייה זמנית")
+    parser.add_argument("--out", default="-", help="קובץ JSON לתוצאות (ברירת מחדל: הפלט הרגיל)")
+    parser.add_argument("--compare", default=None, help="קובץ תוצאות קודם להשוואה")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="יחס זמנים שמעליו מדידה נחשבת נסיגה (ברירת מחדל: %(default)s)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    selected = {s.strip() for s in args.only.split(",") if s.strip()}
+    root = args.data_dir or tempfile.mkdtemp(prefix="recipe_bench_")
+    results = []
+    try:
+        for size in sizes:
+            path = os.path.join(root, str(size))
+            os.makedirs(path, exist_ok=True)
+            print(f"[{size}] יוצר ספרייה סינתטית...", file=sys.stderr, flush=True)
+            start = time.perf_counter()
+            generate_library(path, size, args.seed, args.db_size)
+            print(f"[{size}] נוצרה ב-{time.perf_counter() - start:.1f} שניות", file=sys.stderr, flush=True)
+            results.extend(run_size(path, size, args.repeat, args.sample, selected))
+            gc.collect()
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {"sizes": sizes, "repeat": args.repeat, "sample": args.sample,
+                     "db_size": args.db_size, "seed": args.seed},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=4)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,40 @@
-import streamlit as st
-import pandas as pd
-import json
 import os
-import io
-import zipfile
+from collections import OrderedDict
+from datetime import datetime
 
-try:
-    from recipe_scrapers import scrape_me
+import pandas as pd
+import streamlit as st
 
-    HAS_SCRAPER = True
-except ImportError:
-    HAS_SCRAPER = False
+from recipe_core import (
+    # קבצים והגדרות
+    RECIPES_FILE, INGREDIENTS_FILE, CATEGORIES_FILE, TRASH_FILE, STORAGE_BACKEND,
+    DEFAULT_CATEGORIES, DEFAULT_INGREDIENTS, ALLOWED_UNITS,
+    TRASH_RETENTION_DAYS, TRASH_MAX_ITEMS,
+    # אחסון
+    DataFileError, DataStore, get_sqlite_store,
+    new_recipe_id, trash_expired, trash_order,
+    # מצרכים וערכים תזונתיים
+    build_ingredient_matcher, parse_imported_ingredients,
+    format_ingredient, parse_ingredients_list, ingredients_frame,
+    calculate_nutrition, recalc_all_recipes,
+    diff_ingredients_db, ingredient_edits, recipes_using,
+    rename_recipe_ingredients, category_edits,
+    # חיפוש וסינון
+    search_recipes, filter_by_categories, filter_by_ingredients, ids_to_mask,
+    recipe_fingerprint, build_recipe_summary,
+    MACRO_FIELDS, MACRO_KEYS, build_macro_index, macro_bounds, query_macros,
+    # תכנון, רשימת קניות וגיבוי
+    plan_meals, build_shopping_list, shopping_list_csv, shopping_list_text,
+    create_backup_zip,
+)
+from recipe_importer import HAS_SCRAPER, ImportCache, import_one, import_urls, read_url_list
+from recipe_metrics import DISABLED, METRICS_LOG, PROFILE_ENV, RerunProfiler, profile_mode, read_metrics_log
+from sqlite_store import MACRO_COLUMNS as SQLITE_MACRO_COLUMNS
 
 # ==========================================
 # 1. הגדרות וקבועים
 # ==========================================
 
-RECIPES_FILE = "recipes.json"
-INGREDIENTS_FILE = "ingredients.json"
-CATEGORIES_FILE = "categories.json"
-TRASH_FILE = "trash.json"
-
 FOOD_EMOJIS = [
     "🥘", "🥗", "🍲", "🥣", "🍝", "🍜", "🥩", "🍗", "🍖", "🍔", "🍕", "🥪", "🌮", "🌯",
     "🥙", "🥚", "🍳", "🍞", "🥯", "🥞", "🧇", "🧀", "🍟", "🌭", "🧂", "🥫", "🍱", "🍘",
@@ -30,123 +44,429 @@ FOOD_EMOJIS = [
     "🥤", "🧃", "🍺", "🍷", "🍹", "🥂", "🥃"
 ]
 
-WEIGHT_CONVERTER = {
-    "גרם": 1, "מ''ל": 1, "כף": 15, "כפית": 5
+# ייבוא מקישורים: כמה הורדות במקביל, זמן קצוב לכל בקשה, ומטמון הדפים שכבר יובאו
+IMPORT_WORKERS = 4
+IMPORT_TIMEOUT = 10
+IMPORT_CACHE_DIR = "import_cache"
+IMPORT_CACHE_TTL = 7 * 24 * 3600
+IMPORT_CACHE_ENTRIES = 500
+
+# כמה מתכונים מוצגים בכל קטגוריה בספר המתכונים לפני "טען עוד"
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+DEFAULT_PAGE_SIZE = 20
+
+# כמה מתכונים מוצגים בכל עמוד של פח האשפה
+TRASH_PAGE_SIZE = 20
+
+# מטמוני הסשן: גופי מתכונים פתוחים ותוצאות סינון
+RECIPE_BODY_CACHE_SIZE = 64
+FILTER_CACHE_SIZE = 16
+
+# סינון ומיון לפי ערכים תזונתיים בספר המתכונים
+MACRO_LABELS = {
+    "calories": "🔥 קלוריות",
+    "protein": "🥩 חלבון (גר')",
+    "carbs": "🍞 פחמימה (גר')",
+    "fats": "🥑 שומן (גר')",
+    "protein_density": "💪 חלבון ל-100 קל' (גר')",
+    "carb_share": "🍞 % מהקלוריות מפחמימה",
+    "fat_share": "🥑 % מהקלוריות משומן",
 }
+RANGE_SLIDER_KEYS = MACRO_FIELDS + ["protein_density"]
 
-# תוקן: "כפפית" הוחלף ב- "כפית"
-ALLOWED_UNITS = ["גרם", "מ''ל", "כף", "כפית", "יחידה"]
-
-DEFAULT_CATEGORIES = ["בוקר", "צהריים", "ערב", "נשנוש"]
-
-DEFAULT_INGREDIENTS = {
-    "חזה עוף (חי)": {"vals": [110, 23, 0, 2], "measure_type": "100g"},
-    "אורז בסמטי (לפני בישול)": {"vals": [356, 7, 80, 0.6], "measure_type": "100g"},
-    "שמן זית": {"vals": [882, 0, 0, 98], "measure_type": "100g"},
-    "ביצה (L)": {"vals": [86, 7.5, 0.6, 6], "measure_type": "unit"},
-    "לחם מלא (פרוסה)": {"vals": [87, 3, 15, 1], "measure_type": "unit"},
-    "מלפפון": {"vals": [15, 0.7, 3.6, 0.1], "measure_type": "100g"},
-    "עגבניה": {"vals": [18, 0.9, 3.9, 0.2], "measure_type": "100g"},
-    "טונה במים (מסונן)": {"vals": [116, 26, 0, 1], "measure_type": "100g"},
-    "שיבולת שועל": {"vals": [389, 16.9, 66, 6.9], "measure_type": "100g"},
-    "קוטג' 5% (גביע)": {"vals": [240, 27.5, 3.75, 12.5], "measure_type": "unit"},
-}
+# יעדים יומיים התחלתיים בתכנון הארוחות
+DEFAULT_DAILY_TARGETS = {"calories": 2000, "protein": 150, "carbs": 200, "fats": 65}
+
+# לוח המדידות למפתחים: כמה ריצות אחרונות מהיומן נכנסות לממוצע
+METRICS_HISTORY = 200
 
 
 # ==========================================
 # 2. פונקציות עזר
 # ==========================================
 
-def load_json(filename, default_data):
-    if not os.path.exists(filename):
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(default_data, f, ensure_ascii=False, indent=4)
-        return default_data
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if filename == INGREDIENTS_FILE:
-                for key, val in data.items():
-                    if len(val["vals"]) == 2: val["vals"].extend([0, 0])
-                    if "measure_type" not in val: val["measure_type"] = "100g"
-            return data
-    except:
-        return default_data
-
-
-def save_json(filename, data):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-
-def parse_ingredients_list(ingredients_text_list):
-    parsed_data = []
-    for ing_str in ingredients_text_list:
-        try:
-            parts = ing_str.split(' ', 2)
-            if len(parts) >= 3:
-                parsed_data.append({
-                    "שם המצרך": parts[2],
-                    "כמות": float(parts[0]),
-                    "יחידה": parts[1]
-                })
-            else:
-                parsed_data.append({"שם המצרך": ing_str, "כמות": 1.0, "יחידה": "יחידה"})
-        except:
-            pass
-    return pd.DataFrame(parsed_data)
-
-
-def calculate_nutrition(df_ingredients, ingredients_db):
-    total = {"pro": 0, "carb": 0, "fat": 0}
-    if df_ingredients.empty: return {"cal": 0, "pro": 0, "carb": 0, "fat": 0}
-
-    for _, row in df_ingredients.iterrows():
-        name = row["שם המצרך"]
-        amount = row["כמות"]
-        unit = row["יחידה"]
-
-        if name in ingredients_db and amount > 0:
-            db_item = ingredients_db[name]
-            measure_type = db_item.get("measure_type", "100g")
-            vals = db_item["vals"]
-            ratio = 0
-
-            if measure_type == "unit":
-                if unit == "יחידה":
-                    ratio = amount
-                else:
-                    ratio = 0
-            else:
-                # משתמש ב- WEIGHT_CONVERTER
-                weight_in_grams = amount * WEIGHT_CONVERTER.get(unit, 1)
-                ratio = weight_in_grams / 100
+def recipe_records():
+    """
+    הרשימה המשותפת של המתכונים (RecordList), עם המיקומים והאינדקסים שלה - אחת לכל התהליך,
+    לא לכל סשן. רק בתוך get_data_store().locked().
+    """
+    return get_data_store().records(RECIPES_FILE)
+
+
+def shared_index(records, name):
+    # נבנה פעם אחת לכל התהליך ומתעדכן בכל שינוי, גם כשסשן אחר שומר
+    if not records.has_index(name):
+        with profiler.phase(f"index.{name}", rows=len(records)):
+            return records.index(name)
+    return records.index(name)
+
+
+def get_recipe(recipe_id):
+    """המתכון לפי מזהה, או None אם סשן אחר מחק אותו בינתיים."""
+    with get_data_store().locked():
+        return recipe_records().get(recipe_id)
+
+
+def get_recipe_names():
+    """מזהה -> שם לכל המתכונים, לתיבות הבחירה. נבנה מחדש רק אחרי שינוי ברשימה."""
+    with get_data_store().locked():
+        return recipe_records().derived("names", lambda items: {r['id']: r['name'] for r in items})
+
+
+def find_duplicate_recipes(recipe):
+    """מזהי המתכונים הקיימים שנראים כמו recipe (חוץ ממנו עצמו), בלי לסרוק את כל הספרייה."""
+    with get_data_store().locked():
+        matches = shared_index(recipe_records(), "fingerprint").get(recipe_fingerprint(recipe), set())
+        return matches - {recipe.get('id')}
+
+
+def filter_recipe_ids(search_query, categories, ingredients, ranges=None):
+    """
+    מחזיר את מזהי המתכונים שעוברים את כל המסננים (None = אין סינון).
+    חיפוש חופשי AND (אחת מהקטגוריות) AND (כל המצרכים - התאמה מדויקת לשם המצרך).
+    ranges - טווחי {עמודה: (מינימום, מקסימום)} על עמודות המאקרו של SQLite, רק במצב sqlite.
+    """
+    result = None
+    store = get_data_store()
+    if search_query:
+        with store.locked():
+            search_index = shared_index(recipe_records(), "search")
+            with profiler.phase("filter.search") as ph:
+                result = search_recipes(search_index, search_query)
+                ph.set_rows(len(result))
+    if STORAGE_BACKEND == "sqlite" and (categories or ingredients or ranges):
+        # קטגוריות, מצרכים וטווחי מאקרו מסוננים בשאילתת SQL על העמודות המאונדקסות
+        with profiler.phase("filter.sqlite") as ph:
+            pushed = set(get_sqlite_store().query_recipe_ids(categories, ingredients, ranges))
+            ph.set_rows(len(pushed))
+        return pushed if result is None else result & pushed
+    if categories:
+        with store.locked():
+            category_index = shared_index(recipe_records(), "category")
+            with profiler.phase("filter.category") as ph:
+                result = filter_by_categories(category_index, categories, result)
+                ph.set_rows(len(result))
+    if ingredients:
+        with store.locked():
+            ingredient_index = shared_index(recipe_records(), "ingredients")
+            with profiler.phase("filter.ingredients") as ph:
+                result = filter_by_ingredients(ingredient_index, ingredients, result)
+                ph.set_rows(len(result))
+    return result
+
+
+def track_versions(new_versions):
+    """הגרסאות של המתכונים והפח אחרי שינוי של הסשן עצמו, כך שהריצה הבאה לא תחשוב שהם השתנו מבחוץ."""
+    versions = st.session_state.setdefault('data_versions', {})
+    for key in ('recipes', 'trash'):
+        versions[key] = new_versions[DATA_FILES[key][0]]
+
+
+def add_recipes(recipes):
+    with profiler.phase("save.journal.add", rows=len(recipes)):
+        _, new_versions = get_data_store().add_recipes(recipes)
+    track_versions(new_versions)
+
+
+def update_recipes(recipes):
+    with profiler.phase("save.journal.update", rows=len(recipes)):
+        updated, new_versions = get_data_store().update_recipes(recipes)
+    track_versions(new_versions)
+    return updated
+
+
+def move_to_trash(recipe_id):
+    with profiler.phase("save.journal.delete", rows=1):
+        _, new_versions = get_data_store().trash_recipes([recipe_id])
+    track_versions(new_versions)
+
+
+def restore_from_trash(recipe_ids):
+    with profiler.phase("save.journal.restore", rows=len(recipe_ids)):
+        _, new_versions = get_data_store().restore_recipes(recipe_ids)
+    track_versions(new_versions)
+
+
+def purge_from_trash(recipe_ids):
+    with profiler.phase("save.journal.purge", rows=len(recipe_ids)):
+        _, new_versions = get_data_store().purge_recipes(recipe_ids)
+    track_versions(new_versions)
+
+
+def enforce_trash_retention():
+    """מוחק סופית מתכונים שפג תוקפם בפח. נבדק פעם אחת לכל גרסה של הפח (וכשהסשן נפתח)."""
+    versions = st.session_state.setdefault('data_versions', {})
+    if st.session_state.get('trash_retention_checked') == versions.get('trash'):
+        return
+    max_age = TRASH_RETENTION_DAYS * 24 * 3600 if TRASH_RETENTION_DAYS is not None else None
+    with get_data_store().locked():
+        expired = trash_expired(get_data_store().records(TRASH_FILE).items, max_age, TRASH_MAX_ITEMS)
+    if expired:
+        purge_from_trash(expired)
+    st.session_state['trash_retention_checked'] = versions.get('trash')
+
+
+def get_trash_view():
+    """טבלת הפח לתצוגה, מהחדש לישן. נבנית מחדש רק כשגרסת הפח משתנה."""
+    version = st.session_state.get('data_versions', {}).get('trash')
+    cached = st.session_state.get('trash_view')
+    if cached is None or cached[0] != version:
+        with get_data_store().locked():
+            trash = list(get_data_store().records(TRASH_FILE).items)
+        stamps = [r.get('deleted_at') or 0 for r in trash]
+        order = trash_order(stamps)
+        view = pd.DataFrame({
+            "id": [trash[pos]['id'] for pos in order],
+            "מתכון": [f"{trash[pos].get('image', '')} {trash[pos].get('name', '')}" for pos in order],
+            "קלוריות": [int(trash[pos].get('calories') or 0) for pos in order],
+            "נמחק": [datetime.fromtimestamp(stamps[pos]).strftime("%d/%m/%Y %H:%M") if stamps[pos] else "-"
+                     for pos in order],
+        })
+        cached = (version, view)
+        st.session_state['trash_view'] = cached
+    return cached[1]
+
+
+def get_ingredients_editor():
+    """טבלת העריכה של המצרכים ושמות השורות שלה. נבנית מחדש רק כשגרסת מאגר המצרכים משתנה."""
+    version = st.session_state.get('data_versions', {}).get('ingredients_db')
+    cached = st.session_state.get('ingredients_editor')
+    if cached is None or cached[0] != version:
+        db = st.session_state['ingredients_db']
+        cached = (version, ingredients_frame(db), list(db))
+        st.session_state['ingredients_editor'] = cached
+    return cached[1], cached[2]
+
+
+def get_categories_editor():
+    """טבלת העריכה של הקטגוריות ורשימת הקטגוריות שהיא מציגה, לפי גרסת הקטגוריות."""
+    version = st.session_state.get('data_versions', {}).get('categories')
+    cached = st.session_state.get('categories_editor')
+    if cached is None or cached[0] != version:
+        categories = list(st.session_state['categories'])
+        cached = (version, pd.DataFrame({"קטגוריה": categories}), categories)
+        st.session_state['categories_editor'] = cached
+    return cached[1], cached[2]
+
+
+def save_ingredient_edits(delta):
+    """
+    מחיל על מאגר המצרכים רק את השינויים מהטבלה, ושומר רק אותם.
+    שם מצרך ששונה מתעדכן במתכונים שמשתמשים בו (לפי האינדקס ההפוך), ורק מתכונים שמצרך שלהם
+    השתנה מחושבים מחדש ונשמרים. מחזיר (מספר המצרכים שהשתנו, מספר המתכונים שעודכנו).
+    """
+    _, names = get_ingredients_editor()
+    old_db = st.session_state['ingredients_db']
+    upserts, removed, renames = ingredient_edits(old_db, names, delta)
+    if not upserts and not removed:
+        return 0, 0
+    touched = upserts.keys() | removed
+    changed_names = diff_ingredients_db({name: old_db[name] for name in touched if name in old_db}, upserts)
+
+    with profiler.phase("save.ingredients_db", rows=len(touched)):
+        new_db, version = get_data_store().patch_ingredients(upserts, removed, renames)
+    st.session_state['ingredients_db'] = new_db
+    st.session_state.setdefault('data_versions', {})['ingredients_db'] = version
+
+    # חיפוש המתכונים, החישוב והשמירה בקטע קריטי אחד, כך ששינוי מסשן אחר לא נכנס באמצע
+    with get_data_store().locked():
+        records = recipe_records()
+        ingredient_index = shared_index(records, "ingredients")
+        updated = {}
+        with profiler.phase("ingredients.rename") as ph:
+            for rid in recipes_using(ingredient_index, renames):
+                updated[rid] = rename_recipe_ingredients(records.get(rid), renames)
+            ph.set_rows(len(updated))
+        with profiler.phase("nutrition.recalc") as ph:
+            for rid in recipes_using(ingredient_index, changed_names):
+                if rid not in updated:
+                    # עותק: המתכון המשותף מוחלף רק דרך update_recipes, יחד עם האינדקסים
+                    updated[rid] = dict(records.get(rid))
+            recalc_all_recipes(list(updated.values()), new_db)
+            ph.set_rows(len(updated))
+        if updated:
+            update_recipes(list(updated.values()))
+    return len(changed_names), len(updated)
+
+
+def recipe_from_import(imported, category):
+    """בונה מתכון חדש מתוצאת ייבוא (name / instructions / raw_ingredients), כולל ערכים תזונתיים."""
+    ingredients = parse_imported_ingredients(imported.get("raw_ingredients", []), get_ingredient_matcher())
+    with profiler.phase("nutrition", rows=len(ingredients)):
+        nutri = calculate_nutrition(parse_ingredients_list(ingredients), st.session_state['ingredients_db'])
+    return {
+        "id": new_recipe_id(),
+        "name": imported.get("name") or "מתכון מיובא",
+        "image": "🥘",
+        "category": category,
+        "ingredients": ingredients,
+        "calories": nutri["cal"],
+        "protein": nutri["pro"],
+        "carbs": nutri["carb"],
+        "fats": nutri["fat"],
+        "instructions": imported.get("instructions", ""),
+    }
 
-            if ratio > 0:
-                total["pro"] += vals[1] * ratio
-                total["carb"] += vals[2] * ratio
-                total["fat"] += vals[3] * ratio
 
-    total_cal = (total["pro"] * 4) + (total["carb"] * 4) + (total["fat"] * 9)
-    return {
-        "cal": int(total_cal),
-        "pro": int(total["pro"]),
-        "carb": int(total["carb"]),
-        "fat": int(total["fat"])
+def get_ingredient_matcher():
+    """אינדקס ההתאמה המקורבת נבנה מחדש רק כשמאגר המצרכים משתנה."""
+    version = st.session_state.get('data_versions', {}).get('ingredients_db')
+    cached = st.session_state.get('ingredient_matcher')
+    if cached is None or cached[0] != version:
+        cached = (version, build_ingredient_matcher(st.session_state['ingredients_db']))
+        st.session_state['ingredient_matcher'] = cached
+    return cached[1]
+
+
+def recipes_version():
+    """גרסת רשימת המתכונים של הסשן. מתקדמת בכל שמירה, מחיקה, שחזור או שינוי מסשן אחר."""
+    return st.session_state.get('data_versions', {}).get('recipes')
+
+
+def _build_summary(recipes_list):
+    with profiler.phase("summary.build", rows=len(recipes_list)):
+        return build_recipe_summary(recipes_list)
+
+
+def get_recipe_summary():
+    """טבלת התקציר, משותפת לכל הסשנים. נבנית מחדש רק אחרי שינוי ברשימה, לא בכל ריצה של הדף."""
+    with get_data_store().locked():
+        return recipe_records().derived("summary", _build_summary)
+
+
+def get_macro_index():
+    """האינדקס העמודתי של הערכים התזונתיים, נבנה מטבלת התקציר פעם אחת לכל שינוי ברשימה."""
+    def build(recipes_list):
+        summary = get_recipe_summary()
+        with profiler.phase("index.macros", rows=len(summary)):
+            return build_macro_index(summary)
+
+    with get_data_store().locked():
+        return recipe_records().derived("macro_index", build)
+
+
+def get_filtered_view(search_query, categories, ingredients, macro_ranges=(), sort_key=None, descending=True,
+                      top_k=0):
+    """
+    תוצאת הסינון לתצוגה: (הטבלה המסוננת, קטגוריה -> הטבלה שלה, מתכונים מחוץ לרשימת הקטגוריות).
+    macro_ranges - זוגות (מפתח, מינימום, מקסימום) מ-MACRO_KEYS. sort_key / top_k - מיון והגבלה ל-k הראשונים.
+    נשמרת לפי כל הפרמטרים וגרסת המתכונים, כך שריצות שלא שינו דבר (מנות, צ'קבוקסים)
+    לא מסננות ולא מעתיקות שוב.
+    """
+    key = (recipes_version(), search_query, frozenset(categories), frozenset(ingredients),
+           tuple(st.session_state['categories']), tuple(macro_ranges), sort_key, descending, top_k)
+    cache = st.session_state.setdefault('filter_results', OrderedDict())
+    view = cache.get(key)
+    if view is not None:
+        cache.move_to_end(key)
+        profiler.count("filter_cache_hit")
+        return view
+    profiler.count("filter_cache_miss")
+    ranges = {k: (low, high) for k, low, high in macro_ranges}
+    pushed_ranges = None
+    if STORAGE_BACKEND == "sqlite":
+        # טווחים על העמודות הבסיסיות נכנסים לשאילתת ה-SQL. היחסים הנגזרים נשארים למערכים הממוינים
+        pushed_ranges = {k: r for k, r in ranges.items() if k in SQLITE_MACRO_COLUMNS}
+        ranges = {k: r for k, r in ranges.items() if k not in pushed_ranges}
+    # התקציר, האינדקס והמזהים נלקחים תחת נעילה אחת: המיקומים באינדקס הם שורות בטבלת התקציר,
+    # ושינוי מסשן אחר בין הקריאות היה מחזיר שורות של מתכונים אחרים
+    with get_data_store().locked():
+        filtered = get_recipe_summary()
+        matching = filter_recipe_ids(search_query, categories, ingredients, pushed_ranges)
+        if ranges or sort_key or top_k:
+            # טווחים ומיון דרך המערכים הממוינים, בחיתוך עם תוצאת שאר המסננים
+            macro_index = get_macro_index()
+            with profiler.phase("filter.macros") as ph:
+                mask = None if matching is None else ids_to_mask(macro_index, matching)
+                positions = query_macros(macro_index, ranges, sort_key, top_k, descending, mask)
+                ph.set_rows(len(positions))
+            matching = None
+            filtered = filtered.iloc[positions]
+    with profiler.phase("filter.view", rows=len(filtered)):
+        if matching is not None:
+            filtered = filtered[filtered['id'].isin(list(matching))]
+        by_category = dict(iter(filtered.groupby('category', sort=False)))
+        other = filtered[~filtered['category'].isin(st.session_state['categories'])]
+    view = (filtered, by_category, other)
+    cache[key] = view
+    while len(cache) > FILTER_CACHE_SIZE:
+        cache.popitem(last=False)
+    return view
+
+
+def get_recipe_body(recipe_id):
+    """
+    מצרכים (כשורות מוכנות לתצוגה) והוראות של מתכון פתוח, דרך מטמון LRU קטן בסשן.
+    המפתח כולל את גרסת המתכונים, כך שעריכה (גם מסשן אחר) לא מחזירה גוף ישן.
+    """
+    cache = st.session_state.setdefault('recipe_bodies', OrderedDict())
+    key = (recipe_id, recipes_version())
+    body = cache.get(key)
+    if body is not None:
+        cache.move_to_end(key)
+        return body
+    recipe = get_recipe(recipe_id)
+    if recipe is None:
+        # נמחק בסשן אחר; יורד מהרשימה בריצה הבאה
+        return {"ingredients": [], "instructions": ""}
+    body = {
+        "ingredients": [format_ingredient(ing) for ing in recipe.get('ingredients', [])],
+        "instructions": recipe.get('instructions', ''),
     }
+    cache[key] = body
+    while len(cache) > RECIPE_BODY_CACHE_SIZE:
+        cache.popitem(last=False)
+    return body
+
+
+@st.cache_resource
+def get_import_cache():
+    return ImportCache(IMPORT_CACHE_DIR, IMPORT_CACHE_TTL, IMPORT_CACHE_ENTRIES)
+
+
+@st.cache_resource
+def get_data_store():
+    return DataStore()
+
+
+# מפתח ב-session_state -> (קובץ, ערך ברירת מחדל)
+DATA_FILES = {
+    'recipes': (RECIPES_FILE, []),
+    'ingredients_db': (INGREDIENTS_FILE, DEFAULT_INGREDIENTS),
+    'categories': (CATEGORIES_FILE, DEFAULT_CATEGORIES),
+    'trash': (TRASH_FILE, []),
+}
 
 
-def recalc_all_recipes(recipes_list, ingredients_db):
-    count = 0
-    for recipe in recipes_list:
-        df_ing = parse_ingredients_list(recipe['ingredients'])
-        new_vals = calculate_nutrition(df_ing, ingredients_db)
-        recipe['calories'] = new_vals['cal']
-        recipe['protein'] = new_vals['pro']
-        recipe['carbs'] = new_vals['carb']
-        recipe['fats'] = new_vals['fat']
-        count += 1
-    return count
+def sync_session_data():
+    """
+    מצביע את ה-session_state על העותק המשותף. אם סשן אחר שמר (או שהקובץ השתנה בדיסק)
+    מאז הריצה הקודמת, הגרסה מתקדמת והמטמונים של הסשן (לפי גרסה) מתחדשים. האינדקסים של
+    המתכונים משותפים ב-DataStore ומתעדכנים בכל שינוי, כך ששמירה של סשן אחר לא בונה אותם מחדש.
+    """
+    store = get_data_store()
+    versions = st.session_state.setdefault('data_versions', {})
+    for key, (filename, default_data) in DATA_FILES.items():
+        try:
+            data, version = store.load(filename, default_data)
+        except DataFileError as e:
+            st.error(f"⚠️ {e}. הקובץ לא נדרס - תקן או שחזר אותו מגיבוי ורענן את הדף.")
+            st.stop()
+        if versions.get(key) != version or key not in st.session_state:
+            st.session_state[key] = data
+            versions[key] = version
+            profiler.count(f"reload.{key}")
+
+
+def save_data(*keys):
+    """שומר את הנתונים של הסשן דרך המאגר המשותף, כך שיהיו גלויים גם לסשנים האחרים."""
+    store = get_data_store()
+    versions = st.session_state.setdefault('data_versions', {})
+    for key in keys:
+        filename, _ = DATA_FILES[key]
+        with profiler.phase(f"save.{key}", rows=len(st.session_state[key])):
+            versions[key] = store.save(filename, st.session_state[key])
+
 
 # פונקציות Callback לטיפול בכפתורי + / - (תיקון שגיאת StreamlitAPIException)
 def increment_serving(serving_key):
@@ -159,27 +479,49 @@ def decrement_serving(serving_key):
     if serving_key in st.session_state:
         st.session_state[serving_key] = max(1, st.session_state[serving_key] - 1)
 
+def load_more(shown_key, page_size):
+    # מגדיל את מספר המתכונים המוצגים בקטגוריה בעמוד נוסף
+    st.session_state[shown_key] = st.session_state.get(shown_key, page_size) + page_size
+
 def set_selected_emoji(new_emoji):
     # פונקציית הקאלבק לעדכון האייקון
     st.session_state['selected_emoji'] = new_emoji
     st.rerun() 
 
-def create_backup_zip():
-    """דוחס את כל קבצי ה-JSON ל-ZIP ושומר ב-BytesIO."""
-    file_list = [RECIPES_FILE, INGREDIENTS_FILE, CATEGORIES_FILE, TRASH_FILE]
-    
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for filename in file_list:
-            if os.path.exists(filename):
-                try:
-                    with open(filename, 'rb') as f:
-                        zipf.writestr(filename, f.read())
-                except Exception:
-                    pass
 
-    buffer.seek(0)
-    return buffer.getvalue()
+def build_backup(incremental, run_profiler):
+    # נקרא רק בלחיצה על ההורדה, לפעמים אחרי שהריצה כבר הסתיימה - ולכן מקבל את המודד שלה
+    # ה-ZIP נבנה לקובץ בדיסק. streamlit שומר את ההורדה אצלו בכל מקרה, אז קוראים אותו רק כאן, בלחיצה
+    with run_profiler.phase("backup") as ph, create_backup_zip(incremental) as backup:
+        content = backup.read()
+        ph.set_rows(len(content))
+    return content
+
+
+def render_metrics_panel(run_profiler):
+    """לוח המדידות בסרגל הצד: השלבים של הריצה הנוכחית, ורישום ליומן המדידות."""
+    log_enabled = st.session_state.get('metrics_log', False)
+    run_profiler.finish(log_path=METRICS_LOG if log_enabled else None,
+                        recipes=len(st.session_state.get('recipes', [])))
+    with st.sidebar:
+        st.header("🛠️ מדידת ביצועים")
+        st.metric("זמן הריצה", f"{run_profiler.total_ms():.1f} ms")
+        phases = pd.DataFrame([
+            {"שלב": "\u00a0\u00a0" * p["depth"] + p["name"], "ms": round(p["ms"] or 0, 2), "שורות": p["rows"],
+             **({"KB": round(p["alloc_kb"], 1)} if "alloc_kb" in p else {})}
+            for p in run_profiler.phases
+        ])
+        st.dataframe(phases, hide_index=True, use_container_width=True)
+        if run_profiler.counters:
+            st.caption(" | ".join(f"{name}: {n}" for name, n in sorted(run_profiler.counters.items())))
+        st.toggle(f"רשום ל-{METRICS_LOG}", key="metrics_log")
+        if log_enabled:
+            history = read_metrics_log(METRICS_LOG, METRICS_HISTORY)
+            rows = [p for record in history if not record.get("late") for p in record["phases"]]
+            if rows:
+                st.caption(f"ממוצע ל-{len(history)} הריצות האחרונות ביומן:")
+                st.dataframe(pd.DataFrame(rows).groupby("name")["ms"].agg(["count", "mean", "max"]).round(2),
+                             use_container_width=True)
 
 
 # ==========================================
@@ -188,6 +530,10 @@ def create_backup_zip():
 
 st.set_page_config(page_title="השף האוטומטי", page_icon="🤖", layout="centered")
 
+# מדידה לכל ריצה, רק כשהופעלה (משתנה סביבה או ?profile=1). אחרת כל phase() הוא אובייקט ריק
+PROFILE_MODE = profile_mode(os.environ.get(PROFILE_ENV) or st.query_params.get("profile"))
+profiler = RerunProfiler(trace_alloc=PROFILE_MODE == "alloc") if PROFILE_MODE else DISABLED
+
 st.markdown("""
 <style>
     /* כיוון כללי לימין */
@@ -272,24 +618,20 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-if 'recipes' not in st.session_state:
-    st.session_state['recipes'] = load_json(RECIPES_FILE, [])
-if 'ingredients_db' not in st.session_state:
-    st.session_state['ingredients_db'] = load_json(INGREDIENTS_FILE, DEFAULT_INGREDIENTS)
-if 'categories' not in st.session_state:
-    st.session_state['categories'] = load_json(CATEGORIES_FILE, DEFAULT_CATEGORIES)
-if 'trash' not in st.session_state:
-    st.session_state['trash'] = load_json(TRASH_FILE, [])
+with profiler.phase("load"):
+    sync_session_data()
+    enforce_trash_retention()
 
 st.title("🤖 השף האוטומטי")
 
-tab1, tab2, tab3, tab4 = st.tabs(["🔎 ספר המתכונים", "📝 הוספה ועריכה", "⚙️ ניהול מאגרים", "🗑️ פח אשפה"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🔎 ספר המתכונים", "📝 הוספה ועריכה", "⚙️ ניהול מאגרים", "🗑️ פח אשפה",
+                                        "🗓️ תכנון ארוחות"])
 
 # ------------------------------------------
 # TAB 1: ספר המתכונים
 # ------------------------------------------
-with tab1:
-    df = pd.DataFrame(st.session_state['recipes'])
+with tab1, profiler.phase("render.tab1"):
+    df = get_recipe_summary()
 
     if not df.empty:
         with st.expander("🔍 אפשרויות סינון וחיפוש", expanded=True):
@@ -306,32 +648,38 @@ with tab1:
                 all_possible_ingredients = list(st.session_state['ingredients_db'].keys())
                 sel_ingredients = st.multiselect("מצרכים (הצג מתכונים שמכילים את כולם):", all_possible_ingredients)
 
-        filtered = df.copy()
-
-        # 1. סינון חיפוש חופשי
-        if search_query:
-            query = search_query.lower()
-
-
-            def filter_text(row):
-                all_text = str(row['name']) + " " + str(row['instructions']) + " " + " ".join(row['ingredients'])
-                return query in all_text.lower()
-
-
-            filtered = filtered[filtered.apply(filter_text, axis=1)]
-
-        # 2. סינון קטגוריות
-        if sel_cats:
-            filtered = filtered[filtered['category'].isin(sel_cats)]
-
-        # 3. סינון מצרכים
-        if sel_ingredients:
-            def check_ingredients(recipe_ings_list):
-                recipe_text = " ".join(recipe_ings_list)
-                return all(sel_ing in recipe_text for sel_ing in sel_ingredients)
-
-
-            filtered = filtered[filtered['ingredients'].apply(check_ingredients)]
+            st.divider()
+            st.markdown("**🎯 ערכים תזונתיים:**")
+            macro_index = get_macro_index()
+            macro_ranges = []
+            slider_cols = st.columns(2)
+            for i, macro_key in enumerate(RANGE_SLIDER_KEYS):
+                low_bound, high_bound = macro_bounds(macro_index, macro_key)
+                if low_bound == high_bound:
+                    continue
+                with slider_cols[i % 2]:
+                    low, high = st.slider(MACRO_LABELS[macro_key], low_bound, high_bound, (low_bound, high_bound))
+                # סליידר בטווח המלא לא מסנן (וגם לא מוציא מתכונים עם ערך חסר)
+                if (low, high) != (low_bound, high_bound):
+                    macro_ranges.append((macro_key, low if low > low_bound else None,
+                                         high if high < high_bound else None))
+
+            col_sort1, col_sort2, col_sort3 = st.columns([2, 1, 1])
+            with col_sort1:
+                sort_key = st.selectbox("מיון לפי:", [None] + MACRO_KEYS,
+                                        format_func=lambda k: "ללא מיון" if k is None else MACRO_LABELS[k])
+            with col_sort2:
+                ascending = st.toggle("מהנמוך לגבוה", disabled=sort_key is None)
+            with col_sort3:
+                top_k = st.number_input("רק ה-k הראשונים (0 = הכל):", min_value=0, value=0, step=5)
+
+            page_size = st.selectbox("מתכונים לכל קטגוריה (לפני \"טען עוד\"):", PAGE_SIZE_OPTIONS,
+                                     index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE))
+
+        # סינון חיפוש חופשי, קטגוריות ומצרכים כחיתוך של קבוצות מזהים מהאינדקסים, ואז טווחים ומיון
+        # על המערכים הממוינים של הערכים התזונתיים (נשמר בין ריצות)
+        filtered, recipes_by_category, other_recipes = get_filtered_view(
+            search_query, sel_cats, sel_ingredients, macro_ranges, sort_key, not ascending, int(top_k))
 
         if filtered.empty:
             st.warning("לא נמצאו מתכונים תואמים.")
@@ -339,15 +687,16 @@ with tab1:
             st.write(f"נמצאו {len(filtered)} מתכונים:")
 
             categories_to_show = sel_cats if sel_cats else st.session_state['categories']
-            other_recipes = filtered[~filtered['category'].isin(st.session_state['categories'])]
 
             for category in categories_to_show:
-                df_cat = filtered[filtered['category'] == category]
+                df_cat = recipes_by_category.get(category)
 
-                if not df_cat.empty:
+                if df_cat is not None:
                     st.header(f"{category}")
-                    for idx, row in df_cat.iterrows():
-                        original_idx = df[df['name'] == row['name']].index[0]
+                    shown_key = f"shown_{category}"
+                    shown = st.session_state.get(shown_key, page_size)
+                    for idx, row in df_cat.head(shown).iterrows():
+                        recipe_id = row['id']
                         total_cals = int(row.get('calories', 0))
                         total_pro = int(row.get('protein', 0))
                         total_carb = int(row.get('carbs', 0))
@@ -362,122 +711,127 @@ with tab1:
                             f"🥑 {total_fat} שומ'"
                         )
                         
-                        # פתיחת ה-Expander
-                        with st.expander(header_text): 
-
-                            # 1. הצגת הערכים הכוללים (תמיד גלויים כאשר המתכון פתוח)
-                            st.markdown("##### **ערכים כוללים (לכל המתכון):**")
-                            c1, c2, c3, c4 = st.columns(4)
-                            c1.metric("🔥 קלוריות", total_cals)
-                            c2.metric("🥩 חלבון", f"{total_pro} גר'")
-                            c3.metric("🍞 פחמימה", f"{total_carb} גר'")
-                            c4.metric("🥑 שומן", f"{total_fat} גר'")
-
-                            # ==============================================================
-                            # === EXPANDER פנימי למחשבון הקלורי (אופציונלי) ===
-                            # ==============================================================
-                            with st.expander("⚙️ **מחשבון חלוקה למנות (הרחב)**", expanded=False):
-
-                                # 2. פקד החלוקה למנות
-                                st.markdown("##### **מספר מנות:**")
+                        # גוף המתכון נבנה רק כשהמתכון פתוח
+                        if st.toggle(header_text, key=f"open_{recipe_id}"):
+                            with st.container(border=True):
+
+                                # 1. הצגת הערכים הכוללים (תמיד גלויים כאשר המתכון פתוח)
+                                st.markdown("##### **ערכים כוללים (לכל המתכון):**")
+                                c1, c2, c3, c4 = st.columns(4)
+                                c1.metric("🔥 קלוריות", total_cals)
+                                c2.metric("🥩 חלבון", f"{total_pro} גר'")
+                                c3.metric("🍞 פחמימה", f"{total_carb} גר'")
+                                c4.metric("🥑 שומן", f"{total_fat} גר'")
+
+                                # ==============================================================
+                                # === EXPANDER פנימי למחשבון הקלורי (אופציונלי) ===
+                                # ==============================================================
+                                with st.expander("⚙️ **מחשבון חלוקה למנות (הרחב)**", expanded=False):
+
+                                    # 2. פקד החלוקה למנות
+                                    st.markdown("##### **מספר מנות:**")
                                 
-                                # מפתח ייחודי לכל מתכון
-                                serving_key = f"serving_calc_{original_idx}"
+                                    # מפתח ייחודי לכל מתכון
+                                    serving_key = f"serving_calc_{recipe_id}"
                                 
-                                # וודא שקיים ערך התחלתי ב-session_state
-                                if serving_key not in st.session_state:
-                                    st.session_state[serving_key] = 1
+                                    # וודא שקיים ערך התחלתי ב-session_state
+                                    if serving_key not in st.session_state:
+                                        st.session_state[serving_key] = 1
 
-                                # פריסה: מינוס, קלט, פלוס
-                                col_minus, col_servings_input, col_plus = st.columns([0.8, 1.5, 0.8])
+                                    # פריסה: מינוס, קלט, פלוס
+                                    col_minus, col_servings_input, col_plus = st.columns([0.8, 1.5, 0.8])
                                 
-                                # כפתור מינוס
-                                with col_minus:
-                                    st.button(
-                                        "➖", 
-                                        key=f"minus_{original_idx}", 
-                                        use_container_width=True,
-                                        on_click=decrement_serving,
-                                        args=(serving_key,)
-                                    )
+                                    # כפתור מינוס
+                                    with col_minus:
+                                        st.button(
+                                            "➖", 
+                                            key=f"minus_{recipe_id}", 
+                                            use_container_width=True,
+                                            on_click=decrement_serving,
+                                            args=(serving_key,)
+                                        )
                                 
-                                # פקד קלט (כפתורי הברירת מחדל שלו מוסתרים ע"י CSS)
-                                with col_servings_input:
-                                    num_servings = st.number_input(
-                                        "מספר מנות לחלוקה",
-                                        min_value=1,
-                                        max_value=100,
-                                        value=st.session_state[serving_key],
-                                        step=1,
-                                        label_visibility="collapsed",
-                                        key=serving_key
-                                    )
-
-                                # כפתור פלוס
-                                with col_plus:
-                                    st.button(
-                                        "➕", 
-                                        key=f"plus_{original_idx}", 
-                                        use_container_width=True,
-                                        on_click=increment_serving,
-                                        args=(serving_key,)
-                                    )
+                                    # פקד קלט (כפתורי הברירת מחדל שלו מוסתרים ע"י CSS)
+                                    with col_servings_input:
+                                        num_servings = st.number_input(
+                                            "מספר מנות לחלוקה",
+                                            min_value=1,
+                                            max_value=100,
+                                            value=st.session_state[serving_key],
+                                            step=1,
+                                            label_visibility="collapsed",
+                                            key=serving_key
+                                        )
+
+                                    # כפתור פלוס
+                                    with col_plus:
+                                        st.button(
+                                            "➕", 
+                                            key=f"plus_{recipe_id}", 
+                                            use_container_width=True,
+                                            on_click=increment_serving,
+                                            args=(serving_key,)
+                                        )
                                     
 
-                                # 3. חישוב הערכים למנה
-                                if num_servings > 0:
-                                    cal_per_serving = total_cals / num_servings
-                                    pro_per_serving = total_pro / num_servings
-                                    carb_per_serving = total_carb / num_servings
-                                    fat_per_serving = total_fat / num_servings
-                                else:
-                                    cal_per_serving = pro_per_serving = carb_per_serving = fat_per_serving = 0
-
-                                # 4. שורה שנייה: ערכים למנה
-                                st.markdown(f"##### **ערכים למנה (1/{num_servings}):**")
-                                d1, d2, d3, d4 = st.columns(4)
-                                d1.metric("🔥 קלוריות", int(cal_per_serving))
-                                d2.metric("🥩 חלבון", f"{round(pro_per_serving, 1)} גר'")
-                                d3.metric("🍞 פחמימה", f"{round(carb_per_serving, 1)} גר'")
-                                d4.metric("🥑 שומן", f"{round(fat_per_serving, 1)} גר'")
-
-                            st.divider()
-                            # ==============================================================
-                            # === סוף קטע המחשבון המתכווץ ===
-                            # ==============================================================
-
-                            col_cont1, col_cont2 = st.columns(2)
-                            with col_cont1:
-                                st.markdown("**🛒 מצרכים:**")
-                                for ing in row['ingredients']:
-                                    st.text(f"• {ing}")
-                            with col_cont2:
-                                st.markdown("**👨‍🍳 הוראות הכנה:**")
-                                # שינוי: הוראות כרשימת צ'קבוקסים
-                                if row['instructions']:
-                                    lines = row['instructions'].split('\n')
-                                    st.markdown("<style>.stCheckbox label {direction: rtl; text-align: right;}</style>", unsafe_allow_html=True)
-                                    for i, line in enumerate(lines):
-                                        step = line.strip()
-                                        if step:
-                                            # מפתח ייחודי לכל צ'קבוקס עבור המתכון הספציפי
-                                            key = f"recipe_{original_idx}_step_{i}"
-                                            st.checkbox(step, key=key)
-                                else:
-                                    st.write("-")
-
-                            if st.button("🗑️ מחק", key=f"del_cat_{category}_{original_idx}"):
-                                recipe_to_trash = st.session_state['recipes'].pop(original_idx)
-                                st.session_state['trash'].append(recipe_to_trash)
-                                save_json(RECIPES_FILE, st.session_state['recipes'])
-                                save_json(TRASH_FILE, st.session_state['trash'])
-                                st.rerun()
+                                    # 3. חישוב הערכים למנה
+                                    if num_servings > 0:
+                                        cal_per_serving = total_cals / num_servings
+                                        pro_per_serving = total_pro / num_servings
+                                        carb_per_serving = total_carb / num_servings
+                                        fat_per_serving = total_fat / num_servings
+                                    else:
+                                        cal_per_serving = pro_per_serving = carb_per_serving = fat_per_serving = 0
+
+                                    # 4. שורה שנייה: ערכים למנה
+                                    st.markdown(f"##### **ערכים למנה (1/{num_servings}):**")
+                                    d1, d2, d3, d4 = st.columns(4)
+                                    d1.metric("🔥 קלוריות", int(cal_per_serving))
+                                    d2.metric("🥩 חלבון", f"{round(pro_per_serving, 1)} גר'")
+                                    d3.metric("🍞 פחמימה", f"{round(carb_per_serving, 1)} גר'")
+                                    d4.metric("🥑 שומן", f"{round(fat_per_serving, 1)} גר'")
+
+                                st.divider()
+                                # ==============================================================
+                                # === סוף קטע המחשבון המתכווץ ===
+                                # ==============================================================
+
+                                body = get_recipe_body(recipe_id)
+                                col_cont1, col_cont2 = st.columns(2)
+                                with col_cont1:
+                                    st.markdown("**🛒 מצרכים:**")
+                                    for ing_line in body['ingredients']:
+                                        st.text(f"• {ing_line}")
+                                with col_cont2:
+                                    st.markdown("**👨‍🍳 הוראות הכנה:**")
+                                    # שינוי: הוראות כרשימת צ'קבוקסים
+                                    if body['instructions']:
+                                        lines = body['instructions'].split('\n')
+                                        st.markdown("<style>.stCheckbox label {direction: rtl; text-align: right;}</style>", unsafe_allow_html=True)
+                                        for i, line in enumerate(lines):
+                                            step = line.strip()
+                                            if step:
+                                                # מפתח ייחודי לכל צ'קבוקס עבור המתכון הספציפי
+                                                key = f"recipe_{recipe_id}_step_{i}"
+                                                st.checkbox(step, key=key)
+                                    else:
+                                        st.write("-")
+
+                                if st.button("🗑️ מחק", key=f"del_cat_{category}_{recipe_id}"):
+                                    move_to_trash(recipe_id)
+                                    st.rerun()
+
+                    if len(df_cat) > shown:
+                        st.button(f"⬇️ טען עוד ({len(df_cat) - shown} נותרו)", key=f"more_{category}",
+                                  on_click=load_more, args=(shown_key, page_size))
                     st.divider()
 
             if not other_recipes.empty and not sel_cats:
                 st.header("📂 ללא קטגוריה / אחר")
-                for idx, row in other_recipes.iterrows():
-                    original_idx = df[df['name'] == row['name']].index[0]
+                shown_key = "shown__other"
+                shown = st.session_state.get(shown_key, page_size)
+                for idx, row in other_recipes.head(shown).iterrows():
+                    recipe_id = row['id']
                     
                     total_cals = int(row.get('calories', 0))
                     total_pro = int(row.get('protein', 0))
@@ -493,28 +847,30 @@ with tab1:
                         f"🥑 {total_fat} שומ'"
                     )
                     
-                    with st.expander(header_text):
-                        c1, c2, c3, c4 = st.columns(4)
-                        c1.metric("🔥 קלוריות", total_cals)
-                        c2.metric("🥩 חלבון", f"{total_pro} גר'")
-                        c3.metric("🍞 פחמימה", f"{total_carb} גר'")
-                        c4.metric("🥑 שומן", f"{total_fat} גר'")
-
-                        st.write("ללא קטגוריה")
-                        st.write(row['instructions']) # כאן נשאר טקסט רגיל כיוון שאין הוראות של ממש
-                        if st.button("🗑️ מחק", key=f"del_other_{original_idx}"):
-                            recipe_to_trash = st.session_state['recipes'].pop(original_idx)
-                            st.session_state['trash'].append(recipe_to_trash)
-                            save_json(RECIPES_FILE, st.session_state['recipes'])
-                            save_json(TRASH_FILE, st.session_state['trash'])
-                            st.rerun()
+                    if st.toggle(header_text, key=f"open_{recipe_id}"):
+                        with st.container(border=True):
+                            c1, c2, c3, c4 = st.columns(4)
+                            c1.metric("🔥 קלוריות", total_cals)
+                            c2.metric("🥩 חלבון", f"{total_pro} גר'")
+                            c3.metric("🍞 פחמימה", f"{total_carb} גר'")
+                            c4.metric("🥑 שומן", f"{total_fat} גר'")
+
+                            st.write("ללא קטגוריה")
+                            st.write(get_recipe_body(recipe_id)['instructions']) # כאן נשאר טקסט רגיל כיוון שאין הוראות של ממש
+                            if st.button("🗑️ מחק", key=f"del_other_{recipe_id}"):
+                                move_to_trash(recipe_id)
+                                st.rerun()
+
+                if len(other_recipes) > shown:
+                    st.button(f"⬇️ טען עוד ({len(other_recipes) - shown} נותרו)", key="more__other",
+                              on_click=load_more, args=(shown_key, page_size))
     else:
         st.info("המאגר ריק.")
 
 # ------------------------------------------
 # TAB 2: הוספה ועריכה
 # ------------------------------------------
-with tab2:
+with tab2, profiler.phase("render.tab2"):
     
     # === טאב 2: פקדי ייבוא ו Mode ===
     with st.expander("🌐 ייבוא מתכון מקישור (YouTube / אתרים)", expanded=False):
@@ -525,16 +881,13 @@ with tab2:
 
         if st.button("נסה לייבא"):
             if import_url and HAS_SCRAPER:
-                try:
-                    scraper = scrape_me(import_url)
-                    imported_data = {
-                        "name": scraper.title(),
-                        "instructions": scraper.instructions(),
-                        "raw_ingredients": scraper.ingredients()
-                    }
+                with st.spinner("מוריד את המתכון..."):
+                    result = import_one(import_url.strip(), timeout=IMPORT_TIMEOUT, cache=get_import_cache())
+                if result["ok"]:
+                    imported_data = result["recipe"]
                     st.success("המתכון נשאב בהצלחה! אנא בדוק את המצרכים בטבלה למטה.")
-                except Exception as e:
-                    st.warning(f"לא הצלחנו לשאוב אוטומטית. נסה להעתיק ידנית.")
+                else:
+                    st.warning(f"לא הצלחנו לשאוב אוטומטית ({result['error']}). נסה להעתיק ידנית.")
             elif import_url and not HAS_SCRAPER:
                 st.error("חסרה ספריית recipe-scrapers. התקן אותה בטרמינל.")
 
@@ -548,6 +901,60 @@ with tab2:
                 }
                 st.success("הטקסט נקלט!")
 
+    with st.expander("📚 ייבוא מרובה (רשימת קישורים)", expanded=False):
+        batch_text = st.text_area("קישור בכל שורה:", key="batch_urls")
+        batch_file = st.file_uploader("או קובץ טקסט עם קישורים:", type=["txt"], key="batch_file")
+        batch_cat = st.selectbox("קטגוריה למתכונים שיובאו:", st.session_state['categories'], key="batch_cat")
+
+        if st.button("🌐 ייבא את כל הקישורים"):
+            file_text = batch_file.getvalue().decode('utf-8', errors='replace') if batch_file else ""
+            urls = read_url_list(batch_text + "\n" + file_text)
+            if not urls:
+                st.warning("לא נמצאו קישורים.")
+            elif not HAS_SCRAPER:
+                st.error("חסרה ספריית recipe-scrapers. התקן אותה בטרמינל.")
+            else:
+                progress = st.progress(0.0, text=f"0/{len(urls)}")
+                status_box = st.container()
+
+                def report_import(done, total, result):
+                    progress.progress(done / total, text=f"{done}/{total}")
+                    if result["ok"]:
+                        source = " (מהמטמון)" if result["cached"] else ""
+                        status_box.write(f"✅ {result['url']} - {result['recipe']['name']}{source}")
+                    else:
+                        status_box.write(f"❌ {result['url']} - {result['error']}")
+
+                results = import_urls(urls, workers=IMPORT_WORKERS, timeout=IMPORT_TIMEOUT, on_result=report_import,
+                                       cache=get_import_cache())
+                st.session_state['batch_import_results'] = [r for r in results if r["ok"]]
+
+        batch_ok = st.session_state.get('batch_import_results', [])
+        if batch_ok:
+            st.write(f"{len(batch_ok)} מתכונים מוכנים לשמירה:")
+            st.dataframe(pd.DataFrame([{"שם": r["recipe"]["name"], "קישור": r["url"]} for r in batch_ok]),
+                         use_container_width=True, hide_index=True)
+            if st.button(f"💾 שמור {len(batch_ok)} מתכונים"):
+                skipped, batch, batch_fingerprints = [], [], set()
+                for r in batch_ok:
+                    new_recipe_obj = recipe_from_import(r["recipe"], batch_cat)
+                    # כפילויות (מול הספרייה וגם בתוך הרשימה עצמה) לא נשמרות
+                    fingerprint = recipe_fingerprint(new_recipe_obj)
+                    if fingerprint in batch_fingerprints or find_duplicate_recipes(new_recipe_obj):
+                        skipped.append(new_recipe_obj['name'])
+                        continue
+                    batch_fingerprints.add(fingerprint)
+                    batch.append(new_recipe_obj)
+                # שמירה אחת לכל המתכונים: נעילה, fsync ועדכון גרסה פעם אחת
+                if batch:
+                    add_recipes(batch)
+                st.session_state.pop('batch_import_results')
+                if skipped:
+                    st.warning(f"{len(skipped)} מתכונים כבר קיימים ולא נשמרו: {', '.join(skipped)}")
+                else:
+                    st.success("המתכונים נשמרו! אפשר לתקן את המצרכים דרך \"ערוך קיים\".")
+                    st.rerun()
+
     st.divider()
 
     mode = st.radio("בחר פעולה:", ["➕ מתכון חדש", "✏️ ערוך קיים"], horizontal=True)
@@ -557,32 +964,35 @@ with tab2:
     default_cat = st.session_state['categories'][0] if st.session_state['categories'] else ""
     default_inst = ""
     default_ing_df = pd.DataFrame([{"כמות": 1, "יחידה": "גרם", "שם המצרך": ""}])
-    edit_index = -1
+    edit_id = None
 
     if imported_data:
         default_name = imported_data.get("name", "")
         default_inst = imported_data.get("instructions", "")
-        raw_rows = []
-        for line in imported_data.get("raw_ingredients", []):
-            raw_rows.append({"כמות": 1, "יחידה": "יחידה", "שם המצרך": line})
-        if raw_rows:
-            default_ing_df = pd.DataFrame(raw_rows)
+        parsed = parse_imported_ingredients(imported_data.get("raw_ingredients", []), get_ingredient_matcher())
+        if parsed:
+            default_ing_df = parse_ingredients_list(parsed)[["כמות", "יחידה", "שם המצרך"]]
 
     elif mode == "✏️ ערוך קיים":
-        if st.session_state['recipes']:
-            recipe_names = [r['name'] for r in st.session_state['recipes']]
-            selected_recipe_name = st.selectbox("בחר מתכון לעריכה:", recipe_names)
-            
-            for i, r in enumerate(st.session_state['recipes']):
-                if r['name'] == selected_recipe_name:
-                    edit_index = i
-                    default_name = r['name']
-                    default_emoji = r['image']
-                    default_cat = r['category']
-                    default_inst = r['instructions']
-                    temp_df = parse_ingredients_list(r['ingredients'])
-                    if not temp_df.empty:
-                        default_ing_df = pd.DataFrame(temp_df[["כמות", "יחידה", "שם המצרך"]])
+        recipe_names = get_recipe_names()
+        if recipe_names:
+            # בחירה לפי מזהה, כך ששני מתכונים עם אותו שם לא מתבלבלים
+            edit_id = st.selectbox("בחר מתכון לעריכה:", list(recipe_names),
+                                   format_func=lambda rid: recipe_names.get(rid, ""))
+
+            r = get_recipe(edit_id)
+            if r is None:
+                # נמחק בסשן אחר בין בניית הרשימה לבחירה
+                st.warning("המתכון נמחק בינתיים.")
+                edit_id = None
+            else:
+                default_name = r['name']
+                default_emoji = r['image']
+                default_cat = r['category']
+                default_inst = r['instructions']
+                temp_df = parse_ingredients_list(r['ingredients'])
+                if not temp_df.empty:
+                    default_ing_df = pd.DataFrame(temp_df[["כמות", "יחידה", "שם המצרך"]])
         else:
             st.warning("אין מתכונים לעריכה.")
 
@@ -623,16 +1033,23 @@ with tab2:
         st.markdown("**הוראות הכנה:**")
         instructions = st.text_area("כתוב כאן...", value=default_inst, height=150)
 
+        allow_duplicate = st.checkbox(
+            "שמור גם אם כפול", help="בדרך כלל מתכון עם אותו שם ואותם מצרכים כמו מתכון קיים לא נשמר")
+
         if st.form_submit_button("💾 שמור מתכון"):
             if name and not edited_df.empty:
-                nutri = calculate_nutrition(edited_df, st.session_state['ingredients_db'])
+                with profiler.phase("nutrition", rows=len(edited_df)):
+                    nutri = calculate_nutrition(edited_df, st.session_state['ingredients_db'])
                 final_ing_list = []
                 for _, row in edited_df.iterrows():
                     ing_name = row["שם המצרך"]
                     if ing_name:
-                        final_ing_list.append(f"{row['כמות']} {row['יחידה']} {ing_name}")
+                        amount = float(row['כמות']) if pd.notna(row['כמות']) else 0.0
+                        final_ing_list.append({"amount": amount, "unit": row['יחידה'], "ingredient": ing_name})
 
+                is_new = mode == "➕ מתכון חדש" or imported_data or edit_id is None
                 new_recipe_obj = {
+                    "id": new_recipe_id() if is_new else edit_id,
                     "name": name,
                     "image": emoji,
                     "category": category,
@@ -644,23 +1061,29 @@ with tab2:
                     "instructions": instructions
                 }
 
-                if mode == "➕ מתכון חדש" or imported_data:
-                    st.session_state['recipes'].append(new_recipe_obj)
-                    msg = "המתכון נוסף בהצלחה!"
+                duplicates = find_duplicate_recipes(new_recipe_obj)
+                if duplicates and not allow_duplicate:
+                    recipe_names = get_recipe_names()
+                    dup_names = ", ".join(recipe_names.get(rid, "") for rid in duplicates)
+                    st.warning(f"⚠️ נראה שהמתכון כבר קיים ({dup_names}). סמן \"שמור גם אם כפול\" כדי לשמור בכל זאת.")
                 else:
-                    st.session_state['recipes'][edit_index] = new_recipe_obj
-                    msg = "המתכון עודכן בהצלחה!"
-
-                save_json(RECIPES_FILE, st.session_state['recipes'])
-                st.success(msg)
-                st.rerun()
+                    if is_new:
+                        add_recipes([new_recipe_obj])
+                        msg = "המתכון נוסף בהצלחה!"
+                    elif update_recipes([new_recipe_obj]):
+                        msg = "המתכון עודכן בהצלחה!"
+                    else:
+                        msg = "המתכון נמחק בינתיים (אולי מחלון אחר) ולא עודכן."
+
+                    st.success(msg)
+                    st.rerun()
             else:
                 st.error("חסר שם או מצרכים.")
 
 # ------------------------------------------
 # TAB 3: ניהול מאגרים
 # ------------------------------------------
-with tab3:
+with tab3, profiler.phase("render.tab3"):
     st.header("⚙️ הגדרות מערכת")
     
     # ===================================================
@@ -703,28 +1126,9 @@ with tab3:
     st.subheader("🥦 מצרכים")
     st.info("הזן חלבון/פחמימה/שומן. הקלוריות יחושבו לבד בשמירה.")
 
-    flattened_data = []
-    for name, data in st.session_state['ingredients_db'].items():
-        vals = data['vals']
-        m_type = data.get("measure_type", "100g")
-        display_type = "100 גרם" if m_type == "100g" else "יחידה"
-
-        flattened_data.append({
-            "שם המצרך": name,
-            "סוג חישוב": display_type,
-            "שומן": vals[3],
-            "פחמימה": vals[2],
-            "חלבון": vals[1],
-            "קלוריות (מחושב)": vals[0]
-        })
-
-    ingredients_df = pd.DataFrame(flattened_data)
-
-    # סדר ל-RTL: שם אחרון (ימין)
-    col_order_manage = ["שומן", "פחמימה", "חלבון", "קלוריות (מחושב)", "סוג חישוב", "שם המצרך"]
-    ingredients_df = ingredients_df[col_order_manage]
-
-    edited_ingredients = st.data_editor(
+    # הטבלה נבנית מחדש רק כשמאגר המצרכים משתנה; בשמירה נלקחים רק השינויים שנעשו בה
+    ingredients_df, _ = get_ingredients_editor()
+    st.data_editor(
         ingredients_df,
         num_rows="dynamic",
         use_container_width=True,
@@ -737,31 +1141,15 @@ with tab3:
     )
 
     if st.button("💾 שמור שינויים ועדכן הכל 🔄"):
-        new_db = {}
-        for _, row in edited_ingredients.iterrows():
-            if row["שם המצרך"]:
-                p = row["חלבון"]
-                c = row["פחמימה"]
-                f = row["שומן"]
-                auto_cals = (p * 4) + (c * 4) + (f * 9)
-                internal_type = "100g" if row["סוג חישוב"] == "100 גרם" else "unit"
-                new_db[row["שם המצרך"]] = {
-                    "vals": [auto_cals, p, c, f],
-                    "measure_type": internal_type
-                }
-
-        st.session_state['ingredients_db'] = new_db
-        save_json(INGREDIENTS_FILE, new_db)
-        count = recalc_all_recipes(st.session_state['recipes'], new_db)
-        save_json(RECIPES_FILE, st.session_state['recipes'])
-        st.success(f"עודכן! {count} מתכונים חושבו מחדש.")
+        changed_count, count = save_ingredient_edits(st.session_state["ing_editor"])
+        st.success(f"עודכן! {changed_count} מצרכים השתנו, {count} מתכונים עודכנו.")
         st.rerun()
 
     st.divider()
 
     st.subheader("🏷️ קטגוריות")
-    cat_df = pd.DataFrame([{"קטגוריה": c} for c in st.session_state['categories']])
-    edited_cats = st.data_editor(
+    cat_df, shown_categories = get_categories_editor()
+    st.data_editor(
         cat_df,
         num_rows="dynamic",
         use_container_width=True,
@@ -769,9 +1157,10 @@ with tab3:
     )
 
     if st.button("שמור קטגוריות"):
-        new_cat_list = [row["קטגוריה"] for _, row in edited_cats.iterrows() if row["קטגוריה"]]
-        st.session_state['categories'] = new_cat_list
-        save_json(CATEGORIES_FILE, new_cat_list)
+        new_cat_list, changed = category_edits(shown_categories, st.session_state["cat_editor"])
+        if changed:
+            st.session_state['categories'] = new_cat_list
+            save_data('categories')
         st.success("עודכן!")
         st.rerun()
     
@@ -779,12 +1168,12 @@ with tab3:
     
     st.subheader("📦 גיבוי ושחזור")
     
-    # כפתור הורדת הגיבוי
-    backup_data = create_backup_zip()
+    # כפתור הורדת הגיבוי. ה-ZIP נבנה רק בלחיצה, לא בכל ריצה של הדף
+    incremental_backup = st.toggle("גיבוי מצטבר (רק קבצים שהשתנו מאז הגיבוי הקודם)", key="backup_incremental")
     st.download_button(
         label="⬇️ הורד גיבוי מאגרים (ZIP)",
-        data=backup_data,
-        file_name="recipe_backup.zip",
+        data=lambda: build_backup(incremental_backup, profiler),
+        file_name="recipe_backup_incremental.zip" if incremental_backup else "recipe_backup.zip",
         mime="application/zip",
         help="מוריד את כל קבצי ה-JSON (מתכונים, מצרכים, קטגוריות ופח אשפה)"
     )
@@ -792,27 +1181,147 @@ with tab3:
 # ------------------------------------------
 # TAB 4: פח אשפה
 # ------------------------------------------
-with tab4:
+with tab4, profiler.phase("render.tab4"):
     st.header("🗑️ פח אשפה")
     
     if st.session_state['trash']:
         st.write(f"יש {len(st.session_state['trash'])} מתכונים בפח.")
-        for idx, row in enumerate(st.session_state['trash']):
-            col_info, col_actions = st.columns([3, 1])
-            with col_info:
-                st.write(f"{row['image']} **{row['name']}** ({int(row['calories'])} קל')")
-            with col_actions:
-                if st.button("♻️ שחזר", key=f"restore_{idx}"):
-                    recipe_to_restore = st.session_state['trash'].pop(idx)
-                    st.session_state['recipes'].append(recipe_to_restore)
-                    save_json(RECIPES_FILE, st.session_state['recipes'])
-                    save_json(TRASH_FILE, st.session_state['trash'])
-                    st.success("שוחזר!")
-                    st.rerun()
-                if st.button("❌ מחק סופית", key=f"perm_del_{idx}"):
-                    st.session_state['trash'].pop(idx)
-                    save_json(TRASH_FILE, st.session_state['trash'])
+        retention = [f"אחרי {TRASH_RETENTION_DAYS} ימים" if TRASH_RETENTION_DAYS is not None else None,
+                     f"מעבר ל-{TRASH_MAX_ITEMS} מתכונים (הישנים ביותר)" if TRASH_MAX_ITEMS is not None else None]
+        retention = [rule for rule in retention if rule]
+        if retention:
+            st.caption(f"מתכונים בפח נמחקים סופית {' או '.join(retention)}.")
+
+        trash_view = get_trash_view()
+        n_pages = max(1, -(-len(trash_view) // TRASH_PAGE_SIZE))
+        if st.session_state.get('trash_page', 1) > n_pages:
+            st.session_state['trash_page'] = n_pages
+        trash_page = st.number_input(f"עמוד (מתוך {n_pages}):", min_value=1, max_value=n_pages, step=1,
+                                     key="trash_page") if n_pages > 1 else 1
+        page_df = trash_view.iloc[(trash_page - 1) * TRASH_PAGE_SIZE:trash_page * TRASH_PAGE_SIZE]
+
+        # טבלה אחת לכל העמוד במקום שני כפתורים לכל מתכון. הגרסה במפתח מאפסת את הסימונים אחרי כל שינוי
+        trash_version = st.session_state['data_versions'].get('trash')
+        selection = st.data_editor(
+            page_df.assign(בחר=False),
+            hide_index=True,
+            use_container_width=True,
+            key=f"trash_select_{trash_version}_{trash_page}",
+            column_order=["בחר", "מתכון", "קלוריות", "נמחק"],
+            disabled=["מתכון", "קלוריות", "נמחק"],
+        )
+        selected_ids = selection.loc[selection["בחר"], "id"].tolist()
+
+        col_restore, col_purge, col_empty = st.columns(3)
+        with col_restore:
+            if st.button(f"♻️ שחזר ({len(selected_ids)})", disabled=not selected_ids, key="trash_restore"):
+                restore_from_trash(selected_ids)
+                st.success("שוחזר!")
+                st.rerun()
+        with col_purge:
+            if st.button(f"❌ מחק סופית ({len(selected_ids)})", disabled=not selected_ids, key="trash_purge"):
+                purge_from_trash(selected_ids)
+                st.rerun()
+        with col_empty:
+            with st.popover("🧹 רוקן את הפח"):
+                st.write(f"כל {len(st.session_state['trash'])} המתכונים בפח יימחקו סופית.")
+                if st.button("כן, רוקן", key="trash_empty"):
+                    purge_from_trash(get_trash_view()["id"].tolist())
                     st.rerun()
-            st.divider()
     else:
         st.info("הפח ריק.")
+
+# ------------------------------------------
+# TAB 5: תכנון ארוחות
+# ------------------------------------------
+with tab5, profiler.phase("render.tab5"):
+    st.header("🗓️ תכנון ארוחות")
+    st.info("הגדר יעד יומי (0 = לא משנה) ואת הארוחות בכל יום. המערכת בוחרת מתכונים וכמות מנות "
+            "כך שסך כל יום יהיה קרוב ליעד.")
+
+    target_cols = st.columns(4)
+    daily_targets = {}
+    for col, macro_key in zip(target_cols, MACRO_FIELDS):
+        with col:
+            daily_targets[macro_key] = st.number_input(MACRO_LABELS[macro_key], min_value=0,
+                                                       value=DEFAULT_DAILY_TARGETS[macro_key], step=10,
+                                                       key=f"plan_target_{macro_key}")
+
+    plan_slots = st.multiselect("ארוחות בכל יום:", st.session_state['categories'],
+                                default=st.session_state['categories'], key="plan_slots")
+    plan_days = st.slider("מספר ימים:", 1, 14, 7, key="plan_days")
+
+    if st.button("🍽️ צור תפריט"):
+        if not plan_slots:
+            st.warning("בחר לפחות ארוחה אחת.")
+        else:
+            with profiler.phase("meal_plan", rows=len(st.session_state['recipes'])):
+                plan = plan_meals(get_recipe_summary(), daily_targets, plan_slots, plan_days)
+            st.session_state['meal_plan'] = (recipes_version(), daily_targets, plan)
+
+    saved_plan = st.session_state.get('meal_plan')
+    if saved_plan:
+        plan_version, plan_targets, plan = saved_plan
+        if plan_version != recipes_version():
+            st.caption("המתכונים השתנו מאז שהתפריט נוצר - אפשר ליצור אותו מחדש.")
+        for day in plan:
+            totals = day['totals']
+            with st.expander(f"יום {day['day']} | 🔥 {int(totals['calories'])} קל' | 🥩 {int(totals['protein'])} חל' | "
+                             f"🍞 {int(totals['carbs'])} פח' | 🥑 {int(totals['fats'])} שומ' "
+                             f"(סטייה {day['deviation']:.1f}%)"):
+                for meal in day['meals']:
+                    if meal['id'] is None:
+                        st.write(f"**{meal['slot']}:** אין מתכונים מתאימים בקטגוריה")
+                        continue
+                    st.write(f"**{meal['slot']}:** {meal['image']} {meal['name']} × {meal['servings']:g} | "
+                             f"🔥 {int(meal['calories'])} | 🥩 {int(meal['protein'])} | "
+                             f"🍞 {int(meal['carbs'])} | 🥑 {int(meal['fats'])}")
+                st.caption(" | ".join(f"{MACRO_LABELS[k]}: {int(totals[k])} / {plan_targets[k]}"
+                                      for k in MACRO_FIELDS if plan_targets[k]))
+
+    st.divider()
+    st.subheader("🛒 רשימת קניות")
+    shopping_source = st.radio("מתכונים לרשימה:", ["מהתפריט", "בחירה ידנית"], horizontal=True, key="shopping_source")
+
+    # (מזהה מתכון, מכפיל מנות). מתכון שמופיע כמה פעמים בתפריט נכנס עם כל המנות שלו
+    shopping_items = []
+    if shopping_source == "מהתפריט":
+        if saved_plan:
+            shopping_items = [(meal['id'], meal['servings']) for day in saved_plan[2] for meal in day['meals']
+                              if meal['id'] is not None]
+        else:
+            st.caption("צור קודם תפריט, או עבור לבחירה ידנית.")
+    elif get_recipe_names():
+        recipe_names = get_recipe_names()
+        shopping_ids = st.multiselect("בחר מתכונים:", list(recipe_names), key="shopping_ids",
+                                      format_func=lambda rid: recipe_names.get(rid, ""))
+        if shopping_ids:
+            servings_df = st.data_editor(
+                pd.DataFrame({"id": shopping_ids, "מנות": 1.0,
+                              "מתכון": [recipe_names.get(rid, "") for rid in shopping_ids]}),
+                hide_index=True, use_container_width=True, key="shopping_servings",
+                column_order=["מנות", "מתכון"], disabled=["מתכון"],
+                column_config={"מנות": st.column_config.NumberColumn("מנות", min_value=0.0, step=0.5)})
+            shopping_items = list(zip(servings_df["id"], servings_df["מנות"].fillna(0)))
+
+    if shopping_items:
+        with get_data_store().locked():
+            records = recipe_records()
+            # מתכון שנמחק מאז שנבחר פשוט לא נכנס לרשימה
+            items = [(records.get(rid), servings) for rid, servings in shopping_items if rid in records]
+        with profiler.phase("shopping_list", rows=len(items)):
+            shopping = build_shopping_list(items, st.session_state['ingredients_db'])
+        if shopping.empty:
+            st.info("אין מצרכים במתכונים שנבחרו.")
+        else:
+            st.dataframe(shopping, hide_index=True, use_container_width=True)
+            col_csv, col_txt = st.columns(2)
+            with col_csv:
+                st.download_button("⬇️ הורד CSV", data=lambda: shopping_list_csv(shopping),
+                                   file_name="shopping_list.csv", mime="text/csv")
+            with col_txt:
+                st.download_button("⬇️ הורד כטקסט", data=lambda: shopping_list_text(shopping).encode("utf-8"),
+                                   file_name="shopping_list.txt", mime="text/plain")
+
+if profiler.enabled:
+    render_metrics_panel(profiler)
@@ -0,0 +1,273 @@
+"""
+עבודות אצווה על ספר המתכונים בלי לפתוח את האפליקציה (למשל הרצה לילית מ-cron).
+
+הקבצים נקראים ונכתבים בזרימה, כך שהזיכרון תלוי בגודל הקטע (--chunk-size) ולא בגודל הספרייה,
+והחישובים הכבדים (ערכים תזונתיים, פענוח מצרכים) רצים במאגר תהליכים.
+
+שימוש:
+    python recipe_cli.py recalc --workers 4
+    python recipe_cli.py import new_recipes.jsonl --category ערב
+    python recipe_cli.py import new_recipes.csv --format csv
+    python recipe_cli.py export --format csv --out recipes.csv
+    python recipe_cli.py unmatched
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from itertools import islice
+
+from recipe_core import (
+    RECIPES_FILE, INGREDIENTS_FILE, CATEGORIES_FILE, JOURNAL_OPS, STORAGE_BACKEND, PERSISTENCE_MODE,
+    DEFAULT_CATEGORIES, DEFAULT_INGREDIENTS, load_json, read_journal, iter_json_array, iter_journaled,
+    write_json_array, replace_if_unchanged, _file_stat, migrate_recipe_ingredients, migrate_recipe_ids,
+    ingredients_db_arrays, recalc_all_recipes, build_ingredient_matcher, match_ingredient,
+    parse_imported_ingredients, format_ingredient, recipe_fingerprint, new_recipe_id,
+)
+
+DEFAULT_CHUNK_SIZE = 2000
+CSV_COLUMNS = ["id", "name", "image", "category", "calories", "protein", "carbs", "fats", "ingredients", "instructions"]
+
+# מצב התהליכים במאגר: מאגר המצרכים והמבנים שנגזרים ממנו, נבנים פעם אחת לכל תהליך
+_WORKER = {}
+
+
+def _init_worker(ingredients_db):
+    _WORKER["db"] = ingredients_db
+    _WORKER["arrays"] = ingredients_db_arrays(ingredients_db)
+    _WORKER["matcher"] = build_ingredient_matcher(ingredients_db)
+
+
+def _recalc_chunk(recipes):
+    """מחשב מחדש קטע של מתכונים. מחזיר (המתכונים, כמה מהם השתנו)."""
+    before = [(r.get('calories'), r.get('protein'), r.get('carbs'), r.get('fats')) for r in recipes]
+    recalc_all_recipes(recipes, _WORKER["db"], _WORKER["arrays"])
+    changed = sum(old != (r['calories'], r['protein'], r['carbs'], r['fats']) for old, r in zip(before, recipes))
+    return recipes, changed
+
+
+def _build_chunk(records):
+    """רשומות ייבוא -> מתכונים מלאים (מצרכים מפוענחים ומותאמים למאגר, ערכים תזונתיים)."""
+    recipes = []
+    for record in records:
+        lines = record.get("ingredients") or []
+        if isinstance(lines, str):
+            lines = lines.replace(";", "\n").splitlines()
+        free_text = [line for line in lines if isinstance(line, str)]
+        ingredients = [ing for ing in lines if isinstance(ing, dict)]
+        ingredients += parse_imported_ingredients(free_text, _WORKER["matcher"])
+        recipes.append({
+            "id": new_recipe_id(),
+            "name": record.get("name") or "מתכון מיובא",
+            "image": record.get("image") or "🥘",
+            "category": record["category"],
+            "ingredients": ingredients,
+            "calories": 0, "protein": 0, "carbs": 0, "fats": 0,
+            "instructions": record.get("instructions") or "",
+        })
+    recalc_all_recipes(recipes, _WORKER["db"], _WORKER["arrays"])
+    return recipes
+
+
+def chunked(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bounded_imap(pool, func, chunks, window):
+    """
+    כמו pool.imap (התוצאות בסדר הקלט), אבל לכל היותר window קטעים בעבודה בו זמנית.
+    pool.imap עצמו קורא את כל הקלט מראש, ועל ספרייה גדולה זה היה טוען את כולה לזיכרון.
+    """
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(func, (chunk,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def iter_snapshot(filename=RECIPES_FILE):
+    """איברי קובץ המתכונים כפי שהם בדיסק (בלי היומן), אחרי ההמרות של load_json."""
+    for recipe in iter_json_array(filename):
+        migrate_recipe_ingredients([recipe])
+        migrate_recipe_ids([recipe])
+        yield recipe
+
+
+def iter_current_recipes():
+    """המתכונים כפי שהאפליקציה רואה אותם: ה-snapshot ועליו רשומות היומן שעוד לא נדחסו."""
+    for recipe in iter_journaled(RECIPES_FILE, 0):
+        migrate_recipe_ingredients([recipe])
+        migrate_recipe_ids([recipe])
+        yield recipe
+
+
+def _commit(tmp_filename, expected_stat):
+    if not replace_if_unchanged(RECIPES_FILE, tmp_filename, expected_stat):
+        raise SystemExit(f"{RECIPES_FILE} השתנה בזמן הריצה (שמירה / דחיסה מהאפליקציה). לא נכתב דבר - הרץ שוב.")
+
+
+def cmd_recalc(args):
+    """
+    מחשב מחדש את הערכים התזונתיים של כל המתכונים ב-snapshot.
+    רשומות ביומן לא נוגעים בהן: הן חושבו בשמירה, ומוחלות מעל ה-snapshot החדש כרגיל.
+    """
+    db = load_json(INGREDIENTS_FILE, DEFAULT_INGREDIENTS)
+    expected_stat = _file_stat(RECIPES_FILE)
+    tmp_filename = f"{RECIPES_FILE}.recalc.tmp"
+    totals = {"recipes": 0, "changed": 0}
+
+    def results(pool):
+        for recipes, changed in bounded_imap(pool, _recalc_chunk, chunked(iter_snapshot(), args.chunk_size),
+                                             args.workers * 2):
+            totals["changed"] += changed
+            yield from recipes
+
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(db,)) as pool:
+        totals["recipes"] = write_json_array(tmp_filename, results(pool))
+    _commit(tmp_filename, expected_stat)
+    print(f"חושבו מחדש {totals['recipes']} מתכונים, {totals['changed']} השתנו")
+
+
+def _read_import_records(args):
+    stream = sys.stdin if args.file == "-" else open(args.file, 'r', encoding='utf-8', newline='')
+    fmt = args.format or ("csv" if args.file.endswith(".csv") else "jsonl")
+    with stream:
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def cmd_import(args):
+    """
+    מוסיף מתכונים מקובץ JSONL / CSV (name, category, ingredients, instructions, image).
+    מצרכים כטקסט חופשי מפוענחים ומותאמים למאגר. מתכונים כפולים (אותה טביעת אצבע) מדלגים עליהם.
+    """
+    db = load_json(INGREDIENTS_FILE, DEFAULT_INGREDIENTS)
+    categories = load_json(CATEGORIES_FILE, DEFAULT_CATEGORIES)
+    default_category = args.category or (categories[0] if categories else "")
+    expected_stat = _file_stat(RECIPES_FILE)
+    tmp_filename = f"{RECIPES_FILE}.import.tmp"
+    counts = {"added": 0, "duplicates": 0}
+
+    # טביעות האצבע של הקיימים (כולל מתכונים שנוספו ביומן ועוד לא נדחסו) - מחרוזות קצרות בלבד
+    fingerprints = set()
+    for record in (read_journal()[1] if PERSISTENCE_MODE == "journal" else []):
+        if JOURNAL_OPS[record["op"]][0] == "put":
+            fingerprints.add(recipe_fingerprint(record["recipe"]))
+
+    def existing():
+        for recipe in iter_snapshot():
+            fingerprints.add(recipe_fingerprint(recipe))
+            yield recipe
+
+    def records():
+        for record in _read_import_records(args):
+            record["category"] = record.get("category") or default_category
+            yield record
+
+    def new_recipes(pool):
+        for recipes in bounded_imap(pool, _build_chunk, chunked(records(), args.chunk_size), args.workers * 2):
+            for recipe in recipes:
+                fingerprint = recipe_fingerprint(recipe)
+                if fingerprint in fingerprints:
+                    counts["duplicates"] += 1
+                    continue
+                fingerprints.add(fingerprint)
+                counts["added"] += 1
+                yield recipe
+
+    def all_recipes(pool):
+        yield from existing()
+        yield from new_recipes(pool)
+
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(db,)) as pool:
+        write_json_array(tmp_filename, all_recipes(pool))
+    _commit(tmp_filename, expected_stat)
+    print(f"נוספו {counts['added']} מתכונים, {counts['duplicates']} כפולים דולגו")
+
+
+def cmd_export(args):
+    out = sys.stdout if args.out == "-" else open(args.out, 'w', encoding='utf-8', newline='')
+    count = 0
+    with out:
+        if args.format == "csv":
+            writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for recipe in iter_current_recipes():
+                row = dict(recipe, ingredients="\n".join(format_ingredient(ing) for ing in recipe.get('ingredients', [])))
+                writer.writerow(row)
+                count += 1
+        else:
+            for recipe in iter_current_recipes():
+                out.write(json.dumps(recipe, ensure_ascii=False) + "\n")
+                count += 1
+    print(f"יוצאו {count} מתכונים", file=sys.stderr)
+
+
+def cmd_unmatched(args):
+    """מצרכים שמופיעים במתכונים ואין להם רשומה במאגר (ולכן נספרים כאפס), עם הצעה מהמאגר."""
+    db = load_json(INGREDIENTS_FILE, DEFAULT_INGREDIENTS)
+    matcher = build_ingredient_matcher(db)
+    unmatched = {}
+    for recipe in iter_current_recipes():
+        for name in {ing['ingredient'] for ing in recipe.get('ingredients', [])} - db.keys():
+            unmatched[name] = unmatched.get(name, 0) + 1
+
+    out = sys.stdout if args.out == "-" else open(args.out, 'w', encoding='utf-8', newline='')
+    with out:
+        writer = csv.writer(out, delimiter="\t")
+        writer.writerow(["ingredient", "recipes", "suggestion"])
+        for name, count in sorted(unmatched.items(), key=lambda item: (-item[1], item[0]))[:args.limit]:
+            writer.writerow([name, count, match_ingredient(matcher, name) or ""])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="עבודות אצווה על ספר המתכונים")
+    parser.add_argument("--dir", default=".", help="התיקייה של קבצי הנתונים")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("recalc", help="חישוב מחדש של הערכים התזונתיים של כל המתכונים")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.set_defaults(func=cmd_recalc)
+
+    p = sub.add_parser("import", help="הוספת מתכונים מקובץ JSONL / CSV (- לקלט הרגיל)")
+    p.add_argument("file")
+    p.add_argument("--format", choices=["jsonl", "csv"], default=None, help="ברירת מחדל: לפי סיומת הקובץ")
+    p.add_argument("--category", default=None, help="קטגוריה למתכונים בלי קטגוריה")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="ייצוא כל המתכונים ל-JSONL / CSV")
+    p.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    p.add_argument("--out", default="-")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("unmatched", help="דוח מצרכים שאין להם רשומה במאגר")
+    p.add_argument("--out", default="-")
+    p.add_argument("--limit", type=int, default=None)
+    p.set_defaults(func=cmd_unmatched)
+
+    args = parser.parse_args(argv)
+    if STORAGE_BACKEND != "json":
+        raise SystemExit("הכלי עובד על קבצי ה-JSON. במצב sqlite: python sqlite_store.py export, הרצה, ואז import.")
+    os.chdir(args.dir)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
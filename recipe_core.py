@@ -0,0 +1,1883 @@
+"""
+הליבה של ספר המתכונים, בלי Streamlit: קבצי הנתונים והנעילות, היומן, פענוח מצרכים,
+חישוב ערכים תזונתיים, האינדקסים והגיבוי. main.py (הממשק) ו-recipe_cli.py (עבודות אצווה) משתמשים בה.
+"""
+import bisect
+import contextlib
+import copy
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from sqlite_store import SqliteStore
+
+try:
+    import fcntl
+
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+# ==========================================
+# 1. הגדרות וקבועים
+# ==========================================
+
+RECIPES_FILE = "recipes.json"
+INGREDIENTS_FILE = "ingredients.json"
+CATEGORIES_FILE = "categories.json"
+TRASH_FILE = "trash.json"
+JOURNAL_FILE = "journal.jsonl"
+JOURNAL_META_FILE = "journal_meta.json"
+
+# "journal" - שינויים במתכון בודד נרשמים ביומן ונדחסים ל-snapshot מדי פעם
+# "snapshot" - כל שינוי שומר את הקובץ כולו
+PERSISTENCE_MODE = "journal"
+JOURNAL_COMPACT_EVERY = 500
+
+# מדיניות שמירה בפח: מתכון נמחק סופית אחרי TRASH_RETENTION_DAYS ימים,
+# וכשיש בפח יותר מ-TRASH_MAX_ITEMS מתכונים נמחקים הישנים ביותר (None = בלי הגבלה)
+TRASH_RETENTION_DAYS = 30
+TRASH_MAX_ITEMS = 1000
+
+# "json" - קבצי JSON בתיקייה, "sqlite" - מאגר SQLite אחד (ראה sqlite_store.py)
+STORAGE_BACKEND = "json"
+SQLITE_FILE = "recipes.db"
+
+# קובץ JSON -> סוג הנתונים המקביל במאגר ה-SQLite
+STORAGE_KINDS = {
+    RECIPES_FILE: "recipes",
+    INGREDIENTS_FILE: "ingredients",
+    CATEGORIES_FILE: "categories",
+    TRASH_FILE: "trash",
+}
+
+# קבצים שהיומן חל עליהם -> המיקום שלהם ב-JOURNAL_OPS
+JOURNALED_FILES = {RECIPES_FILE: 0, TRASH_FILE: 1}
+
+# פעולה ביומן -> (מה קורה ברשימת המתכונים, מה קורה בפח)
+JOURNAL_OPS = {
+    "add": ("put", None),
+    "update": ("put", None),
+    "delete": ("remove", "put"),
+    "restore": ("put", "remove"),
+    "purge": (None, "remove"),
+}
+
+WEIGHT_CONVERTER = {
+    "גרם": 1, "מ''ל": 1, "כף": 15, "כפית": 5
+}
+
+# תוקן: "כפפית" הוחלף ב- "כפית"
+ALLOWED_UNITS = ["גרם", "מ''ל", "כף", "כפית", "יחידה"]
+
+DEFAULT_CATEGORIES = ["בוקר", "צהריים", "ערב", "נשנוש"]
+
+BACKUP_FILES = [RECIPES_FILE, INGREDIENTS_FILE, CATEGORIES_FILE, TRASH_FILE, JOURNAL_FILE, JOURNAL_META_FILE]
+BACKUP_STATE_FILE = "backup_state.json"
+BACKUP_MANIFEST = "backup_manifest.json"
+
+# העמודות שתצוגת ספר המתכונים צריכה. מצרכים והוראות נטענים רק כשמתכון נפתח
+SUMMARY_COLUMNS = ["id", "name", "image", "category", "calories", "protein", "carbs", "fats"]
+
+DEFAULT_INGREDIENTS = {
+    "חזה עוף (חי)": {"vals": [110, 23, 0, 2], "measure_type": "100g"},
+    "אורז בסמטי (לפני בישול)": {"vals": [356, 7, 80, 0.6], "measure_type": "100g"},
+    "שמן זית": {"vals": [882, 0, 0, 98], "measure_type": "100g"},
+    "ביצה (L)": {"vals": [86, 7.5, 0.6, 6], "measure_type": "unit"},
+    "לחם מלא (פרוסה)": {"vals": [87, 3, 15, 1], "measure_type": "unit"},
+    "מלפפון": {"vals": [15, 0.7, 3.6, 0.1], "measure_type": "100g"},
+    "עגבניה": {"vals": [18, 0.9, 3.9, 0.2], "measure_type": "100g"},
+    "טונה במים (מסונן)": {"vals": [116, 26, 0, 1], "measure_type": "100g"},
+    "שיבולת שועל": {"vals": [389, 16.9, 66, 6.9], "measure_type": "100g"},
+    "קוטג' 5% (גביע)": {"vals": [240, 27.5, 3.75, 12.5], "measure_type": "unit"},
+}
+
+
+# ==========================================
+# 2. פונקציות עזר
+# ==========================================
+
+class DataFileError(Exception):
+    """קובץ נתונים קיים שלא ניתן לקרוא (פגום / חתוך)."""
+
+
+# טבלת המנעולים למצב בלי fcntl. המודול נטען פעם אחת לתהליך, כך שהיא משותפת לכל הסשנים
+_THREAD_FILE_LOCKS = {}
+_THREAD_FILE_LOCKS_GUARD = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(filename):
+    """
+    נעילה מייעצת (flock) על קובץ .lock צמוד, משותפת לכל התהליכים והסשנים.
+    בלי fcntl (Windows) הנעילה היא בתוך התהליך בלבד. הנעילה אינה רקורסיבית.
+    """
+    if HAS_FCNTL:
+        with open(f"{filename}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    else:
+        with _THREAD_FILE_LOCKS_GUARD:
+            lock = _THREAD_FILE_LOCKS.setdefault(filename, threading.Lock())
+        with lock:
+            yield
+
+
+def _write_file_atomic(filename, data):
+    """כותב לקובץ זמני באותה תיקייה, fsync, ואז מחליף את המקורי בפעולה אטומית."""
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def read_json_strict(filename, default_data):
+    # בניגוד ל-load_json - בלי המרות, וקובץ חסר מחזיר את ברירת המחדל בלי ליצור אותו
+    if not os.path.exists(filename):
+        return default_data
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=None)
+def get_sqlite_store():
+    return SqliteStore(SQLITE_FILE)
+
+
+def _uses_sqlite(filename):
+    return STORAGE_BACKEND == "sqlite" and filename in STORAGE_KINDS
+
+
+def load_json(filename, default_data):
+    if not _uses_sqlite(filename) and not os.path.exists(filename):
+        with file_lock(filename):
+            if not os.path.exists(filename):
+                _write_file_atomic(filename, default_data)
+                return default_data
+    try:
+        if _uses_sqlite(filename):
+            data = get_sqlite_store().load(STORAGE_KINDS[filename], default_data)
+        else:
+            # הקבצים מוחלפים רק ב-rename אטומי, ולכן אין צורך בנעילה לקריאה
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        if filename == INGREDIENTS_FILE:
+            for key, val in data.items():
+                if len(val["vals"]) == 2: val["vals"].extend([0, 0])
+                if "measure_type" not in val: val["measure_type"] = "100g"
+    except (OSError, ValueError, KeyError, TypeError, sqlite3.Error) as e:
+        # לא מחזירים ברירת מחדל: השמירה הבאה הייתה דורסת את הקובץ ומוחקת את כל הנתונים
+        raise DataFileError(f"לא ניתן לקרוא את {filename}: {e}") from e
+    # המרה חד-פעמית של שורות מצרכים בפורמט טקסט למבנה מפורק, והוספת מזהים קבועים
+    if filename in (RECIPES_FILE, TRASH_FILE):
+        migrated = migrate_recipe_ingredients(data)
+        migrated = migrate_recipe_ids(data) or migrated
+        if migrated:
+            save_json(filename, data)
+    return data
+
+
+def save_json(filename, data):
+    if _uses_sqlite(filename):
+        get_sqlite_store().save(STORAGE_KINDS[filename], data)
+        return
+    with file_lock(filename):
+        _write_file_atomic(filename, data)
+
+
+def update_json(filename, default_data, modify):
+    """קריאה-שינוי-כתיבה תחת נעילה אחת. modify מקבל את הנתונים מהדיסק ומחזיר את הגרסה החדשה."""
+    with file_lock(filename):
+        data = modify(read_json_strict(filename, default_data))
+        _write_file_atomic(filename, data)
+    return data
+
+
+def _file_stat(filename):
+    if _uses_sqlite(filename):
+        # במאגר SQLite מונה השינויים של סוג הנתונים מחליף את mtime / גודל
+        return "sqlite", get_sqlite_store().stamp(STORAGE_KINDS[filename])
+    try:
+        st_result = os.stat(filename)
+    except OSError:
+        return None
+    return st_result.st_mtime_ns, st_result.st_size
+
+
+def iter_json_array(filename, chunk_size=1 << 20):
+    """
+    קורא מערך JSON מהקובץ איבר אחרי איבר, בלי לטעון את כולו לזיכרון.
+    מתאים לקבצים שהאפליקציה כותבת (מערך של אובייקטים).
+    """
+    decoder = json.JSONDecoder()
+    with open(filename, 'r', encoding='utf-8') as f:
+        buf, pos, eof = "", 0, False
+        started = False
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ",")):
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    raise ValueError(f"{filename}: סוף קובץ לפני סוף המערך")
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{filename}: הקובץ אינו מערך JSON")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # האיבר נחתך בסוף הקטע שנקרא - קוראים עוד ומנסים שוב
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield item
+            pos = end
+
+
+def write_json_array(filename, items):
+    """
+    כותב איברים למערך JSON בזה אחר זה (אותו פורמט כמו save_json), עם fsync. מחזיר את מספר האיברים.
+    לא מחליף קובץ קיים - כותבים לקובץ זמני ואז replace_if_unchanged.
+    """
+    count = 0
+    with open(filename, 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write("[\n    " if count == 0 else ",\n    ")
+            f.write(json.dumps(item, ensure_ascii=False, indent=4).replace("\n", "\n    "))
+            count += 1
+        f.write("\n]" if count else "[]")
+        f.flush()
+        os.fsync(f.fileno())
+    return count
+
+
+def replace_if_unchanged(filename, tmp_filename, expected_stat):
+    """
+    מחליף את filename בקובץ הזמני, אבל רק אם הוא לא השתנה מאז שהתחלנו לקרוא אותו
+    (האפליקציה דחסה / שמרה בינתיים). מחזיר False ומוחק את הקובץ הזמני אם השתנה.
+    """
+    with file_lock(filename):
+        if _file_stat(filename) != expected_stat:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_filename)
+            return False
+        os.replace(tmp_filename, filename)
+        return True
+
+
+def read_journal():
+    """
+    מחזיר (seq של ה-snapshot האחרון, רשומות היומן שאחריו).
+    שורה אחרונה חתוכה (קריסה באמצע כתיבה) לא נכנסה אף פעם לתוקף ולכן מדלגים עליה.
+    """
+    meta_seq = _read_meta_seq()
+    records = []
+    if os.path.exists(JOURNAL_FILE):
+        with open(JOURNAL_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record["seq"] > meta_seq:
+                    records.append(record)
+    return meta_seq, records
+
+
+def _read_meta_seq():
+    if not os.path.exists(JOURNAL_META_FILE):
+        return 0
+    with open(JOURNAL_META_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)["seq"]
+
+
+def journal_last_seq():
+    """
+    ה-seq הגבוה ביותר שכבר בשימוש: של השורה האחרונה ביומן, או של ה-snapshot אם היומן ריק.
+    נקרא תחת file_lock(JOURNAL_FILE), כך ששני תהליכים שכותבים לאותו יומן לא נותנים אותו מספר.
+    """
+    last = 0
+    try:
+        with open(JOURNAL_FILE, 'rb') as f:
+            # קוראים מהסוף אחורה רק עד תחילת השורה האחרונה
+            pos, tail = f.seek(0, os.SEEK_END), b""
+            while pos > 0 and b"\n" not in tail.rstrip(b"\n"):
+                step = min(pos, 4096)
+                pos -= step
+                f.seek(pos)
+                tail = f.read(step) + tail
+        line = tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+        if line.strip():
+            last = json.loads(line)["seq"]
+    except (OSError, ValueError, KeyError):
+        # אין יומן, או שורה אחרונה חלקית מקריסה (תיחתך בטעינה הבאה)
+        pass
+    return max(last, _read_meta_seq())
+
+
+def repair_journal():
+    """חותך שורה אחרונה חלקית (בלי ירידת שורה) שנשארה מקריסה, כדי שהרשומה הבאה תיכתב בשורה משלה."""
+    if not os.path.exists(JOURNAL_FILE):
+        return
+    with file_lock(JOURNAL_FILE), open(JOURNAL_FILE, 'rb+') as f:
+        content = f.read()
+        if content and not content.endswith(b"\n"):
+            f.truncate(content.rfind(b"\n") + 1)
+
+
+def replay_journal(items, records, side):
+    """
+    מחיל את רשומות היומן על רשימה אחת (side=0 מתכונים, side=1 פח).
+    כל פעולה היא put / remove לפי מזהה, ולכן הפעלה חוזרת של רשומה שכבר נכנסה ל-snapshot לא משנה את התוצאה.
+    """
+    if not records:
+        return items
+    by_id = {item['id']: item for item in items}
+    for record in records:
+        action = JOURNAL_OPS[record["op"]][side]
+        recipe = record["recipe"]
+        if action == "put":
+            by_id[recipe['id']] = recipe
+        elif action == "remove":
+            by_id.pop(recipe['id'], None)
+    return list(by_id.values())
+
+
+def iter_journaled(filename, side):
+    """
+    כמו replay_journal(load_json(filename), ...) אבל בזרימה: הקובץ נקרא פעמיים, ובזיכרון נשמרים
+    רק המתכונים שמופיעים ביומן (שנדחס כל JOURNAL_COMPACT_EVERY רשומות).
+    """
+    records = read_journal()[1] if PERSISTENCE_MODE == "journal" else []
+    if not records:
+        yield from iter_json_array(filename)
+        return
+    journal_ids = {r["recipe"]["id"] for r in records}
+    in_snapshot = {item.get("id") for item in iter_json_array(filename)} & journal_ids
+
+    # אותם כללים כמו במילון של replay_journal: put על מזהה קיים נשאר במקומו, אחרת נוסף בסוף
+    in_place, removed, tail = {}, set(), {}
+    for record in records:
+        action = JOURNAL_OPS[record["op"]][side]
+        recipe = record["recipe"]
+        rid = recipe["id"]
+        still_in_snapshot = rid in in_snapshot and rid not in removed
+        if action == "put":
+            if still_in_snapshot:
+                in_place[rid] = recipe
+            else:
+                tail[rid] = recipe
+        elif action == "remove":
+            if still_in_snapshot:
+                removed.add(rid)
+                in_place.pop(rid, None)
+            else:
+                tail.pop(rid, None)
+
+    for item in iter_json_array(filename):
+        rid = item.get("id")
+        if rid not in removed:
+            yield in_place.get(rid, item)
+    yield from tail.values()
+
+
+class RecordList:
+    """
+    רשימה משותפת של מתכונים (המתכונים או הפח) עם מפת מזהה -> מיקום, האינדקסים של RECIPE_INDEXES
+    ונתונים נגזרים (טבלת התקציר וכו'). האינדקסים נבנים פעם אחת לכל טעינה מהדיסק ומתעדכנים
+    בכל שינוי לפי מזהה. אין בה נעילה משלה: משתמשים בה רק בתוך DataStore.locked().
+    """
+
+    def __init__(self, items):
+        self.items = items
+        # עולה בכל שינוי ברשימה; הנתונים הנגזרים נשמרים לפיו
+        self.revision = 0
+        self._positions = None
+        self._indexes = {}
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self.positions()
+
+    def positions(self):
+        if self._positions is None:
+            self._positions = {r['id']: pos for pos, r in enumerate(self.items)}
+        return self._positions
+
+    def get(self, recipe_id, default=None):
+        pos = self.positions().get(recipe_id)
+        return default if pos is None else self.items[pos]
+
+    def has_index(self, name):
+        return name in self._indexes
+
+    def index(self, name):
+        """האינדקס name מ-RECIPE_INDEXES, נבנה בשימוש הראשון."""
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes[name] = RECIPE_INDEXES[name][0](self.items)
+        return index
+
+    def derived(self, name, build):
+        """ערך שנגזר מכל הרשימה (build(items)), נבנה מחדש רק אחרי שינוי ברשימה."""
+        cached = self._derived.get(name)
+        if cached is None or cached[0] != self.revision:
+            cached = self._derived[name] = (self.revision, build(self.items))
+        return cached[1]
+
+    def _changed(self, removed=None, added=None):
+        for name, index in self._indexes.items():
+            _, index_add, index_remove = RECIPE_INDEXES[name]
+            if removed is not None:
+                index_remove(index, removed)
+            if added is not None:
+                index_add(index, added)
+        self.revision += 1
+
+    def append(self, recipe):
+        self.positions()[recipe['id']] = len(self.items)
+        self.items.append(recipe)
+        self._changed(added=recipe)
+
+    def replace(self, recipe_id, recipe):
+        """מחליף לפי מזהה, באותו מקום. False אם המתכון כבר לא ברשימה."""
+        pos = self.positions().get(recipe_id)
+        if pos is None:
+            return False
+        old = self.items[pos]
+        self.items[pos] = recipe
+        self._changed(removed=old, added=recipe)
+        return True
+
+    def pop(self, recipe_id):
+        """מוציא לפי מזהה ושומר על הסדר (מי שאחריו זז מקום אחד). None אם המתכון כבר לא ברשימה."""
+        positions = self.positions()
+        pos = positions.pop(recipe_id, None)
+        if pos is None:
+            return None
+        recipe = self.items.pop(pos)
+        for shifted in range(pos, len(self.items)):
+            positions[self.items[shifted]['id']] = shifted
+        self._changed(removed=recipe)
+        return recipe
+
+    def swap_remove(self, recipe_id):
+        """מוציא לפי מזהה בלי להזיז את כל מה שאחריו: האחרון ברשימה עובר למקומו (לפח, שאין לו סדר)."""
+        positions = self.positions()
+        pos = positions.pop(recipe_id, None)
+        if pos is None:
+            return None
+        recipe = self.items[pos]
+        last = self.items.pop()
+        if last is not recipe:
+            self.items[pos] = last
+            positions[last['id']] = pos
+        self._changed(removed=recipe)
+        return recipe
+
+
+class DataStore:
+    """
+    עותק יחיד של קבצי ה-JSON לכל התהליך, משותף לכל הסשנים.
+    כל קובץ נשמר עם מונה גרסה שעולה בכל שמירה או שינוי של הקובץ בדיסק (לפי mtime / גודל).
+    במצב "journal" שינויים במתכון בודד נרשמים ביומן, וה-snapshot נדחס מדי פעם ברקע.
+    רשימות המתכונים והפח מוחזקות כ-RecordList, עם אינדקסים משותפים לכל הסשנים. כל שינוי בהן
+    (חיפוש לפי מזהה, שינוי ורישום) נעשה בקטע קריטי אחד תחת הנעילה של המאגר.
+    """
+
+    def __init__(self):
+        # RLock: פעולה על המתכונים מחזיקה את הנעילה וקוראת ל-append_many, שנועל שוב
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._entries = {}
+        self._journal_seq = 0
+        self._journal_pending = 0
+
+    @staticmethod
+    def _journaled(filename):
+        return PERSISTENCE_MODE == "journal" and STORAGE_BACKEND == "json" and filename in JOURNALED_FILES
+
+    def load(self, filename, default_data):
+        """מחזיר (data, version). קורא מהדיסק רק אם הקובץ השתנה מאז הקריאה האחרונה."""
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is None or entry["stat"] != _file_stat(filename):
+                data = load_json(filename, copy.deepcopy(default_data))
+                journal = {}
+                if self._journaled(filename):
+                    repair_journal()
+                    journal_stat = _file_stat(JOURNAL_FILE)
+                    meta_seq, records = read_journal()
+                    data = replay_journal(data, records, JOURNALED_FILES[filename])
+                    self._journal_seq = max(self._journal_seq, meta_seq, *(r["seq"] for r in records))
+                    self._journal_pending = len(records)
+                    journal = {"journal_stat": journal_stat, "journal_seqs": {r["seq"] for r in records}}
+                entry = {"data": data, "stat": _file_stat(filename),
+                         "version": entry["version"] + 1 if entry else 1, **journal}
+                if filename in JOURNALED_FILES:
+                    # נטען מחדש מהדיסק (שינוי מתהליך אחר) - האינדקסים נבנים מחדש, פעם אחת לכל הסשנים
+                    entry["records"] = RecordList(data)
+                self._entries[filename] = entry
+            elif self._journaled(filename):
+                self._catch_up_journal(filename, entry)
+            return entry["data"], entry["version"]
+
+    def _catch_up_journal(self, filename, entry):
+        """
+        מחיל על העותק שבזיכרון רשומות שתהליכים אחרים הוסיפו ליומן מאז הקריאה האחרונה.
+        ה-snapshot לא השתנה, אז אין צורך לטעון מחדש: לכל מתכון שנגע בו מוחלת רק הרשומה האחרונה
+        ביומן, ורק אם היא חדשה (אחרת העותק שבזיכרון כבר כולל אותה או רשומה מאוחרת יותר).
+        """
+        journal_stat = _file_stat(JOURNAL_FILE)
+        if entry.get("journal_stat") == journal_stat:
+            return
+        _, records = read_journal()
+        entry["journal_stat"] = journal_stat
+        seen = entry.setdefault("journal_seqs", set())
+        new_seqs = {r["seq"] for r in records} - seen
+        if not new_seqs:
+            return
+        side = JOURNALED_FILES[filename]
+        last = {}
+        for record in records:
+            if JOURNAL_OPS[record["op"]][side]:
+                last[record["recipe"]['id']] = record
+        target = entry["records"]
+        for record in sorted((r for r in last.values() if r["seq"] in new_seqs), key=lambda r: r["seq"]):
+            recipe = record["recipe"]
+            if JOURNAL_OPS[record["op"]][side] == "put":
+                if not target.replace(recipe['id'], recipe):
+                    target.append(recipe)
+            elif side == JOURNALED_FILES[RECIPES_FILE]:
+                target.pop(recipe['id'])
+            else:
+                target.swap_remove(recipe['id'])
+        seen |= new_seqs
+        self._journal_seq = max(self._journal_seq, *new_seqs)
+        self._journal_pending = max(self._journal_pending, len(records))
+        entry["version"] += 1
+
+    def _refresh_journaled(self):
+        # שינויים של תהליכים אחרים (snapshot חדש או רשומות ביומן) נכנסים לפני החיפוש לפי מזהה
+        for filename in JOURNALED_FILES:
+            if filename in self._entries:
+                self.load(filename, [])
+
+    def locked(self):
+        """הנעילה של המאגר, לקריאה מ-records() ולשינויים שצריכים להיות קטע קריטי אחד."""
+        return self._lock
+
+    def records(self, filename):
+        """ה-RecordList של קובץ המתכונים / הפח. רק תחת locked()."""
+        entry = self._entries.get(filename)
+        if entry is None:
+            self.load(filename, [])
+            entry = self._entries[filename]
+        return entry["records"]
+
+    def save(self, filename, data):
+        """שומר את הקובץ כולו, מעדכן את העותק המשותף ומחזיר את הגרסה החדשה."""
+        if self._journaled(filename):
+            # שמירה מלאה של רשימה מתועדת = דחיסה מיידית, אחרת היומן ישוחזר מעל הנתונים החדשים
+            with self._compact_lock, self._lock:
+                entry = self._entries.setdefault(filename, {"version": 0})
+                entry["data"] = data
+                entry["records"] = RecordList(data)
+                entry["version"] += 1
+                self._write_snapshot_locked()
+                return entry["version"]
+
+        with self._lock:
+            save_json(filename, data)
+            entry = self._entries.get(filename)
+            version = entry["version"] + 1 if entry else 1
+            self._entries[filename] = {"data": data, "stat": _file_stat(filename), "version": version}
+            if filename in JOURNALED_FILES:
+                self._entries[filename]["records"] = RecordList(data)
+            return version
+
+    def patch_ingredients(self, upserts, removed, renames=None):
+        """
+        שומר רק את המצרכים שהשתנו: קריאה-שינוי-כתיבה של ingredients.json תחת נעילה
+        (מצרכים ששינו סשנים / תהליכים אחרים לא נדרסים), או שורות בודדות במאגר SQLite.
+        מחזיר (המאגר המעודכן, הגרסה החדשה).
+        """
+        with self._lock:
+            entry = self._entries.get(INGREDIENTS_FILE)
+            if _uses_sqlite(INGREDIENTS_FILE):
+                store = get_sqlite_store()
+                data = merge_ingredients(entry["data"] if entry else DEFAULT_INGREDIENTS, upserts, removed, renames)
+                if store.stamp(STORAGE_KINDS[INGREDIENTS_FILE]) is None:
+                    # המאגר עוד לא נשמר אף פעם (ברירת המחדל) - אין שורות לעדכן
+                    store.save(STORAGE_KINDS[INGREDIENTS_FILE], data)
+                else:
+                    store.apply_ingredients(upserts, removed, renames)
+            else:
+                data = update_json(INGREDIENTS_FILE, copy.deepcopy(DEFAULT_INGREDIENTS),
+                                   lambda db: merge_ingredients(db, upserts, removed, renames))
+            version = entry["version"] + 1 if entry else 1
+            self._entries[INGREDIENTS_FILE] = {"data": data, "stat": _file_stat(INGREDIENTS_FILE), "version": version}
+            return data, version
+
+    def append(self, op, recipe):
+        """
+        שומר שינוי במתכון בודד: ביומן במצב "journal", אחרת קריאה-שינוי-כתיבה של הקבצים תחת נעילה.
+        מחזיר את הגרסאות החדשות של קבצי המתכונים והפח.
+        """
+        return self.append_many(op, [recipe])
+
+    def append_many(self, op, recipes):
+        """
+        אותו שינוי בכמה מתכונים (למשל שחזור או מחיקה סופית של כמה מתכונים מהפח) בכתיבה אחת:
+        כל השורות ביומן עם fsync אחד, או קריאה-שינוי-כתיבה אחת לכל קובץ.
+        """
+        if not self._journaled(RECIPES_FILE):
+            return self._apply_to_files(op, recipes)
+
+        with self._lock:
+            lines = []
+            if recipes:
+                with file_lock(JOURNAL_FILE), open(JOURNAL_FILE, 'a', encoding='utf-8') as f:
+                    # המספור ממשיך מהיומן עצמו: ייתכן שתהליך אחר כתב אליו מאז הכתיבה הקודמת שלנו
+                    self._journal_seq = max(self._journal_seq, journal_last_seq())
+                    for recipe in recipes:
+                        self._journal_seq += 1
+                        for filename in JOURNALED_FILES:
+                            self._entries[filename].setdefault("journal_seqs", set()).add(self._journal_seq)
+                        lines.append(json.dumps({"seq": self._journal_seq, "op": op, "recipe": recipe},
+                                                ensure_ascii=False))
+                    f.write("".join(line + "\n" for line in lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+            versions = {}
+            for filename in JOURNALED_FILES:
+                entry = self._entries[filename]
+                entry["version"] += 1
+                versions[filename] = entry["version"]
+            self._journal_pending += len(lines)
+            compact_now = self._journal_pending >= JOURNAL_COMPACT_EVERY
+        if compact_now:
+            threading.Thread(target=self.compact, daemon=True).start()
+        return versions
+
+    def add_recipes(self, recipes):
+        """מוסיף מתכונים לספרייה ושומר. מחזיר (המתכונים, הגרסאות החדשות)."""
+        with self._lock:
+            self._refresh_journaled()
+            target = self.records(RECIPES_FILE)
+            for recipe in recipes:
+                target.append(recipe)
+            return recipes, self.append_many("add", recipes)
+
+    def update_recipes(self, recipes):
+        """מחליף מתכונים לפי מזהה ושומר. מתכון שכבר לא בספרייה (סשן אחר מחק אותו) מדולג."""
+        with self._lock:
+            self._refresh_journaled()
+            target = self.records(RECIPES_FILE)
+            updated = [recipe for recipe in recipes if target.replace(recipe['id'], recipe)]
+            return updated, self.append_many("update", updated)
+
+    def trash_recipes(self, recipe_ids, now=None):
+        """מעביר מתכונים לפח עם זמן המחיקה. מזהה שכבר לא בספרייה מדולג. מחזיר (המתכונים, הגרסאות)."""
+        with self._lock:
+            self._refresh_journaled()
+            source, trash = self.records(RECIPES_FILE), self.records(TRASH_FILE)
+            deleted_at = time.time() if now is None else now
+            moved = []
+            for recipe_id in recipe_ids:
+                recipe = source.pop(recipe_id)
+                if recipe is not None:
+                    recipe['deleted_at'] = deleted_at
+                    trash.append(recipe)
+                    moved.append(recipe)
+            return moved, self.append_many("delete", moved)
+
+    def restore_recipes(self, recipe_ids):
+        """מחזיר מתכונים מהפח לספרייה. מזהה שכבר לא בפח מדולג."""
+        with self._lock:
+            self._refresh_journaled()
+            trash, target = self.records(TRASH_FILE), self.records(RECIPES_FILE)
+            restored = []
+            for recipe_id in recipe_ids:
+                recipe = trash.swap_remove(recipe_id)
+                if recipe is not None:
+                    recipe.pop('deleted_at', None)
+                    target.append(recipe)
+                    restored.append(recipe)
+            return restored, self.append_many("restore", restored)
+
+    def purge_recipes(self, recipe_ids):
+        """מוחק סופית מתכונים מהפח. מזהה שכבר לא בפח מדולג."""
+        with self._lock:
+            self._refresh_journaled()
+            trash = self.records(TRASH_FILE)
+            purged = [recipe for recipe in map(trash.swap_remove, recipe_ids) if recipe is not None]
+            return purged, self.append_many("purge", purged)
+
+    def _apply_to_files(self, op, recipes):
+        # השינוי מוחל על מה שיש בדיסק / במאגר (ולא על העותק בזיכרון), כך ששינויים של תהליכים אחרים לא נדרסים
+        records = [{"op": op, "recipe": recipe} for recipe in recipes]
+        versions = {}
+        with self._lock:
+            for filename, side in JOURNALED_FILES.items():
+                entry = self._entries[filename]
+                action = JOURNAL_OPS[op][side]
+                if action and records and _uses_sqlite(filename):
+                    get_sqlite_store().apply_many(STORAGE_KINDS[filename], action, recipes)
+                    entry["stat"] = _file_stat(filename)
+                elif action and records:
+                    merged = update_json(filename, [], lambda items: replay_journal(items, records, side))
+                    if {r['id']: r for r in merged} != {r['id']: r for r in entry["data"]}:
+                        # בדיסק היו גם שינויים של תהליך אחר - הרשימה והאינדקסים נבנים מחדש מהתוצאה.
+                        # בלי שינויים כאלה העותק שבזיכרון (שכבר עודכן) נשאר, עם האינדקסים שלו
+                        entry["data"][:] = merged
+                        entry["records"] = RecordList(entry["data"])
+                    entry["stat"] = _file_stat(filename)
+                entry["version"] += 1
+                versions[filename] = entry["version"]
+        return versions
+
+    def _write_snapshot_locked(self):
+        # נקרא כששני המנעולים תפוסים: כותב את הרשימות מהזיכרון ומרוקן את היומן.
+        # היומן נעול לאורך כל הכתיבה, ורשומות של תהליכים אחרים נכנסות קודם לעותק שבזיכרון
+        with file_lock(JOURNAL_META_FILE), file_lock(JOURNAL_FILE):
+            for filename in JOURNALED_FILES:
+                if filename in self._entries:
+                    self._catch_up_journal(filename, self._entries[filename])
+                    save_json(filename, self._entries[filename]["data"])
+            self._journal_seq = max(self._journal_seq, journal_last_seq())
+            _write_file_atomic(JOURNAL_META_FILE, {"seq": self._journal_seq})
+            with open(JOURNAL_FILE, 'w', encoding='utf-8'):
+                pass
+            journal_stat = _file_stat(JOURNAL_FILE)
+        self._journal_pending = 0
+        for filename in JOURNALED_FILES:
+            if filename in self._entries:
+                self._entries[filename].update(stat=_file_stat(filename), journal_stat=journal_stat,
+                                               journal_seqs=set())
+
+    def compact(self):
+        """
+        בונה snapshot חדש מהדיסק (snapshot קודם + היומן) בלי לחסום כותבים,
+        ואז משאיר ביומן רק את הרשומות שנוספו בזמן הדחיסה.
+        בין תהליכים הדחיסה עוברת אחת-אחת (נעילה על קובץ ה-meta), כך שרשומות ישנות
+        לא מוחלות מעל snapshot שכבר כולל רשומות חדשות יותר.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            with file_lock(JOURNAL_META_FILE):
+                with file_lock(JOURNAL_FILE):
+                    _, records = read_journal()
+                if not records:
+                    return
+                upto = records[-1]["seq"]
+                for filename, side in JOURNALED_FILES.items():
+                    update_json(filename, [], lambda items: replay_journal(items, records, side))
+                _write_file_atomic(JOURNAL_META_FILE, {"seq": upto})
+
+                with self._lock, file_lock(JOURNAL_FILE):
+                    _, remaining = read_journal()
+                    tmp_filename = f"{JOURNAL_FILE}.tmp"
+                    with open(tmp_filename, 'w', encoding='utf-8') as f:
+                        for record in remaining:
+                            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_filename, JOURNAL_FILE)
+                    self._journal_pending = len(remaining)
+                    compacted = {r["seq"] for r in records}
+                    journal_stat = _file_stat(JOURNAL_FILE)
+                    for filename in JOURNALED_FILES:
+                        entry = self._entries.get(filename)
+                        if entry is None or not compacted <= entry.get("journal_seqs", set()):
+                            # נדחסו רשומות שהעותק שבזיכרון לא ראה - הטעינה הבאה תקרא את ה-snapshot מחדש
+                            continue
+                        # התוכן בדיסק + היומן זהה לעותק שבזיכרון - אין צורך שהסשנים יטענו מחדש
+                        entry["journal_seqs"] -= compacted
+                        entry["stat"] = _file_stat(filename)
+                        if {r["seq"] for r in remaining} <= entry["journal_seqs"]:
+                            entry["journal_stat"] = journal_stat
+        finally:
+            self._compact_lock.release()
+
+
+def parse_ingredient_line(ing_str):
+    """מפרק שורת טקסט "100.0 גרם חזה עוף (חי)" למבנה {amount, unit, ingredient}."""
+    parts = ing_str.split(' ', 2)
+    if len(parts) >= 3:
+        try:
+            return {"amount": float(parts[0]), "unit": parts[1], "ingredient": parts[2]}
+        except ValueError:
+            pass
+    # שורה שלא ניתן לפרק נשמרת כיחידה אחת של השורה כולה (במקום להיזרק)
+    return {"amount": 1.0, "unit": "יחידה", "ingredient": ing_str}
+
+
+# --- פענוח שורות מצרכים חופשיות (ייבוא) ---
+
+# כינוי -> (יחידה מ-ALLOWED_UNITS, מכפיל לכמות)
+UNIT_ALIASES = {alias: (unit, factor) for unit, factor, aliases in [
+    ("גרם", 1, ["גרם", "גרמים", "גר", "גר'", "ג'", "ג", "g", "gr", "gram", "grams"]),
+    ("גרם", 1000, ['ק"ג', "קג", "קילו", "קילוגרם", "kg"]),
+    ("גרם", 28.35, ["oz", "ounce", "ounces"]),
+    ("גרם", 453.6, ["lb", "lbs", "pound", "pounds"]),
+    ("מ''ל", 1, ['מ"ל', "מל", "מיליליטר", "ml"]),
+    ("מ''ל", 1000, ["ליטר", "ל'", "l", "liter", "litre", "liters"]),
+    ("מ''ל", 240, ["כוס", "כוסות", "cup", "cups"]),
+    ("כף", 1, ["כף", "כפות", "tbsp", "tablespoon", "tablespoons"]),
+    ("כפית", 1, ["כפית", "כפיות", "tsp", "teaspoon", "teaspoons"]),
+    ("יחידה", 1, ["יחידה", "יחידות", "יח'", "unit", "units", "piece", "pieces", "pcs"]),
+] for alias in aliases}
+
+NUMBER_WORDS = {
+    "אחד": 1, "אחת": 1, "שני": 2, "שתי": 2, "שניים": 2, "שתיים": 2, "שלוש": 3, "שלושה": 3,
+    "ארבע": 4, "ארבעה": 4, "חמש": 5, "חמישה": 5, "שש": 6, "שישה": 6, "שבע": 7, "שבעה": 7,
+    "שמונה": 8, "תשע": 9, "תשעה": 9, "עשר": 10, "עשרה": 10, "חצי": 0.5, "רבע": 0.25, "שליש": 1 / 3,
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "half": 0.5, "quarter": 0.25,
+}
+# "כוס וחצי", "2 וחצי"
+FRACTION_SUFFIXES = {"וחצי": 0.5, "ורבע": 0.25, "ושליש": 1 / 3}
+VULGAR_FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+FUZZY_MATCH_THRESHOLD = 0.5
+
+# כמות בתחילת השורה: "1 1/2", "1/2", "1.5", "1,5", "1,000", "1½", "½", וטווח "2-3" (נלקח הערך הראשון).
+# פסיק ואחריו שלוש ספרות בדיוק הוא מפריד אלפים, פסיק אחר הוא נקודה עשרונית
+_QTY_RE = re.compile(
+    r"^\s*(?:(?P<whole>\d+)\s+(?=\d+/\d+|[½¼¾⅓⅔⅛]))?"
+    r"(?:(?P<num>\d+)/(?P<den>\d+)|(?P<thousands>\d{1,3}(?:,\d{3})+(?![\d,])(?:\.\d+)?)|(?P<dec>\d+(?:[.,]\d+)?))?"
+    r"\s*(?P<vulgar>[½¼¾⅓⅔⅛])?"
+    r"(?:\s*[-–]\s*\d+(?:[.,/]\d+)?)?"
+)
+_QUOTES = str.maketrans({"״": '"', "׳": "'", "`": "'"})
+# "2 כפות + 1 כפית" - כמות נוספת שמתווספת לראשונה
+COMPOUND_JOINERS = {"+", "ועוד", "plus"}
+
+
+def _clean_token(token):
+    return token.translate(_QUOTES).replace("''", '"').strip(".,:;()").lower()
+
+
+def _split_quantity(text):
+    """מפריד כמות ויחידה מתחילת הטקסט: (כמות או None, יחידה, מכפיל, האם נכתבה יחידה, שאר המילים)."""
+    m = _QTY_RE.match(text)
+    qty = None
+    if m.group("whole"):
+        qty = float(m.group("whole"))
+    if m.group("num") and int(m.group("den")):
+        qty = (qty or 0) + int(m.group("num")) / int(m.group("den"))
+    elif m.group("thousands"):
+        qty = (qty or 0) + float(m.group("thousands").replace(",", ""))
+    elif m.group("dec"):
+        qty = (qty or 0) + float(m.group("dec").replace(",", "."))
+    if m.group("vulgar"):
+        qty = (qty or 0) + VULGAR_FRACTIONS[m.group("vulgar")]
+
+    tokens = text[m.end():].replace("+", " + ").split()
+    i = 0
+    if qty is None and i < len(tokens) and _clean_token(tokens[i]) in NUMBER_WORDS:
+        qty = NUMBER_WORDS[_clean_token(tokens[i])]
+        i += 1
+    if i < len(tokens) and _clean_token(tokens[i]) in FRACTION_SUFFIXES:
+        qty = (qty or 1) + FRACTION_SUFFIXES[_clean_token(tokens[i])]
+        i += 1
+    unit, factor, has_unit = "יחידה", 1, False
+    if i < len(tokens) and _clean_token(tokens[i]) in UNIT_ALIASES:
+        unit, factor = UNIT_ALIASES[_clean_token(tokens[i])]
+        has_unit = True
+        i += 1
+        if i < len(tokens) and _clean_token(tokens[i]) in FRACTION_SUFFIXES:
+            qty = (qty or 1) + FRACTION_SUFFIXES[_clean_token(tokens[i])]
+            i += 1
+    return qty, unit, factor, has_unit, tokens[i:]
+
+
+def parse_ingredient_text(line):
+    """
+    מפענח שורה חופשית ("1 וחצי כוסות קמח", "2 ביצים", "½ tsp salt") ל-{amount, unit, ingredient}.
+    הכמות מומרת ליחידה מ-ALLOWED_UNITS (כוס -> 240 מ''ל, ק"ג -> 1000 גרם). שם המצרך נשאר כפי שנכתב.
+    כמות מורכבת ("2 כפות + 1 כפית") מחושבת ביחידה הראשונה דרך WEIGHT_CONVERTER. כשאין המרה בין
+    היחידות (יחידה + גרם) נשארת הכמות הראשונה.
+    """
+    qty, unit, factor, has_unit, tokens = _split_quantity(line)
+    amount = (1 if qty is None else qty) * factor
+    while qty is not None and tokens and _clean_token(tokens[0]) in COMPOUND_JOINERS:
+        more_qty, more_unit, more_factor, more_has_unit, rest = _split_quantity(" ".join(tokens[1:]))
+        if more_qty is None and not more_has_unit:
+            break
+        more_qty = 1 if more_qty is None else more_qty
+        if not has_unit and more_has_unit:
+            # "1 + 1/2 כוס" - היחידה נכתבה רק בסוף
+            amount, unit, has_unit = amount * more_factor, more_unit, True
+        more_amount = more_qty * more_factor
+        if more_unit == unit:
+            amount += more_amount
+        elif more_unit in WEIGHT_CONVERTER and unit in WEIGHT_CONVERTER:
+            amount += more_amount * WEIGHT_CONVERTER[more_unit] / WEIGHT_CONVERTER[unit]
+        tokens = rest
+    if tokens and _clean_token(tokens[0]) in ("של", "of"):
+        tokens = tokens[1:]
+
+    name = " ".join(tokens).strip(" ,.-:")
+    return {"amount": round(float(amount), 2), "unit": unit, "ingredient": name or line.strip()}
+
+
+def _trigrams(text):
+    """טריגרמות של כל מילה בנפרד, עם ריפוד (כמו pg_trgm): "  מל", " מלפ", ..."""
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def build_ingredient_matcher(ingredients_db):
+    """
+    אינדקס טריגרמות לשמות המצרכים במאגר, לחיפוש מקורב.
+    כל מצרך נכנס פעמיים: בשמו המלא ובשם בלי הסוגריים ("חזה עוף (חי)" -> "חזה עוף").
+    """
+    matcher = {"exact": {}, "names": [], "sizes": [], "postings": {}}
+    for name in ingredients_db:
+        for variant in {name, name.split("(")[0]}:
+            key = " ".join(tokenize(variant))
+            if not key:
+                continue
+            matcher["exact"].setdefault(key, name)
+            grams = _trigrams(variant)
+            vid = len(matcher["names"])
+            matcher["names"].append(name)
+            matcher["sizes"].append(len(grams))
+            for gram in grams:
+                matcher["postings"].setdefault(gram, []).append(vid)
+    return matcher
+
+
+def match_ingredient(matcher, name, threshold=FUZZY_MATCH_THRESHOLD):
+    """שם המצרך במאגר שהכי דומה ל-name, או None אם אין דומה מספיק."""
+    exact = matcher["exact"].get(" ".join(tokenize(name)))
+    if exact is not None:
+        return exact
+    grams = _trigrams(name)
+    if not grams:
+        return None
+    common = {}
+    for gram in grams:
+        for vid in matcher["postings"].get(gram, ()):
+            common[vid] = common.get(vid, 0) + 1
+    best, best_score = None, threshold
+    for vid, count in common.items():
+        size = matcher["sizes"][vid]
+        # ממוצע של דמיון Dice ושל החלק משם המצרך שמופיע בשורה (כך "חזה עוף טרי חתוך" עדיין מתאים)
+        score = (2 * count / (len(grams) + size) + count / size) / 2
+        if score >= best_score:
+            best, best_score = matcher["names"][vid], score
+    return best
+
+
+def parse_imported_ingredients(lines, matcher):
+    """שורות מצרכים חופשיות -> מצרכים מפורקים, עם שם המצרך מהמאגר כשנמצאה התאמה."""
+    ingredients = []
+    for line in lines:
+        if not line.strip():
+            continue
+        ing = parse_ingredient_text(line)
+        matched = match_ingredient(matcher, ing["ingredient"])
+        if matched is not None:
+            ing["ingredient"] = matched
+        ingredients.append(ing)
+    return ingredients
+
+
+def format_ingredient(ing):
+    return f"{ing['amount']} {ing['unit']} {ing['ingredient']}"
+
+
+def migrate_recipe_ingredients(recipes_list):
+    """ממיר שורות מצרכים ישנות (מחרוזות) למבנה מפורק. מחזיר True אם משהו הומר."""
+    migrated = False
+    for recipe in recipes_list:
+        ings = recipe.get('ingredients', [])
+        if any(isinstance(ing, str) for ing in ings):
+            recipe['ingredients'] = [parse_ingredient_line(ing) if isinstance(ing, str) else ing for ing in ings]
+            migrated = True
+    return migrated
+
+
+def parse_ingredients_list(ingredients):
+    """ממיר את רשימת המצרכים המפורקת של מתכון לטבלה לעורך / לחישוב."""
+    return pd.DataFrame({
+        "שם המצרך": [ing["ingredient"] for ing in ingredients],
+        "כמות": [ing["amount"] for ing in ingredients],
+        "יחידה": [ing["unit"] for ing in ingredients],
+    })
+
+
+def flatten_ingredient_lines(ingredients_lists):
+    """משטח את רשימות המצרכים של מתכונים רבים לטבלה עמודתית אחת (עמודת recipe = מיקום המתכון)."""
+    lines = pd.Series(list(ingredients_lists), dtype=object).explode().dropna()
+    if lines.empty:
+        return pd.DataFrame(columns=["recipe", "שם המצרך", "כמות", "יחידה"])
+
+    records = pd.DataFrame(lines.tolist(), columns=["ingredient", "amount", "unit"])
+    return pd.DataFrame({
+        "recipe": lines.index.to_numpy(dtype=np.int64),
+        "שם המצרך": records["ingredient"].to_numpy(dtype=object),
+        "כמות": records["amount"].to_numpy(dtype=float),
+        "יחידה": records["unit"].to_numpy(dtype=object),
+    })
+
+
+def ingredients_db_arrays(ingredients_db):
+    """ממיר את מאגר המצרכים למערכים: אינדקס שמות, מטריצת ערכים (n x 4) ומסכת 'יחידה'."""
+    names = pd.Index(list(ingredients_db.keys()), dtype=object)
+    vals = np.array([list(d["vals"][:4]) for d in ingredients_db.values()], dtype=float).reshape(-1, 4)
+    is_unit = np.array([d.get("measure_type", "100g") == "unit" for d in ingredients_db.values()], dtype=bool)
+    return names, vals, is_unit
+
+
+def calculate_nutrition_batch(df_lines, n_recipes, ingredients_db, db_arrays=None):
+    """
+    מחשב ערכים תזונתיים לכל המתכונים בבת אחת.
+    df_lines - טבלה שטוחה (recipe, שם המצרך, כמות, יחידה). מחזיר DataFrame עם cal/pro/carb/fat לכל מתכון.
+    """
+    totals = np.zeros((n_recipes, 3))
+    if n_recipes and not df_lines.empty and ingredients_db:
+        names, vals, is_unit = db_arrays if db_arrays is not None else ingredients_db_arrays(ingredients_db)
+
+        pos = names.get_indexer(df_lines["שם המצרך"].to_numpy(dtype=object))
+        amounts = pd.to_numeric(df_lines["כמות"], errors="coerce").to_numpy(dtype=float)
+        units = df_lines["יחידה"].to_numpy(dtype=object)
+        found = pos >= 0
+
+        # חוקי ההמרה: מצרך "unit" נספר רק ביחידות, מצרך "100g" מומר לגרמים דרך WEIGHT_CONVERTER
+        unit_item = np.zeros(len(pos), dtype=bool)
+        unit_item[found] = is_unit[pos[found]]
+        conv = pd.Series(units, dtype=object).map(WEIGHT_CONVERTER).fillna(1).to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            ratio = np.where(unit_item, np.where(units == "יחידה", amounts, 0.0), amounts * conv / 100)
+            mask = found & (amounts > 0) & (ratio > 0)
+
+        groups = df_lines["recipe"].to_numpy(dtype=np.int64)[mask]
+        item_vals = vals[pos[mask]]
+        for k in range(3):
+            totals[:, k] = np.bincount(groups, weights=item_vals[:, k + 1] * ratio[mask], minlength=n_recipes)
+
+    total_cal = (totals[:, 0] * 4) + (totals[:, 1] * 4) + (totals[:, 2] * 9)
+    return pd.DataFrame({
+        "cal": total_cal.astype(np.int64),
+        "pro": totals[:, 0].astype(np.int64),
+        "carb": totals[:, 1].astype(np.int64),
+        "fat": totals[:, 2].astype(np.int64),
+    })
+
+
+def calculate_nutrition(df_ingredients, ingredients_db):
+    """
+    ערכים תזונתיים למתכון בודד (טופס / ייבוא). אותם חוקים כמו calculate_nutrition_batch, אבל בלולאה
+    על השורות עם חיפוש במילון: למתכון אחד זה זול יותר מבניית המערכים של כל המאגר.
+    """
+    if df_ingredients.empty: return {"cal": 0, "pro": 0, "carb": 0, "fat": 0}
+
+    pro = carb = fat = 0.0
+    amounts = pd.to_numeric(df_ingredients["כמות"], errors="coerce")
+    for name, amount, unit in zip(df_ingredients["שם המצרך"], amounts, df_ingredients["יחידה"]):
+        item = ingredients_db.get(name)
+        if item is None or not amount > 0:
+            continue
+        if item.get("measure_type", "100g") == "unit":
+            ratio = amount if unit == "יחידה" else 0.0
+        else:
+            ratio = amount * WEIGHT_CONVERTER.get(unit, 1) / 100
+        if ratio > 0:
+            vals = item["vals"]
+            pro += vals[1] * ratio
+            carb += vals[2] * ratio
+            fat += vals[3] * ratio
+
+    total_cal = (pro * 4) + (carb * 4) + (fat * 9)
+    return {"cal": int(total_cal), "pro": int(pro), "carb": int(carb), "fat": int(fat)}
+
+
+def recalc_all_recipes(recipes_list, ingredients_db, db_arrays=None):
+    df_lines = flatten_ingredient_lines(r['ingredients'] for r in recipes_list)
+    results = calculate_nutrition_batch(df_lines, len(recipes_list), ingredients_db, db_arrays)
+    for recipe, cal, pro, carb, fat in zip(recipes_list, results["cal"].tolist(), results["pro"].tolist(),
+                                           results["carb"].tolist(), results["fat"].tolist()):
+        recipe['calories'] = cal
+        recipe['protein'] = pro
+        recipe['carbs'] = carb
+        recipe['fats'] = fat
+    return len(recipes_list)
+
+
+# --- רשימת קניות ---
+
+SHOPPING_COLUMNS = ["שם המצרך", "כמות", "יחידה", "מתכונים"]
+
+
+def build_shopping_list(items, ingredients_db):
+    """
+    רשימת קניות מצטברת. items - זוגות (מתכון, מכפיל מנות).
+    מצרך "100g" מומר לגרמים דרך WEIGHT_CONVERTER (ונשאר במ''ל אם כל השורות שלו במ''ל), מצרך "unit"
+    נספר ביחידות, ושורה שאי אפשר להמיר נשארת ביחידה שלה. הסכימה היא group-by אחד על כל השורות.
+    """
+    items = list(items)
+    df_lines = flatten_ingredient_lines(recipe.get('ingredients', []) for recipe, _ in items)
+    if df_lines.empty:
+        return pd.DataFrame(columns=SHOPPING_COLUMNS)
+
+    multipliers = np.array([float(servings) for _, servings in items], dtype=float)
+    recipe_pos = df_lines["recipe"].to_numpy(dtype=np.int64)
+    amounts = np.nan_to_num(df_lines["כמות"].to_numpy(dtype=float)) * multipliers[recipe_pos]
+    names = df_lines["שם המצרך"].to_numpy(dtype=object)
+    units = df_lines["יחידה"].to_numpy(dtype=object)
+
+    # מצרך שלא במאגר מטופל כמו "100g"
+    db_names, _, db_is_unit = ingredients_db_arrays(ingredients_db)
+    pos = db_names.get_indexer(names)
+    is_unit = np.zeros(len(pos), dtype=bool)
+    is_unit[pos >= 0] = db_is_unit[pos[pos >= 0]]
+    conv = pd.Series(units, dtype=object).map(WEIGHT_CONVERTER).to_numpy(dtype=float)
+    convertible = ~is_unit & ~np.isnan(conv)
+    norm_amounts = np.where(convertible, amounts * np.nan_to_num(conv), amounts)
+    norm_units = np.where(convertible, "גרם", units).astype(object)
+
+    lines = pd.DataFrame({"שם המצרך": names, "יחידה": norm_units, "כמות": norm_amounts, "recipe": recipe_pos})
+    ml_only = pd.Series(units[convertible] == "מ''ל").groupby(names[convertible]).all()
+    is_ml = convertible & lines["שם המצרך"].isin(ml_only.index[ml_only.to_numpy()]).to_numpy()
+    lines.loc[is_ml, "יחידה"] = "מ''ל"
+    lines = lines[lines["שם המצרך"].astype(bool)]
+
+    shopping = lines.groupby(["שם המצרך", "יחידה"], sort=True).agg(
+        כמות=("כמות", "sum"), מתכונים=("recipe", "nunique")).reset_index()
+    shopping["כמות"] = shopping["כמות"].round(2)
+    return shopping[SHOPPING_COLUMNS]
+
+
+def shopping_list_csv(shopping):
+    # BOM בתחילת הקובץ, כדי שאקסל יפתח את העברית נכון
+    return shopping[SHOPPING_COLUMNS].to_csv(index=False).encode("utf-8-sig")
+
+
+def shopping_list_text(shopping):
+    return "\n".join(f"☐ {amount:g} {unit} {name}" for name, amount, unit in
+                     zip(shopping["שם המצרך"], shopping["כמות"], shopping["יחידה"]))
+
+
+def new_recipe_id():
+    return uuid.uuid4().hex
+
+
+def migrate_recipe_ids(recipes_list):
+    """מוסיף מזהה קבוע וייחודי לכל מתכון שאין לו (או שהמזהה שלו כפול). מחזיר True אם משהו השתנה."""
+    migrated = False
+    seen = set()
+    for recipe in recipes_list:
+        if not recipe.get('id') or recipe['id'] in seen:
+            recipe['id'] = new_recipe_id()
+            migrated = True
+        seen.add(recipe['id'])
+    return migrated
+
+
+def build_ingredient_index(recipes_list):
+    """אינדקס הפוך: שם מצרך -> קבוצת מזהי המתכונים שמשתמשים בו."""
+    flat = flatten_ingredient_lines(r['ingredients'] for r in recipes_list)
+    ids = [r['id'] for r in recipes_list]
+    index = {}
+    for name, pos in zip(flat["שם המצרך"].tolist(), flat["recipe"].tolist()):
+        index.setdefault(name, set()).add(ids[pos])
+    return index
+
+
+def ingredient_index_add(index, recipe):
+    for ing in recipe['ingredients']:
+        index.setdefault(ing['ingredient'], set()).add(recipe['id'])
+
+
+def ingredient_index_remove(index, recipe):
+    for ing in recipe['ingredients']:
+        ids = index.get(ing['ingredient'])
+        if ids is not None:
+            ids.discard(recipe['id'])
+            if not ids:
+                del index[ing['ingredient']]
+
+
+def diff_ingredients_db(old_db, new_db):
+    """מחזיר את שמות המצרכים שנוספו, נמחקו או שהערכים / סוג החישוב שלהם השתנו."""
+    changed = set(old_db.keys()) ^ set(new_db.keys())
+    for name in old_db.keys() & new_db.keys():
+        old_item, new_item = old_db[name], new_db[name]
+        if (list(old_item["vals"]) != list(new_item["vals"])
+                or old_item.get("measure_type", "100g") != new_item.get("measure_type", "100g")):
+            changed.add(name)
+    return changed
+
+
+def recipes_using(ingredient_index, names):
+    """מזהי המתכונים שמשתמשים באחד המצרכים names (לפי האינדקס ההפוך)."""
+    affected = set()
+    for name in names:
+        affected |= ingredient_index.get(name, set())
+    return affected
+
+
+def recalc_changed_recipes(recipes_list, positions, ingredient_index, changed_names, ingredients_db):
+    """מחשב מחדש רק את המתכונים שמשתמשים במצרכים שהשתנו. מחזיר את מספר המתכונים שעודכנו."""
+    affected = recipes_using(ingredient_index, changed_names)
+    return recalc_all_recipes([recipes_list[positions[rid]] for rid in affected if rid in positions], ingredients_db)
+
+
+# --- עריכת מאגר המצרכים לפי השינויים בטבלה ---
+
+# סדר העמודות בטבלת העריכה (RTL: שם המצרך אחרון, מימין)
+INGREDIENT_EDITOR_COLUMNS = ["שומן", "פחמימה", "חלבון", "קלוריות (מחושב)", "סוג חישוב", "שם המצרך"]
+MEASURE_TYPE_LABELS = {"100g": "100 גרם", "unit": "יחידה"}
+
+
+def ingredients_frame(ingredients_db):
+    """טבלת העריכה של מאגר המצרכים, שורה לכל מצרך לפי סדר המאגר."""
+    items = list(ingredients_db.values())
+    return pd.DataFrame({
+        "שומן": [item['vals'][3] for item in items],
+        "פחמימה": [item['vals'][2] for item in items],
+        "חלבון": [item['vals'][1] for item in items],
+        "קלוריות (מחושב)": [item['vals'][0] for item in items],
+        "סוג חישוב": [MEASURE_TYPE_LABELS.get(item.get("measure_type", "100g"), "יחידה") for item in items],
+        "שם המצרך": list(ingredients_db.keys()),
+    }, columns=INGREDIENT_EDITOR_COLUMNS)
+
+
+def _editor_number(value):
+    # תא שרוקן בטבלה מגיע כ-None
+    if value is None or (isinstance(value, float) and value != value):
+        return 0
+    return value
+
+
+def _ingredient_from_row(row, base=None):
+    """מצרך למאגר מתוך שורה בטבלה, או מתוך התאים ששונו בשורה קיימת (מעל base). הקלוריות מחושבות מחדש."""
+    vals = list(base["vals"]) if base else [0, 0, 0, 0]
+    measure_type = base.get("measure_type", "100g") if base else "100g"
+    for col, i in (("חלבון", 1), ("פחמימה", 2), ("שומן", 3)):
+        if col in row:
+            vals[i] = _editor_number(row[col])
+    if row.get("סוג חישוב"):
+        measure_type = "100g" if row["סוג חישוב"] == "100 גרם" else "unit"
+    vals[0] = (vals[1] * 4) + (vals[2] * 4) + (vals[3] * 9)
+    return {"vals": vals, "measure_type": measure_type}
+
+
+def ingredient_edits(ingredients_db, names, delta):
+    """
+    מתרגם את השינויים מטבלת העריכה (edited_rows / added_rows / deleted_rows של st.data_editor)
+    לשינויים במאגר. names - שמות המצרכים לפי סדר השורות בטבלה שהוצגה.
+    מחזיר (upserts, removed, renames): מצרכים חדשים / מעודכנים, שמות שנמחקו ושינויי שם (ישן -> חדש).
+    התוצאה זהה לשמירה המלאה של הטבלה: שורה שהשם שלה נמחק נמחקת, וכשכמה שורות מגיעות לאותו שם
+    קובעת השורה האחרונה בטבלה (שורות חדשות אחרי הקיימות). המאגר עצמו לא משתנה.
+    """
+    deleted = {int(pos) for pos in delta.get("deleted_rows", [])}
+    edited = sorted((int(pos), changes) for pos, changes in delta.get("edited_rows", {}).items()
+                    if int(pos) not in deleted)
+    removed = {names[pos] for pos in deleted}
+    renames = {}
+    # שם -> הערך מהשורה האחרונה (לפי סדר הטבלה) ששמה הסופי הוא השם הזה, מבין השורות שנערכו / נוספו
+    upserts = {}
+    for pos, changes in edited:
+        old_name = names[pos]
+        new_name = changes.get("שם המצרך", old_name)
+        if new_name != old_name:
+            removed.add(old_name)
+            if new_name:
+                renames[old_name] = new_name
+        if new_name:
+            upserts[new_name] = (pos, _ingredient_from_row(changes, ingredients_db.get(old_name)))
+    for i, row in enumerate(delta.get("added_rows", [])):
+        if row.get("שם המצרך"):
+            upserts[row["שם המצרך"]] = (len(names) + i, _ingredient_from_row(row))
+
+    edited_positions = {pos for pos, _ in edited} | deleted
+    name_positions = {name: pos for pos, name in enumerate(names)}
+    for name, (pos, item) in list(upserts.items()):
+        # שורה שלא נערכה ועדיין נושאת את השם, ובאה אחרי השורה ששמה שונה אליו - היא קובעת
+        own = name_positions.get(name)
+        if own is not None and own not in edited_positions and own > pos:
+            item = ingredients_db[name]
+        upserts[name] = item
+    # מצרך שנמחק / שונה שמו ושורה אחרת קיבלה את שמו - מתעדכן ולא נמחק
+    return upserts, removed - upserts.keys(), renames
+
+
+def merge_ingredients(ingredients_db, upserts, removed, renames=None):
+    """מאגר חדש עם השינויים: מצרך ששמו שונה נשאר במקומו, מצרכים חדשים נוספים בסוף."""
+    renames = renames or {}
+    merged = {}
+    for name, item in ingredients_db.items():
+        if renames.get(name) in upserts:
+            merged[renames[name]] = upserts[renames[name]]
+        elif name not in removed:
+            merged[name] = upserts.get(name, item)
+    for name, item in upserts.items():
+        merged.setdefault(name, item)
+    return merged
+
+
+def rename_recipe_ingredients(recipe, renames):
+    """עותק של המתכון עם שמות המצרכים החדשים בשורות המצרכים (המקור לא משתנה)."""
+    return {**recipe, 'ingredients': [{**ing, 'ingredient': renames.get(ing['ingredient'], ing['ingredient'])}
+                                      for ing in recipe['ingredients']]}
+
+
+def category_edits(categories, delta):
+    """
+    רשימת הקטגוריות אחרי השינויים מטבלת העריכה (אותו מבנה delta כמו בטבלת המצרכים).
+    קטגוריה שהשם שלה נמחק יוצאת מהרשימה. מחזיר (הרשימה החדשה, האם השתנתה).
+    """
+    deleted = {int(pos) for pos in delta.get("deleted_rows", [])}
+    edited = {int(pos): changes for pos, changes in delta.get("edited_rows", {}).items()}
+    new_list = []
+    for pos, name in enumerate(categories):
+        if pos in deleted:
+            continue
+        name = edited.get(pos, {}).get("קטגוריה", name)
+        if name:
+            new_list.append(name)
+    new_list += [row["קטגוריה"] for row in delta.get("added_rows", []) if row.get("קטגוריה")]
+    return new_list, new_list != list(categories)
+
+
+# --- אינדקס חיפוש חופשי ---
+
+# ניקוד וטעמים (U+0591-U+05C7) נמחקים, אותיות סופיות מקופלות לרגילות
+_NIQQUD_RE = re.compile(r"[\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]")
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    text = _NIQQUD_RE.sub("", str(text)).lower()
+    return text.translate(_FINAL_LETTERS)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def recipe_tokens(recipe):
+    """המילים שעליהן מחפשים: שם, הוראות הכנה ושמות המצרכים."""
+    tokens = set(tokenize(recipe.get('name', '')))
+    tokens.update(tokenize(recipe.get('instructions', '')))
+    for ing in recipe.get('ingredients', []):
+        tokens.update(tokenize(ing['ingredient']))
+    return tokens
+
+
+def build_search_index(recipes_list):
+    """אינדקס הפוך: מילה מנורמלת -> מזהי המתכונים, ואוצר מילים ממוין לחיפוש לפי תחילית."""
+    postings = {}
+    for recipe in recipes_list:
+        for token in recipe_tokens(recipe):
+            postings.setdefault(token, set()).add(recipe['id'])
+    return {"postings": postings, "vocab": sorted(postings)}
+
+
+def search_index_add(index, recipe):
+    postings, vocab = index["postings"], index["vocab"]
+    for token in recipe_tokens(recipe):
+        if token not in postings:
+            postings[token] = set()
+            bisect.insort(vocab, token)
+        postings[token].add(recipe['id'])
+
+
+def search_index_remove(index, recipe):
+    postings, vocab = index["postings"], index["vocab"]
+    for token in recipe_tokens(recipe):
+        ids = postings.get(token)
+        if ids is None:
+            continue
+        ids.discard(recipe['id'])
+        if not ids:
+            del postings[token]
+            del vocab[bisect.bisect_left(vocab, token)]
+
+
+def search_recipes(index, query):
+    """מחזיר את מזהי המתכונים שבהם כל מילה בשאילתה היא תחילית של מילה כלשהי במתכון."""
+    postings, vocab = index["postings"], index["vocab"]
+    result = None
+    for prefix in sorted(set(tokenize(query)), key=len, reverse=True):
+        matches = set()
+        i = bisect.bisect_left(vocab, prefix)
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            matches |= postings[vocab[i]]
+            i += 1
+        result = matches if result is None else result & matches
+        if not result:
+            return set()
+    return result if result is not None else set()
+
+
+def build_category_index(recipes_list):
+    """קטגוריה -> קבוצת מזהי המתכונים שבה."""
+    index = {}
+    for recipe in recipes_list:
+        index.setdefault(recipe.get('category'), set()).add(recipe['id'])
+    return index
+
+
+def category_index_add(index, recipe):
+    index.setdefault(recipe.get('category'), set()).add(recipe['id'])
+
+
+def category_index_remove(index, recipe):
+    ids = index.get(recipe.get('category'))
+    if ids is not None:
+        ids.discard(recipe['id'])
+
+
+def filter_by_categories(category_index, categories, result=None):
+    """מזהי המתכונים שבאחת מהקטגוריות, בחיתוך עם result (None = עוד לא סוננו)."""
+    in_categories = set().union(*(category_index.get(cat, set()) for cat in categories))
+    return in_categories if result is None else result & in_categories
+
+
+def filter_by_ingredients(ingredient_index, ingredients, result=None):
+    """מזהי המתכונים שמכילים את כל המצרכים, בחיתוך עם result (None = עוד לא סוננו)."""
+    # מתחילים מהרשימה הקצרה ביותר כדי שהחיתוך יהיה זול
+    for posting in sorted((ingredient_index.get(name, set()) for name in ingredients), key=len):
+        result = set(posting) if result is None else result & posting
+        if not result:
+            break
+    return result
+
+
+# --- פח אשפה ---
+
+def trash_expired(trash, max_age=None, max_items=None, now=None):
+    """
+    מזהי המתכונים בפח שצריך למחוק סופית: שנמחקו לפני יותר מ-max_age שניות,
+    ומעבר ל-max_items המתכונים שנמחקו אחרונים. מתכון בלי deleted_at (מלפני שנשמר זמן המחיקה)
+    לא פג לפי גיל, ובספירה הוא נחשב הישן ביותר.
+    """
+    if not trash:
+        return []
+    stamps = np.array([item.get('deleted_at') or 0 for item in trash], dtype=float)
+    expired = np.zeros(len(trash), dtype=bool)
+    if max_age is not None:
+        now = time.time() if now is None else now
+        expired |= (stamps > 0) & (stamps < now - max_age)
+    if max_items is not None and len(trash) > max_items:
+        expired[trash_order(stamps)[max_items:]] = True
+    return [trash[pos]['id'] for pos in np.flatnonzero(expired)]
+
+
+def trash_order(stamps):
+    """מיקומי הפריטים בפח מהחדש לישן לפי זמני המחיקה (יציב - בזמן שווה נשמר סדר הרשימה)."""
+    return np.argsort(-np.asarray(stamps, dtype=float), kind="stable")
+
+
+# --- זיהוי מתכונים כפולים ---
+
+def recipe_fingerprint(recipe):
+    """טביעת אצבע: שם מנורמל + קבוצת המצרכים. מתכונים עם אותה טביעה כנראה כפולים."""
+    name = " ".join(tokenize(recipe.get('name', '')))
+    ingredients = sorted({" ".join(tokenize(ing['ingredient'])) for ing in recipe.get('ingredients', [])})
+    return hashlib.sha1("\n".join([name] + ingredients).encode('utf-8')).hexdigest()
+
+
+def build_fingerprint_index(recipes_list):
+    """טביעת אצבע -> קבוצת מזהי המתכונים."""
+    index = {}
+    for recipe in recipes_list:
+        index.setdefault(recipe_fingerprint(recipe), set()).add(recipe['id'])
+    return index
+
+
+def fingerprint_index_add(index, recipe):
+    index.setdefault(recipe_fingerprint(recipe), set()).add(recipe['id'])
+
+
+def fingerprint_index_remove(index, recipe):
+    ids = index.get(recipe_fingerprint(recipe))
+    if ids is not None:
+        ids.discard(recipe['id'])
+
+
+# האינדקסים שמוחזקים ב-RecordList של המתכונים: שם -> (בנייה, הוספת מתכון, הסרת מתכון)
+RECIPE_INDEXES = {
+    "ingredients": (build_ingredient_index, ingredient_index_add, ingredient_index_remove),
+    "category": (build_category_index, category_index_add, category_index_remove),
+    "search": (build_search_index, search_index_add, search_index_remove),
+    "fingerprint": (build_fingerprint_index, fingerprint_index_add, fingerprint_index_remove),
+}
+
+
+def build_recipe_summary(recipes_list):
+    """טבלת תקציר קומפקטית: רק עמודות התצוגה, בלי ההוראות ורשימות המצרכים."""
+    summary = pd.DataFrame.from_records(recipes_list, columns=SUMMARY_COLUMNS)
+    macros = SUMMARY_COLUMNS[4:]
+    summary[macros] = summary[macros].fillna(0)
+    return summary
+
+
+# --- שאילתות טווח ומיון לפי ערכים תזונתיים ---
+
+MACRO_FIELDS = ["calories", "protein", "carbs", "fats"]
+# יחסים נגזרים: גרם חלבון ל-100 קלוריות, ואחוז הקלוריות שמגיע מפחמימה / משומן
+DERIVED_MACROS = ["protein_density", "carb_share", "fat_share"]
+MACRO_KEYS = MACRO_FIELDS + DERIVED_MACROS
+
+
+def macro_columns(summary):
+    """מפתח -> מערך float לכל שורה בטבלת התקציר (כולל היחסים הנגזרים; 0 במתכון בלי קלוריות)."""
+    cols = {key: pd.to_numeric(summary[key], errors="coerce").fillna(0).to_numpy(dtype=float) for key in MACRO_FIELDS}
+    calories = cols["calories"]
+    safe = np.where(calories > 0, calories, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cols["protein_density"] = np.where(calories > 0, cols["protein"] * 100 / safe, 0.0)
+        cols["carb_share"] = np.where(calories > 0, cols["carbs"] * 4 * 100 / safe, 0.0)
+        cols["fat_share"] = np.where(calories > 0, cols["fats"] * 9 * 100 / safe, 0.0)
+    return cols
+
+
+def build_macro_index(summary):
+    """
+    אינדקס עמודתי על טבלת התקציר: לכל מפתח - הערכים, סדר המיקומים הממוין והערכים הממוינים.
+    טווח נמצא בחיפוש בינארי על המערך הממוין, ו-top-k הוא הקצה של סדר המיון.
+    """
+    index = {"ids": pd.Index(summary["id"].to_numpy(dtype=object)), "size": len(summary)}
+    for key, values in macro_columns(summary).items():
+        order = np.argsort(values, kind="stable")
+        index[key] = (values, order, values[order])
+    return index
+
+
+def _positions_mask(index, positions):
+    mask = np.zeros(index["size"], dtype=bool)
+    mask[positions] = True
+    return mask
+
+
+def ids_to_mask(index, recipe_ids):
+    """מסכה בוליאנית על שורות התקציר מתוך קבוצת מזהים (מזהים שלא בטבלה מדולגים)."""
+    positions = index["ids"].get_indexer(list(recipe_ids))
+    return _positions_mask(index, positions[positions >= 0])
+
+
+def macro_range_positions(index, ranges):
+    """
+    המיקומים (ממוינים) של השורות שבכל הטווחים. ranges: {מפתח: (מינימום, מקסימום)}, None = בלי גבול.
+    מתחילים מהטווח הצר ביותר (לפי החיפוש הבינארי) ובודקים רק את השורות שבו מול שאר הטווחים.
+    מחזיר None אם אין אף טווח.
+    """
+    spans = []
+    for key, (low, high) in ranges.items():
+        if low is None and high is None:
+            continue
+        values, order, sorted_values = index[key]
+        start = 0 if low is None else int(np.searchsorted(sorted_values, low, side="left"))
+        stop = len(sorted_values) if high is None else int(np.searchsorted(sorted_values, high, side="right"))
+        spans.append((max(0, stop - start), key, low, high, start, stop))
+    if not spans:
+        return None
+    spans.sort(key=lambda span: span[0])
+    _, key, _, _, start, stop = spans[0]
+    positions = index[key][1][start:stop]
+    for _, key, low, high, _, _ in spans[1:]:
+        if not len(positions):
+            break
+        values = index[key][0][positions]
+        keep = np.ones(len(positions), dtype=bool)
+        if low is not None:
+            keep &= values >= low
+        if high is not None:
+            keep &= values <= high
+        positions = positions[keep]
+    return np.sort(positions)
+
+
+def macro_top_k(index, key, k=None, mask=None, descending=True):
+    """
+    מיקומי השורות ממוינים לפי key (רק השורות שב-mask, אם יש), לכל היותר k.
+    עם k ומסכה עוברים על סדר המיון בבלוקים ועוצרים כשנאספו k תוצאות.
+    """
+    order = index[key][1]
+    if descending:
+        order = order[::-1]
+    if mask is None:
+        return order[:k] if k else order
+    if not k:
+        return order[mask[order]]
+    found = []
+    count = 0
+    block = max(4 * k, 1024)
+    for start in range(0, len(order), block):
+        chunk = order[start:start + block]
+        hits = chunk[mask[chunk]]
+        found.append(hits)
+        count += len(hits)
+        if count >= k:
+            break
+    return np.concatenate(found)[:k] if found else order[:0]
+
+
+def macro_bounds(index, key):
+    """(מינימום, מקסימום) של key בכל הספרייה, מעוגלים לשלמים כלפי חוץ - לגבולות של סליידר."""
+    sorted_values = index[key][2]
+    if not len(sorted_values):
+        return 0, 0
+    return int(np.floor(sorted_values[0])), int(np.ceil(sorted_values[-1]))
+
+
+def query_macros(index, ranges, sort_key=None, k=None, descending=True, mask=None):
+    """
+    שאילתה משולבת: השורות שב-mask (תוצאת שאר המסננים, None = הכל) ובכל הטווחים,
+    ממוינות לפי sort_key (או בסדר המקורי), לכל היותר k. מחזיר מערך מיקומים בטבלת התקציר.
+    """
+    in_range = macro_range_positions(index, ranges)
+    if in_range is not None:
+        range_mask = _positions_mask(index, in_range)
+        mask = range_mask if mask is None else mask & range_mask
+    if sort_key:
+        return macro_top_k(index, sort_key, k, mask, descending)
+    positions = np.arange(index["size"]) if mask is None else np.flatnonzero(mask)
+    return positions[:k] if k else positions
+
+
+# --- תכנון ארוחות ---
+
+# החלק של כל ארוחה מהיעד היומי. קטגוריה שלא מופיעה כאן מקבלת חלק שווה ממה שנשאר
+DEFAULT_SLOT_SHARES = {"בוקר": 0.25, "צהריים": 0.35, "ערב": 0.3, "נשנוש": 0.1}
+# מנות אפשריות: מינימום, מקסימום, קפיצה
+MEAL_PLAN_SERVINGS = (0.5, 3.0, 0.5)
+# כמה מועמדים לכל ארוחה נכנסים לחיפוש המקומי, וכמה סבבי שיפור לכל יום
+MEAL_PLAN_CANDIDATES = 200
+MEAL_PLAN_ROUNDS = 4
+
+
+def slot_shares(slots, shares=None):
+    """החלק היומי של כל ארוחה ב-slots (מנורמל לסכום 1). ארוחה שמופיעה פעמיים מתחלקת בחלק שלה."""
+    shares = DEFAULT_SLOT_SHARES if shares is None else shares
+    counts = {slot: slots.count(slot) for slot in slots}
+    known = {slot: shares[slot] for slot in counts if slot in shares}
+    unknown = [slot for slot in counts if slot not in shares]
+    rest = max(0.0, 1.0 - sum(known.values()))
+    for slot in unknown:
+        known[slot] = rest / len(unknown) if rest > 0 else 1.0 / len(counts)
+    values = np.array([known[slot] / counts[slot] for slot in slots], dtype=float)
+    total = values.sum()
+    return values / total if total > 0 else np.full(len(slots), 1.0 / max(1, len(slots)))
+
+
+def _best_servings(macros, residual, weights, servings=MEAL_PLAN_SERVINGS):
+    """לכל שורה - כמות המנות שמקרבת הכי הרבה את macros * מנות ל-residual (ריבועים פחותים), מעוגלת לקפיצה."""
+    low, high, step = servings
+    num = (macros * weights * residual).sum(axis=1)
+    den = (macros * macros * weights).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        best = np.where(den > 0, num / den, 1.0)
+    return np.clip(np.round(best / step) * step, low, high)
+
+
+def _deviation(diff, weights):
+    # סכום ריבועי הסטיות היחסיות מהיעד (יעד 0 = לא נספר)
+    return (diff * diff * weights).sum(axis=-1)
+
+
+def plan_meals(summary, targets, slots, days=7, shares=None, servings=MEAL_PLAN_SERVINGS,
+               candidates=MEAL_PLAN_CANDIDATES, rounds=MEAL_PLAN_ROUNDS):
+    """
+    תפריט ל-days ימים: לכל יום מתכון וכמות מנות לכל ארוחה ב-slots (שמות קטגוריות),
+    כך שסך היום יהיה קרוב ל-targets ({calories / protein / carbs / fats: יעד יומי, 0 = לא משנה}).
+
+    כל המתכונים מדורגים בבת אחת מול היעד של הארוחה (החלק שלה מהיעד היומי). לכל יום נכנסים
+    רק candidates הטובים ביותר לכל ארוחה, ואז מחליפים ארוחה אחרי ארוחה במועמד שמקרב הכי הרבה
+    את סך היום (כולל מנות אופטימליות), עד שאין שיפור. מתכון לא חוזר בתפריט כל עוד יש חלופות.
+    """
+    macros = np.column_stack([pd.to_numeric(summary[k], errors="coerce").fillna(0).to_numpy(dtype=float)
+                              for k in MACRO_FIELDS]) if len(summary) else np.zeros((0, 4))
+    target = np.array([float(targets.get(k) or 0) for k in MACRO_FIELDS])
+    weights = np.where(target > 0, 1.0 / np.maximum(target, 1e-9) ** 2, 0.0)
+    active = max(1, int((target > 0).sum()))
+    categories = summary["category"].to_numpy(dtype=object)
+    usable = macros[:, 0] > 0
+
+    pools = []
+    slot_targets = target * slot_shares(slots, shares)[:, None]
+    for slot, slot_target in zip(slots, slot_targets):
+        positions = np.flatnonzero(usable & (categories == slot))
+        slot_macros = macros[positions]
+        best = _best_servings(slot_macros, slot_target, weights, servings)
+        score = _deviation(slot_macros * best[:, None] - slot_target, weights)
+        order = np.argsort(score, kind="stable")
+        pools.append(positions[order])
+
+    used = np.zeros(len(summary), dtype=bool)
+    plan = []
+    for day in range(days):
+        shortlists = []
+        for pool in pools:
+            fresh = pool[~used[pool]]
+            # נגמרו המתכונים שעוד לא הופיעו - מתחילים לחזור על מתכונים
+            shortlists.append((fresh if len(fresh) else pool)[:candidates])
+        chosen = [None] * len(slots)
+        amounts = np.zeros(len(slots))
+        # ארוחה שעוד לא נבחרה נספרת כאילו היא מגיעה בדיוק לחלק שלה מהיעד, כך שהארוחות הראשונות
+        # לא מנסות לכסות את כל היום לבד (ונתקעות שם, כי הסבבים הבאים משנים ארוחה אחת בכל פעם)
+        contrib = np.where(np.array([len(shortlist) > 0 for shortlist in shortlists])[:, None], slot_targets, 0.0)
+        totals = contrib.sum(axis=0)
+        # הסבב הראשון ממלא את הארוחות אחת אחרי השנייה, והבאים מחליפים ארוחה כשזה משפר את היום
+        for _ in range(rounds):
+            improved = False
+            for i, shortlist in enumerate(shortlists):
+                if not len(shortlist):
+                    continue
+                others = totals - contrib[i]
+                cand_macros = macros[shortlist]
+                cand_servings = _best_servings(cand_macros, target - others, weights, servings)
+                dev = _deviation(others + cand_macros * cand_servings[:, None] - target, weights)
+                # אותו מתכון לא מופיע פעמיים באותו יום
+                dev[np.isin(shortlist, [c for j, c in enumerate(chosen) if j != i and c is not None])] = np.inf
+                best = int(np.argmin(dev))
+                if np.isinf(dev[best]):
+                    continue
+                if chosen[i] is None or dev[best] < _deviation(totals - target, weights) - 1e-12:
+                    chosen[i], amounts[i] = shortlist[best], cand_servings[best]
+                    contrib[i] = macros[chosen[i]] * amounts[i]
+                    totals = others + contrib[i]
+                    improved = True
+            if not improved:
+                break
+        for i, pos in enumerate(chosen):
+            if pos is None:
+                totals = totals - contrib[i]
+
+        meals = []
+        for slot, pos, amount in zip(slots, chosen, amounts):
+            if pos is None:
+                meals.append({"slot": slot, "id": None})
+                continue
+            used[pos] = True
+            row = summary.iloc[pos]
+            meal = {"slot": slot, "id": row["id"], "name": row["name"], "image": row["image"],
+                    "servings": float(amount)}
+            meal.update({k: float(v * amount) for k, v in zip(MACRO_FIELDS, macros[pos])})
+            meals.append(meal)
+        plan.append({
+            "day": day + 1,
+            "meals": meals,
+            "totals": {k: float(v) for k, v in zip(MACRO_FIELDS, totals)},
+            # שורש ממוצע ריבועי הסטיות היחסיות, באחוזים
+            "deviation": float(np.sqrt(_deviation(totals - target, weights) / active) * 100),
+        })
+    return plan
+
+
+# מצב ("full" / "incremental") -> (מפתח חתימה, נתיב ה-ZIP הזמני). משותף לכל הסשנים
+_BACKUP_CACHE = {}
+_BACKUP_CACHE_LOCK = threading.Lock()
+
+
+def backup_signature():
+    """קובץ -> [mtime, גודל] (או מונה השינויים במצב SQLite). None לקובץ שלא קיים."""
+    signature = {}
+    for filename in BACKUP_FILES:
+        stat = _file_stat(filename)
+        signature[filename] = list(stat) if stat is not None else None
+    return signature
+
+
+def read_backup_state():
+    """החתימה של הקבצים בזמן הגיבוי האחרון ({} אם עוד לא היה גיבוי)."""
+    try:
+        with open(BACKUP_STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_backup_zip(path, filenames, manifest=None):
+    # הקבצים נדחסים ישירות מהדיסק לקובץ בדיסק, בלי להחזיק את כולם בזיכרון
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for filename in filenames:
+            if _uses_sqlite(filename):
+                # במצב SQLite הגיבוי נשאר באותו פורמט JSON (ייצוא מלא מהמאגר)
+                data = get_sqlite_store().load(STORAGE_KINDS[filename], None)
+                if data is not None:
+                    zipf.writestr(filename, json.dumps(data, ensure_ascii=False, indent=4))
+            elif os.path.exists(filename):
+                try:
+                    zipf.write(filename)
+                except OSError:
+                    pass
+        if manifest is not None:
+            zipf.writestr(BACKUP_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=4))
+
+
+def create_backup_zip(incremental=False):
+    """
+    מחזיר קובץ פתוח (בינארי) של ה-ZIP של הגיבוי, מקובץ זמני בדיסק - התוכן לא נטען לזיכרון.
+    ה-ZIP נבנה מחדש רק כשקובץ נתונים השתנה מאז הבנייה הקודמת. הקורא סוגר את הקובץ.
+    במצב מצטבר נכנסים רק הקבצים שהשתנו מאז הגיבוי המצטבר הקודם, יחד עם רשימה (manifest) של כל הקבצים,
+    והחתימה נשמרת כבסיס לגיבוי הבא. גיבוי מלא לא מזיז את הבסיס.
+    """
+    signature = backup_signature()
+    if incremental:
+        last_backup = read_backup_state()
+        filenames = [f for f in BACKUP_FILES if signature[f] != last_backup.get(f)]
+        manifest = {"base": last_backup, "files": signature, "included": filenames}
+        cache_key = (json.dumps(signature), json.dumps(last_backup, sort_keys=True))
+    else:
+        filenames, manifest = BACKUP_FILES, None
+        cache_key = (json.dumps(signature), None)
+
+    mode = "incremental" if incremental else "full"
+    with _BACKUP_CACHE_LOCK:
+        cached = _BACKUP_CACHE.get(mode)
+        if cached is None or cached[0] != cache_key or not os.path.exists(cached[1]):
+            fd, path = tempfile.mkstemp(prefix="recipe_backup_", suffix=".zip")
+            os.close(fd)
+            _write_backup_zip(path, filenames, manifest)
+            if cached is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(cached[1])
+            _BACKUP_CACHE[mode] = cached = (cache_key, path)
+        # נפתח תחת הנעילה: בנייה מחדש שמוחקת את הקובץ הקודם לא פוגעת בקורא שכבר פתח אותו
+        backup = open(cached[1], 'rb')
+        if incremental:
+            # הגיבוי המצטבר הבא יכלול רק מה שהשתנה מעכשיו
+            save_json(BACKUP_STATE_FILE, signature)
+    return backup
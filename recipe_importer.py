@@ -0,0 +1,282 @@
+"""
+ייבוא מתכונים מקישורים, גם כמה קישורים במקביל.
+
+הדפים מורדים כאן (עם זמן קצוב, ניסיונות חוזרים והמתנה הולכת וגדלה), ורק ה-HTML
+עובר ל-recipe_scrapers לפענוח. כך אתר איטי לא תוקע את האפליקציה, ואפשר לבדוק הכל
+בלי אינטרנט מול שרת מקומי שמגיש דפי מתכונים שמורים:
+
+    python -m http.server 8000 --directory saved_pages/
+    python recipe_importer.py urls.txt --out imported.jsonl
+"""
+import argparse
+import codecs
+import contextlib
+import hashlib
+import http.client
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from recipe_scrapers import scrape_html
+
+    HAS_SCRAPER = True
+except ImportError:
+    HAS_SCRAPER = False
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+# תשובות שכדאי לנסות שוב (עומס / תקלה זמנית בשרת)
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+USER_AGENT = "Mozilla/5.0 (RecipeBook importer)"
+
+DEFAULT_CACHE_TTL = 7 * 24 * 3600
+DEFAULT_CACHE_ENTRIES = 500
+# פרמטרים שלא משנים את תוכן הדף (מעקב אחרי קמפיינים / שיתופים)
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref"}
+
+
+class FetchError(Exception):
+    """הורדת הדף נכשלה סופית (אחרי כל הניסיונות)."""
+
+    def __init__(self, message, attempts):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+def normalize_url(url):
+    """
+    צורה קנונית של קישור, כך ששני קישורים לאותו דף נותנים אותו מפתח במטמון.
+    קישור שלא ניתן לפרק (פורט לא מספרי, IPv6 שבור) מוחזר כמו שהוא - ההורדה תדווח עליו כשגיאה.
+    """
+    try:
+        parts = urllib.parse.urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port != {"http": 80, "https": 443}.get(scheme):
+        host = f"{host}:{port}"
+    query = sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in TRACKING_PARAMS and not k.startswith("utm_"))
+    # http / https מובילים לאותו מתכון - הסכמה לא נכנסת למפתח
+    return urllib.parse.urlunsplit(("", host, parts.path.rstrip("/") or "/", urllib.parse.urlencode(query), ""))
+
+
+class ImportCache:
+    """
+    מטמון של מתכונים שיובאו, קובץ JSON לכל קישור בתיקייה אחת.
+    שם הקובץ הוא גיבוב של הקישור המנורמל. רשומה פגה אחרי ttl שניות,
+    ומעל max_entries רשומות נמחקות הישנות ביותר.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _entry_path(self, url):
+        digest = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{digest}.json")
+
+    def get(self, url):
+        """המתכון השמור (name / instructions / raw_ingredients), או None אם אין או שפג תוקפו."""
+        try:
+            with open(self._entry_path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return None
+        return entry.get("recipe")
+
+    def put(self, url, recipe):
+        os.makedirs(self.path, exist_ok=True)
+        entry = {"url": normalize_url(url), "fetched_at": time.time(), "recipe": recipe}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._entry_path(url))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """מוחק רשומות שפג תוקפן, ואם עדיין יש יותר מדי - את הישנות ביותר."""
+        try:
+            names = [n for n in os.listdir(self.path) if n.endswith(".json")]
+        except OSError:
+            return
+        now = time.time()
+        entries = []
+        for name in names:
+            full = os.path.join(self.path, name)
+            try:
+                mtime = os.path.getmtime(full)
+            except OSError:
+                continue
+            if now - mtime > self.ttl:
+                with contextlib.suppress(OSError):
+                    os.remove(full)
+            else:
+                entries.append((mtime, full))
+        entries.sort()
+        for _, full in entries[:max(0, len(entries) - self.max_entries)]:
+            with contextlib.suppress(OSError):
+                os.remove(full)
+
+
+def read_url_list(text):
+    """קישורים מטקסט חופשי או מקובץ: שורה לכל קישור, בלי שורות ריקות, הערות (#) וכפילויות."""
+    urls = []
+    for line in text.splitlines():
+        url = line.strip()
+        if url and not url.startswith("#"):
+            urls.append(url)
+    # שני קישורים לאותו דף (www, פרמטרי מעקב, / בסוף) מיובאים פעם אחת, בסדר ההופעה הראשונה
+    first_seen = {}
+    for url in urls:
+        first_seen.setdefault(normalize_url(url), url)
+    return list(first_seen.values())
+
+
+def _known_charset(charset):
+    """קידוד שהשרת הצהיר עליו, או utf-8 אם פייתון לא מכיר אותו (כותרת שגויה לא מפילה את הייבוא)."""
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return "utf-8"
+
+
+def fetch_html(url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """מוריד את הדף ומחזיר (html, מספר ניסיונות). זורק FetchError אם כל הניסיונות נכשלו."""
+    try:
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    except ValueError as e:
+        raise FetchError(f"קישור לא תקין: {url}", 0) from e
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                body = response.read()
+                charset = response.headers.get_content_charset() or "utf-8"
+            return body.decode(_known_charset(charset), errors="replace"), attempt + 1
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt == retries:
+                raise FetchError(f"HTTP {e.code}", attempt + 1) from e
+        # OSError מכסה גם URLError, timeout, ניתוק חיבור ו-ssl.SSLError באמצע הקריאה
+        except (http.client.HTTPException, OSError) as e:
+            if attempt == retries:
+                reason = getattr(e, "reason", e)
+                raise FetchError(f"לא ניתן להוריד את הדף: {reason}", attempt + 1) from e
+        time.sleep(backoff * 2 ** attempt)
+
+
+def parse_recipe_html(html, url):
+    """מפענח את ה-HTML לאותו מבנה שטופס המתכון מקבל (name / instructions / raw_ingredients)."""
+    if not HAS_SCRAPER:
+        raise RuntimeError("חסרה ספריית recipe-scrapers")
+    # supported_only=False: גם אתר שאין לו סקרייפר ייעודי מפוענח לפי ה-schema.org שבדף
+    scraper = scrape_html(html, org_url=url, supported_only=False)
+    return {
+        "name": scraper.title(),
+        "instructions": scraper.instructions(),
+        "raw_ingredients": scraper.ingredients(),
+    }
+
+
+def import_one(url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, cache=None):
+    """
+    מייבא קישור בודד. לא זורק חריגות - התוצאה היא מילון:
+    {"url", "ok", "attempts", "recipe"} בהצלחה או {"url", "ok", "attempts", "error"} בכישלון.
+    עם cache (ImportCache) קישור שכבר יובא לא מורד ומפוענח שוב (attempts = 0, cached = True).
+    """
+    result = {"url": url, "ok": False, "attempts": 0, "cached": False}
+    if cache is not None:
+        recipe = cache.get(url)
+        if recipe is not None:
+            result.update(ok=True, cached=True, recipe=recipe)
+            return result
+    try:
+        html, result["attempts"] = fetch_html(url, timeout, retries, backoff)
+    except FetchError as e:
+        result["attempts"] = e.attempts
+        result["error"] = str(e)
+        return result
+    try:
+        result["recipe"] = parse_recipe_html(html, url)
+        result["ok"] = True
+    except Exception as e:
+        # recipe_scrapers זורקת סוגים רבים של חריגות (אתר לא נתמך, שדה חסר...)
+        result["error"] = f"לא הצלחנו לפענח את המתכון: {e}"
+        return result
+    if cache is not None:
+        with contextlib.suppress(OSError):
+            cache.put(url, result["recipe"])
+    return result
+
+
+def import_urls(urls, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                backoff=DEFAULT_BACKOFF, on_result=None, cache=None):
+    """
+    מייבא רשימת קישורים במקביל (לכל היותר workers בו זמנית) ומחזיר את התוצאות בסדר הקלט.
+    on_result(מספר שהסתיימו, סה"כ, תוצאה) נקרא מהת'רד הקורא אחרי כל קישור, להצגת התקדמות.
+    """
+    results = [None] * len(urls)
+    if not urls:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        futures = {pool.submit(import_one, url, timeout, retries, backoff, cache): i for i, url in enumerate(urls)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # import_one לא אמור לזרוק, אבל קישור בעייתי אחד לא מפיל את כל הייבוא
+                results[i] = {"url": urls[i], "ok": False, "attempts": 0, "cached": False, "error": str(e)}
+            if on_result is not None:
+                on_result(done, len(urls), results[i])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ייבוא מתכונים מרשימת קישורים")
+    parser.add_argument("urls_file", help="קובץ טקסט עם קישור בכל שורה")
+    parser.add_argument("--out", default="-", help="קובץ JSONL לתוצאות (ברירת מחדל: הפלט הרגיל)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--cache", default=None, help="תיקיית מטמון ייבוא (ברירת מחדל: בלי מטמון)")
+    args = parser.parse_args(argv)
+
+    with open(args.urls_file, 'r', encoding='utf-8') as f:
+        urls = read_url_list(f.read())
+
+    def report(done, total, result):
+        status = "OK" if result["ok"] else result["error"]
+        print(f"[{done}/{total}] {result['url']}: {status}", flush=True)
+
+    cache = ImportCache(args.cache) if args.cache else None
+    results = import_urls(urls, args.workers, args.timeout, args.retries, on_result=report, cache=cache)
+    lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in results)
+    if args.out == "-":
+        print(lines, end="")
+    else:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+מדידת זמנים לכל ריצה (rerun) של האפליקציה, למפתחים.
+
+כבוי כברירת מחדל. מפעילים עם משתנה סביבה או פרמטר בכתובת:
+
+    RECIPEBOOK_PROFILE=1 streamlit run main.py        (זמנים ומספר שורות)
+    RECIPEBOOK_PROFILE=alloc streamlit run main.py    (וגם הקצאות זיכרון, דרך tracemalloc)
+    http://localhost:8501/?profile=1
+
+כשהמדידה כבויה, phase() מחזיר אובייקט ריק קבוע - בלי שעון, בלי הקצאות.
+"""
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+PROFILE_ENV = "RECIPEBOOK_PROFILE"
+METRICS_LOG = "metrics.jsonl"
+
+
+def profile_mode(value):
+    """None (כבוי) / "time" / "alloc" לפי ערך משתנה הסביבה או הפרמטר בכתובת."""
+    value = (value or "").strip().lower()
+    if value in ("", "0", "false", "off", "no"):
+        return None
+    return "alloc" if value in ("alloc", "mem", "memory") else "time"
+
+
+class _NullPhase:
+    """שלב שלא נמדד. מופע אחד משותף, כך שכשהמדידה כבויה אין שום עבודה נוספת."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_rows(self, rows):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _DisabledProfiler:
+    enabled = False
+
+    def phase(self, name, rows=None):
+        return _NULL_PHASE
+
+    def count(self, name, n=1):
+        pass
+
+
+DISABLED = _DisabledProfiler()
+
+
+class _Phase:
+    __slots__ = ("profiler", "entry", "start", "mem_start")
+
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        self.entry = {"name": name, "depth": 0, "ms": None, "rows": rows}
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.entry["depth"] = profiler._depth
+        profiler._depth += 1
+        profiler.phases.append(self.entry)
+        if profiler.trace_alloc:
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.entry["ms"] = (time.perf_counter() - self.start) * 1000
+        profiler = self.profiler
+        if profiler.trace_alloc:
+            # נטו: כמה זיכרון נשאר מוקצה בסוף השלב לעומת תחילתו
+            self.entry["alloc_kb"] = (tracemalloc.get_traced_memory()[0] - self.mem_start) / 1024
+        profiler._depth -= 1
+        if profiler.finished_at is not None:
+            # שלב שהסתיים אחרי סוף הריצה (למשל בניית גיבוי בלחיצה על ההורדה) נרשם בנפרד
+            profiler.late_phase(self.entry)
+        return False
+
+    def set_rows(self, rows):
+        self.entry["rows"] = rows
+
+
+class RerunProfiler:
+    """
+    אוסף את השלבים של ריצה אחת: שם, עומק קינון, זמן (ms), מספר שורות שעובדו
+    ו-(במצב alloc) הקצאות נטו ב-KB. ומונים חופשיים (פגיעות במטמון וכו').
+    """
+    enabled = True
+
+    def __init__(self, trace_alloc=False):
+        self.trace_alloc = trace_alloc
+        if trace_alloc and not tracemalloc.is_tracing():
+            # tracemalloc גלובלי לתהליך ונשאר פעיל - מצב פיתוח בלבד
+            tracemalloc.start()
+        self.phases = []
+        self.counters = {}
+        self._depth = 0
+        self.started = time.perf_counter()
+        self.finished_at = None
+        self.log_path = None
+        self.context = {}
+
+    def phase(self, name, rows=None):
+        return _Phase(self, name, rows)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self, log_path=None, **context):
+        """סוגר את הריצה. עם log_path הרשומה נוספת ליומן המדידות (וגם שלבים מאוחרים, אם יהיו)."""
+        self.finished_at = time.perf_counter()
+        self.log_path = log_path
+        self.context = context
+        record = self.to_record()
+        if log_path:
+            append_metrics_log(record, log_path)
+        return record
+
+    def total_ms(self):
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def to_record(self):
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "total_ms": self.total_ms(),
+            "phases": self.phases,
+            "counters": self.counters,
+        }
+        record.update(self.context)
+        if self.trace_alloc:
+            record["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        return record
+
+    def late_phase(self, entry):
+        if self.log_path:
+            record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "late": True,
+                      "phases": [entry]}
+            record.update(self.context)
+            append_metrics_log(record, self.log_path)
+
+
+def append_metrics_log(record, path=METRICS_LOG):
+    """מוסיף רשומה כשורת JSON ליומן המדידות (קובץ JSONL מקומי)."""
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    # שורה אחת בכתיבה אחת במצב append, כך ששני סשנים לא מערבבים שורות
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def read_metrics_log(path=METRICS_LOG, limit=None):
+    """הרשומות מהיומן (האחרונות limit, אם צוין). שורות פגומות מדולגות."""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    return records[-limit:] if limit else records
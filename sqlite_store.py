@@ -0,0 +1,359 @@
+"""
+מאגר SQLite כחלופה לקבצי ה-JSON.
+
+כל רשומה נשמרת כ-JSON מלא בעמודת data (מקור האמת, כך שייבוא/ייצוא הם ללא אובדן),
+ולצידה עמודות מאונדקסות (קטגוריה, ערכים תזונתיים, שורות מצרכים) שעליהן רצים הסינונים ב-SQL.
+
+שימוש משורת הפקודה:
+    python sqlite_store.py import --db recipes.db --dir .
+    python sqlite_store.py export --db recipes.db --dir backup/
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+# סוג נתונים -> שם קובץ ה-JSON המקביל
+JSON_FILES = {
+    "recipes": "recipes.json",
+    "ingredients": "ingredients.json",
+    "categories": "categories.json",
+    "trash": "trash.json",
+}
+
+MACRO_COLUMNS = ("calories", "protein", "carbs", "fats")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    recipe_key INTEGER PRIMARY KEY,
+    id TEXT UNIQUE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    category TEXT,
+    calories REAL,
+    protein REAL,
+    carbs REAL,
+    fats REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recipes_position ON recipes(position);
+CREATE INDEX IF NOT EXISTS idx_recipes_category ON recipes(category);
+CREATE INDEX IF NOT EXISTS idx_recipes_calories ON recipes(calories);
+CREATE INDEX IF NOT EXISTS idx_recipes_protein ON recipes(protein);
+CREATE INDEX IF NOT EXISTS idx_recipes_carbs ON recipes(carbs);
+CREATE INDEX IF NOT EXISTS idx_recipes_fats ON recipes(fats);
+
+CREATE TABLE IF NOT EXISTS ingredient_lines (
+    recipe_key INTEGER NOT NULL REFERENCES recipes(recipe_key) ON DELETE CASCADE,
+    line_no INTEGER NOT NULL,
+    ingredient TEXT,
+    amount REAL,
+    unit TEXT,
+    PRIMARY KEY (recipe_key, line_no)
+);
+CREATE INDEX IF NOT EXISTS idx_lines_ingredient ON ingredient_lines(ingredient, recipe_key);
+
+CREATE TABLE IF NOT EXISTS ingredients (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    measure_type TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS trash (
+    trash_key INTEGER PRIMARY KEY,
+    id TEXT UNIQUE,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trash_position ON trash(position);
+
+-- מונה שינויים לכל סוג נתונים, כדי שהמאגר המשותף יזהה שמירות בלי לקרוא הכל מחדש
+CREATE TABLE IF NOT EXISTS stamps (
+    kind TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+def _macro(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SqliteStore:
+    """גישה למאגר SQLite. חיבור חדש לכל פעולה, כך שאפשר להשתמש בו מכמה סשנים במקביל."""
+
+    def __init__(self, path):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        with self._init_lock:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        return conn
+
+    # --- קריאה ---
+
+    def load(self, kind, default_data):
+        """מחזיר את הנתונים באותו מבנה כמו קובץ ה-JSON. מאגר ריק מחזיר את ברירת המחדל."""
+        conn = self._connect()
+        try:
+            if self.stamp(kind, conn) is None:
+                return default_data
+            if kind == "recipes":
+                rows = conn.execute("SELECT data FROM recipes ORDER BY position")
+                return [json.loads(data) for (data,) in rows]
+            if kind == "trash":
+                rows = conn.execute("SELECT data FROM trash ORDER BY position")
+                return [json.loads(data) for (data,) in rows]
+            if kind == "ingredients":
+                rows = conn.execute("SELECT name, data FROM ingredients ORDER BY position")
+                return {name: json.loads(data) for name, data in rows}
+            if kind == "categories":
+                return [name for (name,) in conn.execute("SELECT name FROM categories ORDER BY position")]
+            raise ValueError(f"סוג נתונים לא מוכר: {kind}")
+        finally:
+            conn.close()
+
+    def stamp(self, kind, conn=None):
+        """גרסת הנתונים מסוג kind (None אם מעולם לא נשמרו)."""
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            row = conn.execute("SELECT version FROM stamps WHERE kind = ?", (kind,)).fetchone()
+            return row[0] if row else None
+        finally:
+            if own:
+                conn.close()
+
+    # --- כתיבה ---
+
+    def save(self, kind, data):
+        """מחליף את כל הנתונים מסוג kind בטרנזקציה אחת."""
+        conn = self._connect()
+        try:
+            with conn:
+                if kind == "recipes":
+                    conn.execute("DELETE FROM recipes")
+                    for pos, recipe in enumerate(data):
+                        self._insert_recipe(conn, recipe, pos)
+                elif kind == "trash":
+                    conn.execute("DELETE FROM trash")
+                    for pos, recipe in enumerate(data):
+                        self._insert_trash(conn, recipe, pos)
+                elif kind == "ingredients":
+                    conn.execute("DELETE FROM ingredients")
+                    conn.executemany(
+                        "INSERT INTO ingredients (name, position, measure_type, data) VALUES (?, ?, ?, ?)",
+                        [(name, pos, item.get("measure_type"), json.dumps(item, ensure_ascii=False))
+                         for pos, (name, item) in enumerate(data.items())])
+                elif kind == "categories":
+                    conn.execute("DELETE FROM categories")
+                    conn.executemany("INSERT INTO categories (position, name) VALUES (?, ?)", list(enumerate(data)))
+                else:
+                    raise ValueError(f"סוג נתונים לא מוכר: {kind}")
+                self._bump(conn, kind)
+        finally:
+            conn.close()
+
+    def apply(self, kind, action, recipe):
+        """
+        שינוי במתכון בודד ברשימת recipes / trash לפי מזהה:
+        put - עדכון במקום או הוספה לסוף, remove - מחיקה אם קיים.
+        """
+        self.apply_many(kind, action, [recipe])
+
+    def apply_many(self, kind, action, recipes):
+        """אותו שינוי בכמה מתכונים, בטרנזקציה אחת."""
+        table, key = ("recipes", "recipe_key") if kind == "recipes" else ("trash", "trash_key")
+        conn = self._connect()
+        try:
+            with conn:
+                for recipe in recipes:
+                    row = conn.execute(f"SELECT {key}, position FROM {table} WHERE id = ?", (recipe['id'],)).fetchone()
+                    if row is not None:
+                        conn.execute(f"DELETE FROM {table} WHERE {key} = ?", (row[0],))
+                    if action == "put":
+                        if row is not None:
+                            pos = row[1]
+                        else:
+                            pos = conn.execute(f"SELECT COALESCE(MAX(position), -1) + 1 FROM {table}").fetchone()[0]
+                        if kind == "recipes":
+                            self._insert_recipe(conn, recipe, pos)
+                        else:
+                            self._insert_trash(conn, recipe, pos)
+                self._bump(conn, kind)
+        finally:
+            conn.close()
+
+    def apply_ingredients(self, upserts, removed, renames=None):
+        """
+        שינוי מצרכים בודדים בטרנזקציה אחת: מחיקת removed, ועדכון / הוספה של upserts.
+        מצרך ששמו שונה (renames: ישן -> חדש) שומר על המיקום של השם הישן.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                renames = renames or {}
+                moved = {}
+                for old, new in renames.items():
+                    row = conn.execute("SELECT position FROM ingredients WHERE name = ?", (old,)).fetchone()
+                    if row is not None:
+                        moved[new] = min(moved.get(new, row[0]), row[0])
+                conn.executemany("DELETE FROM ingredients WHERE name = ?", [(name,) for name in removed])
+                for name, item in upserts.items():
+                    row = conn.execute("SELECT position FROM ingredients WHERE name = ?", (name,)).fetchone()
+                    if renames.get(name) in upserts:
+                        # המקום של השם הזה עובר למצרך ששמו שונה אליו (למשל החלפת שמות בין שני מצרכים)
+                        row = None
+                    # שם שכבר קיים ושמות ישנים של מצרכים ששמם שונה אליו - המוקדם מביניהם, כמו בשמירה ל-JSON
+                    candidates = [pos for pos in (row and row[0], moved.get(name)) if pos is not None]
+                    if candidates:
+                        pos = min(candidates)
+                    else:
+                        pos = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM ingredients").fetchone()[0]
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ingredients (name, position, measure_type, data) VALUES (?, ?, ?, ?)",
+                        (name, pos, item.get("measure_type"), json.dumps(item, ensure_ascii=False)))
+                self._bump(conn, "ingredients")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _insert_recipe(conn, recipe, pos):
+        cur = conn.execute(
+            "INSERT INTO recipes (id, position, name, category, calories, protein, carbs, fats, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (recipe.get('id'), pos, recipe.get('name'), recipe.get('category'),
+             *(_macro(recipe.get(col)) for col in MACRO_COLUMNS),
+             json.dumps(recipe, ensure_ascii=False)))
+        lines = [(cur.lastrowid, line_no, ing.get('ingredient'), _macro(ing.get('amount')), ing.get('unit'))
+                 for line_no, ing in enumerate(recipe.get('ingredients', [])) if isinstance(ing, dict)]
+        conn.executemany(
+            "INSERT INTO ingredient_lines (recipe_key, line_no, ingredient, amount, unit) VALUES (?, ?, ?, ?, ?)",
+            lines)
+
+    @staticmethod
+    def _insert_trash(conn, recipe, pos):
+        conn.execute("INSERT INTO trash (id, position, data) VALUES (?, ?, ?)",
+                     (recipe.get('id'), pos, json.dumps(recipe, ensure_ascii=False)))
+
+    @staticmethod
+    def _bump(conn, kind):
+        conn.execute("INSERT INTO stamps (kind, version) VALUES (?, 1)"
+                     " ON CONFLICT(kind) DO UPDATE SET version = version + 1", (kind,))
+
+    # --- שאילתות ---
+
+    def query_recipe_ids(self, categories=None, ingredients=None, ranges=None):
+        """
+        מזהי המתכונים שעוברים את הסינונים, בסדר הרשימה:
+        אחת מהקטגוריות AND כל המצרכים AND כל טווח {עמודה: (מינימום, מקסימום)} (None = בלי גבול).
+        """
+        where, params = [], []
+        if categories:
+            where.append(f"category IN ({', '.join('?' * len(categories))})")
+            params.extend(categories)
+        if ingredients:
+            names = list(dict.fromkeys(ingredients))
+            where.append(
+                "recipe_key IN (SELECT recipe_key FROM ingredient_lines"
+                f" WHERE ingredient IN ({', '.join('?' * len(names))})"
+                " GROUP BY recipe_key HAVING COUNT(DISTINCT ingredient) = ?)")
+            params.extend(names)
+            params.append(len(names))
+        for column, (low, high) in (ranges or {}).items():
+            if column not in MACRO_COLUMNS:
+                raise ValueError(f"עמודה לא מוכרת: {column}")
+            bounds = []
+            # ערך חסר נחשב 0, כמו בטבלת התקציר של האפליקציה
+            null_passes = True
+            if low is not None:
+                bounds.append(f"{column} >= ?")
+                params.append(low)
+                null_passes = null_passes and low <= 0
+            if high is not None:
+                bounds.append(f"{column} <= ?")
+                params.append(high)
+                null_passes = null_passes and high >= 0
+            if bounds:
+                clause = " AND ".join(bounds)
+                where.append(f"({clause} OR {column} IS NULL)" if null_passes else clause)
+        sql = "SELECT id FROM recipes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY position"
+        conn = self._connect()
+        try:
+            return [rid for (rid,) in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+
+# --- ייבוא / ייצוא ---
+
+def import_json(db_path, json_dir):
+    """מעתיק את כל קבצי ה-JSON בתיקייה למאגר (מחליף את מה שיש בו)."""
+    journal = os.path.join(json_dir, "journal.jsonl")
+    if os.path.exists(journal) and os.path.getsize(journal) > 0:
+        raise SystemExit("ביומן יש שינויים שעוד לא נדחסו ל-JSON. פתח את האפליקציה ושמור, או הרץ דחיסה, ונסה שוב.")
+    store = SqliteStore(db_path)
+    counts = {}
+    for kind, filename in JSON_FILES.items():
+        path = os.path.join(json_dir, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        store.save(kind, data)
+        counts[kind] = len(data)
+    return counts
+
+
+def export_json(db_path, json_dir):
+    """כותב את תוכן המאגר לקבצי JSON בפורמט של האפליקציה."""
+    store = SqliteStore(db_path)
+    os.makedirs(json_dir, exist_ok=True)
+    counts = {}
+    for kind, filename in JSON_FILES.items():
+        if store.stamp(kind) is None:
+            continue
+        data = store.load(kind, None)
+        with open(os.path.join(json_dir, filename), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        counts[kind] = len(data)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ייבוא / ייצוא בין קבצי ה-JSON למאגר SQLite")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("--db", default="recipes.db", help="קובץ המאגר")
+    parser.add_argument("--dir", default=".", help="התיקייה של קבצי ה-JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        counts = import_json(args.db, args.dir)
+    else:
+        counts = export_json(args.db, args.dir)
+    for kind, count in counts.items():
+        print(f"{kind}: {count}")
+
+
+if __name__ == "__main__":
+    main()
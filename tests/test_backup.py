@@ -0,0 +1,81 @@
+"""
+גיבוי ה-ZIP: נבנה לקובץ בדיסק ונשמר במטמון לפי חתימת הקבצים, ובמצב מצטבר כולל רק מה שהשתנה.
+רק גיבוי מצטבר מזיז את הבסיס של הגיבוי המצטבר הבא.
+"""
+import json
+import os
+import time
+import zipfile
+
+import pytest
+
+import recipe_core
+from recipe_core import (BACKUP_MANIFEST, BACKUP_STATE_FILE, CATEGORIES_FILE, RECIPES_FILE, create_backup_zip,
+                         read_backup_state, save_json)
+
+
+@pytest.fixture(autouse=True)
+def library(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(recipe_core, "_BACKUP_CACHE", {})
+    save_json(RECIPES_FILE, [{"id": "r1", "name": "מתכון", "ingredients": []}])
+    save_json(CATEGORIES_FILE, ["בוקר"])
+    yield
+    for _, path in recipe_core._BACKUP_CACHE.values():
+        os.remove(path)
+
+
+def zip_names(backup):
+    with backup, zipfile.ZipFile(backup) as zipf:
+        return sorted(zipf.namelist())
+
+
+def touch(filename, data):
+    # mtime שונה גם במערכות קבצים עם רזולוציה גסה
+    time.sleep(0.01)
+    save_json(filename, data)
+
+
+def test_full_backup_is_cached_and_does_not_move_the_base():
+    first = create_backup_zip()
+    assert not first.closed and first.name.endswith(".zip")
+    assert zip_names(first) == [CATEGORIES_FILE, RECIPES_FILE]
+    second = create_backup_zip()
+    assert second.name == first.name
+    second.close()
+    assert not os.path.exists(BACKUP_STATE_FILE)
+
+    touch(RECIPES_FILE, [])
+    third = create_backup_zip()
+    assert third.name != first.name and not os.path.exists(first.name)
+    with zipfile.ZipFile(third) as zipf:
+        assert json.loads(zipf.read(RECIPES_FILE)) == []
+    third.close()
+
+
+def test_incremental_backup_includes_only_changes_since_last_incremental():
+    names = zip_names(create_backup_zip(incremental=True))
+    assert names == [BACKUP_MANIFEST, CATEGORIES_FILE, RECIPES_FILE]
+    base = read_backup_state()
+    assert base[RECIPES_FILE] is not None
+
+    # גיבוי מלא בין לבין לא משנה את הבסיס
+    create_backup_zip().close()
+    assert read_backup_state() == base
+
+    touch(CATEGORIES_FILE, ["בוקר", "ערב"])
+    backup = create_backup_zip(incremental=True)
+    with backup, zipfile.ZipFile(backup) as zipf:
+        assert sorted(zipf.namelist()) == [BACKUP_MANIFEST, CATEGORIES_FILE]
+        manifest = json.loads(zipf.read(BACKUP_MANIFEST))
+    assert manifest["base"] == base and manifest["included"] == [CATEGORIES_FILE]
+
+    assert zip_names(create_backup_zip(incremental=True)) == [BACKUP_MANIFEST]
+
+
+def test_open_backup_survives_rebuild():
+    backup = create_backup_zip()
+    touch(RECIPES_FILE, [])
+    create_backup_zip().close()
+    # הקובץ הקודם נמחק מהמטמון, אבל מי שכבר פתח אותו ממשיך לקרוא
+    assert zip_names(backup) == [CATEGORIES_FILE, RECIPES_FILE]
@@ -0,0 +1,98 @@
+"""
+בדיקת עומס לכתיבה מכמה תהליכים במקביל: N תהליכים x M שינויים דרך update_json ו-append_many,
+ותהליך נוסף שדוחס את היומן כל הזמן. בסוף כל רשומה נמצאת בדיוק פעם אחת וכל הקבצים תקינים.
+"""
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import recipe_core
+from recipe_core import RECIPES_FILE, TRASH_FILE, JOURNAL_FILE, DataStore, save_json, update_json
+
+N_PROCESSES = 4
+M_WRITES = 40
+COUNTER_FILE = "counter.json"
+
+
+def _setup(path, mode):
+    os.chdir(path)
+    recipe_core.PERSISTENCE_MODE = mode
+    recipe_core.JOURNAL_COMPACT_EVERY = 10
+
+
+def _recipe(worker, i):
+    return {"id": f"w{worker}-{i}", "name": f"מתכון {worker}-{i}", "image": "🥘", "category": "ערב",
+            "ingredients": [{"amount": 1.0, "unit": "יחידה", "ingredient": "ביצה"}], "instructions": ""}
+
+
+def _writer(path, mode, worker):
+    _setup(path, mode)
+    store = DataStore()
+    store.load(RECIPES_FILE, [])
+    store.load(TRASH_FILE, [])
+    for i in range(M_WRITES):
+        update_json(COUNTER_FILE, [], lambda items: items + [f"{worker}-{i}"])
+        recipe = _recipe(worker, i)
+        store.append_many("add", [recipe])
+        if i % 3 == 0:
+            # חלק מהמתכונים עוברים לפח ובחזרה, חלק נשארים בפח
+            store.append_many("delete", [recipe])
+            if i % 2 == 0:
+                store.append_many("restore", [recipe])
+    store.compact()
+
+
+def _compactor(path, mode, stop):
+    _setup(path, mode)
+    store = DataStore()
+    store.load(RECIPES_FILE, [])
+    store.load(TRASH_FILE, [])
+    while not stop.is_set():
+        store.compact()
+
+
+@pytest.mark.parametrize("mode", ["journal", "snapshot"])
+def test_parallel_writers(tmp_path, monkeypatch, mode):
+    monkeypatch.chdir(tmp_path)
+    save_json(RECIPES_FILE, [])
+    save_json(TRASH_FILE, [])
+
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+    compactor = ctx.Process(target=_compactor, args=(str(tmp_path), mode, stop))
+    writers = [ctx.Process(target=_writer, args=(str(tmp_path), mode, w)) for w in range(N_PROCESSES)]
+    compactor.start()
+    for p in writers:
+        p.start()
+    for p in writers:
+        p.join(120)
+    stop.set()
+    compactor.join(120)
+    assert all(p.exitcode == 0 for p in writers + [compactor])
+
+    # כל הקבצים תקינים (אין כתיבה חלקית)
+    for filename in (RECIPES_FILE, TRASH_FILE, COUNTER_FILE):
+        with open(filename, 'r', encoding='utf-8') as f:
+            json.load(f)
+    if os.path.exists(JOURNAL_FILE):
+        with open(JOURNAL_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                json.loads(line)
+
+    with open(COUNTER_FILE, 'r', encoding='utf-8') as f:
+        counter = json.load(f)
+    assert sorted(counter) == sorted(f"{w}-{i}" for w in range(N_PROCESSES) for i in range(M_WRITES))
+
+    monkeypatch.setattr(recipe_core, "PERSISTENCE_MODE", mode)
+    store = DataStore()
+    recipes, _ = store.load(RECIPES_FILE, [])
+    trash, _ = store.load(TRASH_FILE, [])
+    in_trash = {f"w{w}-{i}" for w in range(N_PROCESSES) for i in range(M_WRITES) if i % 3 == 0 and i % 2}
+    everything = {f"w{w}-{i}" for w in range(N_PROCESSES) for i in range(M_WRITES)}
+    recipe_ids = [r['id'] for r in recipes]
+    trash_ids = [r['id'] for r in trash]
+    assert len(recipe_ids) == len(set(recipe_ids)) and len(trash_ids) == len(set(trash_ids))
+    assert set(trash_ids) == in_trash
+    assert set(recipe_ids) == everything - in_trash
@@ -0,0 +1,96 @@
+"""
+סינון לפי קטגוריות ומצרכים דרך קבוצות המזהים מול סינון ישיר של DataFrame,
+כולל שמות מצרכים שאחד מהם מוכל בשני (בלי התאמות שגויות).
+"""
+import itertools
+import random
+
+import pandas as pd
+import pytest
+
+from recipe_core import (RecordList, build_category_index, build_ingredient_index, filter_by_categories,
+                         filter_by_ingredients)
+
+CATEGORIES = ["בוקר", "צהריים", "ערב", "נשנוש", None]
+INGREDIENTS = ["שמן", "שמן זית", "זית", "עוף", "חזה עוף", "ביצה", "ביצה קשה", "קמח"]
+
+
+def make_recipe(i, rng):
+    return {
+        "id": f"r{i}",
+        "category": rng.choice(CATEGORIES),
+        "ingredients": [{"amount": 1.0, "unit": "יחידה", "ingredient": name}
+                        for name in rng.sample(INGREDIENTS, rng.randint(0, 4))],
+    }
+
+
+def frame(recipes):
+    return pd.DataFrame({
+        "id": [r["id"] for r in recipes],
+        "category": [r["category"] for r in recipes],
+        "ingredients": [{ing["ingredient"] for ing in r["ingredients"]} for r in recipes],
+    })
+
+
+def expected_ids(df, categories, ingredients):
+    mask = pd.Series(True, index=df.index)
+    if categories:
+        mask &= df["category"].isin(categories)
+    if ingredients:
+        mask &= df["ingredients"].apply(lambda names: set(ingredients) <= names)
+    return set(df.loc[mask, "id"])
+
+
+def apply_filters(records, categories, ingredients):
+    result = None
+    if categories:
+        result = filter_by_categories(records.index("category"), categories, result)
+    if ingredients:
+        result = filter_by_ingredients(records.index("ingredients"), ingredients, result)
+    return result
+
+
+CASES = [(cats, list(ings))
+         for cats in ([], ["בוקר"], ["ערב", "נשנוש"], ["אין כזו"])
+         for ings in itertools.chain([()], itertools.combinations(["שמן", "זית", "עוף", "ביצה קשה", "אין כזה"], 1),
+                                     [("שמן", "זית"), ("עוף", "ביצה"), ("שמן זית", "חזה עוף")])]
+
+
+@pytest.mark.parametrize("categories, ingredients", CASES)
+def test_filters_match_dataframe(categories, ingredients):
+    rng = random.Random(0)
+    recipes = [make_recipe(i, rng) for i in range(300)]
+    records = RecordList(recipes)
+    result = apply_filters(records, categories, ingredients)
+    if not categories and not ingredients:
+        assert result is None
+    else:
+        assert result == expected_ids(frame(recipes), categories, ingredients)
+
+
+def test_exact_names_no_substring_matches():
+    recipes = [{"id": "a", "category": "ערב", "ingredients": [{"amount": 1, "unit": "כף", "ingredient": "שמן זית"}]},
+               {"id": "b", "category": "ערב", "ingredients": [{"amount": 1, "unit": "כף", "ingredient": "שמן"}]}]
+    assert filter_by_ingredients(build_ingredient_index(recipes), ["שמן"]) == {"b"}
+    assert filter_by_ingredients(build_ingredient_index(recipes), ["זית"]) == set()
+    assert filter_by_categories(build_category_index(recipes), ["ערב"], {"a"}) == {"a"}
+
+
+def test_filters_follow_changes():
+    rng = random.Random(2)
+    records = RecordList([make_recipe(i, rng) for i in range(150)])
+    records.index("category")
+    records.index("ingredients")
+    for step in range(300):
+        op = rng.random()
+        if op < 0.4:
+            records.append(make_recipe(1000 + step, rng))
+        elif op < 0.7 and len(records):
+            recipe_id = rng.choice(records.items)["id"]
+            records.replace(recipe_id, dict(make_recipe(0, rng), id=recipe_id))
+        elif len(records):
+            records.pop(rng.choice(records.items)["id"])
+    df = frame(records.items)
+    for categories, ingredients in CASES:
+        if categories or ingredients:
+            assert apply_filters(records, categories, ingredients) == expected_ids(df, categories, ingredients)
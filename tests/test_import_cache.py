@@ -0,0 +1,112 @@
+"""
+מטמון הייבוא (מפתח לפי קישור מנורמל, תוקף ומגבלת רשומות), רשימת הקישורים לייבוא,
+וזיהוי מתכונים כפולים לפי טביעת אצבע.
+"""
+import json
+import os
+import time
+
+import pytest
+
+from recipe_core import RecordList, recipe_fingerprint
+from recipe_importer import ImportCache, normalize_url, read_url_list
+
+RECIPE = {"name": "שקשוקה", "instructions": "מבשלים.", "raw_ingredients": ["4 ביצים"]}
+
+
+@pytest.mark.parametrize("url, key", [
+    ("https://www.Example.com/recipes/shakshuka/", "//example.com/recipes/shakshuka"),
+    ("http://example.com/recipes/shakshuka?utm_source=fb&fbclid=1", "//example.com/recipes/shakshuka"),
+    ("http://example.com:80/r?b=2&a=1", "//example.com/r?a=1&b=2"),
+    ("https://example.com:8443/r", "//example.com:8443/r"),
+    ("  http://example.com  ", "//example.com/"),
+])
+def test_normalize_url(url, key):
+    assert normalize_url(url) == key
+
+
+def test_read_url_list_keeps_first_seen_order():
+    text = """
+        # קישורים לייבוא
+        http://b.com/2
+        http://a.com/1
+        https://www.b.com/2/?utm_medium=x
+        http://c.com/3
+
+        http://a.com/1/
+    """
+    assert read_url_list(text) == ["http://b.com/2", "http://a.com/1", "http://c.com/3"]
+
+
+def test_cache_hit_by_normalized_url(tmp_path):
+    cache = ImportCache(str(tmp_path / "cache"))
+    assert cache.get("http://example.com/r") is None
+    cache.put("https://www.example.com/r/?utm_source=x", RECIPE)
+    assert cache.get("http://example.com/r") == RECIPE
+    assert cache.get("http://example.com/other") is None
+    assert len(os.listdir(cache.path)) == 1
+
+
+def test_cache_entries_expire(tmp_path):
+    cache = ImportCache(str(tmp_path / "cache"), ttl=3600)
+    cache.put("http://example.com/r", RECIPE)
+    entry_path = cache._entry_path("http://example.com/r")
+    with open(entry_path, encoding="utf-8") as f:
+        entry = json.load(f)
+    entry["fetched_at"] -= 7200
+    with open(entry_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    assert cache.get("http://example.com/r") is None
+
+    # פינוי: קובץ ישן יותר מה-ttl נמחק
+    old = time.time() - 7200
+    os.utime(entry_path, (old, old))
+    cache.evict()
+    assert not os.path.exists(entry_path)
+
+
+def test_cache_evicts_oldest_over_max_entries(tmp_path):
+    cache = ImportCache(str(tmp_path / "cache"), max_entries=3)
+    now = time.time()
+    for i in range(5):
+        cache.put(f"http://example.com/{i}", dict(RECIPE, name=f"מתכון {i}"))
+        stamp = now - 100 + i
+        os.utime(cache._entry_path(f"http://example.com/{i}"), (stamp, stamp))
+    cache.evict()
+    assert [cache.get(f"http://example.com/{i}") is not None for i in range(5)] == [False, False, True, True, True]
+    # put מפנה בעצמו
+    cache.put("http://example.com/new", RECIPE)
+    assert len([n for n in os.listdir(cache.path) if n.endswith(".json")]) == 3
+    assert cache.get("http://example.com/2") is None
+
+
+def make_recipe(recipe_id, name, ingredients):
+    return {"id": recipe_id, "name": name,
+            "ingredients": [{"amount": amount, "unit": "גרם", "ingredient": ing} for ing, amount in ingredients]}
+
+
+def test_fingerprint_ignores_formatting_and_amounts():
+    base = make_recipe("a", "שקשוקה ביתית", [("ביצה", 4), ("עגבנייה", 400)])
+    same = [
+        make_recipe("b", "  שַׁקְשׁוּקָה   ביתית!", [("עגבנייה", 200), ("ביצה", 2)]),
+        make_recipe("c", "שקשוקה ביתית", [("ביצה", 4), ("ביצה", 1), ("עגבנייה", 400)]),
+    ]
+    different = [
+        make_recipe("d", "שקשוקה ירוקה", [("ביצה", 4), ("עגבנייה", 400)]),
+        make_recipe("e", "שקשוקה ביתית", [("ביצה", 4), ("תרד", 400)]),
+        make_recipe("f", "שקשוקה ביתית", [("ביצה", 4)]),
+    ]
+    assert all(recipe_fingerprint(r) == recipe_fingerprint(base) for r in same)
+    assert all(recipe_fingerprint(r) != recipe_fingerprint(base) for r in different)
+
+
+def test_duplicates_found_through_the_fingerprint_index():
+    records = RecordList([make_recipe("a", "סלט", [("מלפפון", 100)]), make_recipe("b", "מרק", [("גזר", 100)])])
+    index = records.index("fingerprint")
+    incoming = make_recipe("new", "סלט", [("מלפפון", 300)])
+    assert index.get(recipe_fingerprint(incoming)) == {"a"}
+
+    records.pop("a")
+    assert not index.get(recipe_fingerprint(incoming))
+    records.append(incoming)
+    assert index.get(recipe_fingerprint(make_recipe("x", "סלט", [("מלפפון", 1)]))) == {"new"}
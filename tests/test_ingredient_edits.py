@@ -0,0 +1,146 @@
+"""
+שמירת טבלת המצרכים לפי השינויים (ingredient_edits + merge_ingredients) מול השמירה המלאה של הטבלה,
+שינויי השם במתכונים, אותם שינויים במאגר ה-SQLite, ועריכת הקטגוריות.
+"""
+import random
+
+import pytest
+
+from recipe_core import (category_edits, ingredient_edits, ingredients_frame, merge_ingredients,
+                         rename_recipe_ingredients)
+from sqlite_store import SqliteStore
+
+
+def item(protein, carbs, fats, measure_type="100g"):
+    return {"vals": [protein * 4 + carbs * 4 + fats * 9, protein, carbs, fats], "measure_type": measure_type}
+
+
+DB = {"קמח": item(10, 76, 1), "ביצה": item(7, 1, 6, "unit"), "חלב": item(3, 5, 3), "שמן": item(0, 0, 100)}
+NAMES = list(DB)
+
+
+def full_save(ingredients_db, delta):
+    """השמירה המלאה: מחילים את השינויים על הטבלה ובונים את המאגר מכל השורות מחדש."""
+    rows = ingredients_frame(ingredients_db).to_dict("records")
+    for pos, changes in delta.get("edited_rows", {}).items():
+        rows[int(pos)].update(changes)
+    deleted = {int(pos) for pos in delta.get("deleted_rows", [])}
+    rows = [row for pos, row in enumerate(rows) if pos not in deleted]
+    rows += [{"חלבון": 0, "פחמימה": 0, "שומן": 0, **row} for row in delta.get("added_rows", [])]
+    new_db = {}
+    for row in rows:
+        if row["שם המצרך"]:
+            # תא שרוקן מגיע כ-None ונשמר כאפס
+            p, c, f = (row[col] or 0 for col in ("חלבון", "פחמימה", "שומן"))
+            new_db[row["שם המצרך"]] = {"vals": [p * 4 + c * 4 + f * 9, p, c, f],
+                                        "measure_type": "100g" if row.get("סוג חישוב") == "100 גרם" else "unit"}
+    return new_db
+
+
+def apply(ingredients_db, delta):
+    upserts, removed, renames = ingredient_edits(ingredients_db, list(ingredients_db), delta)
+    return merge_ingredients(ingredients_db, upserts, removed, renames), renames
+
+
+CASES = {
+    "edit_values": ({"edited_rows": {"2": {"חלבון": 8}}},
+                    {"קמח": DB["קמח"], "ביצה": DB["ביצה"], "חלב": item(8, 5, 3), "שמן": DB["שמן"]}, {}),
+    "delete_row": ({"deleted_rows": [1]}, {"קמח": DB["קמח"], "חלב": DB["חלב"], "שמן": DB["שמן"]}, {}),
+    "clear_name": ({"edited_rows": {"0": {"שם המצרך": ""}}},
+                   {"ביצה": DB["ביצה"], "חלב": DB["חלב"], "שמן": DB["שמן"]}, {}),
+    "add_row": ({"added_rows": [{"שם המצרך": "סוכר", "פחמימה": 100, "סוג חישוב": "100 גרם"}, {"שם המצרך": ""}]},
+                {**DB, "סוכר": item(0, 100, 0)}, {}),
+    "rename": ({"edited_rows": {"0": {"שם המצרך": "קמח מלא", "חלבון": 13}}},
+               {"קמח מלא": item(13, 76, 1), "ביצה": DB["ביצה"], "חלב": DB["חלב"], "שמן": DB["שמן"]},
+               {"קמח": "קמח מלא"}),
+    # שינוי שם לשם של שורה אחרת: השורה האחרונה בטבלה קובעת, והשם נשאר במקום המוקדם מביניהן
+    "rename_to_later_existing": ({"edited_rows": {"0": {"שם המצרך": "חלב"}}},
+                                 {"חלב": DB["חלב"], "ביצה": DB["ביצה"], "שמן": DB["שמן"]}, {"קמח": "חלב"}),
+    "rename_to_earlier_existing": ({"edited_rows": {"3": {"שם המצרך": "ביצה"}}},
+                                   {"קמח": DB["קמח"], "ביצה": item(0, 0, 100), "חלב": DB["חלב"]}, {"שמן": "ביצה"}),
+    "swap_names": ({"edited_rows": {"0": {"שם המצרך": "שמן"}, "3": {"שם המצרך": "קמח"}}},
+                   {"שמן": DB["קמח"], "ביצה": DB["ביצה"], "חלב": DB["חלב"], "קמח": DB["שמן"]},
+                   {"קמח": "שמן", "שמן": "קמח"}),
+    # הסדר ב-edited_rows לא משנה: שתי שורות לאותו שם - האחרונה בטבלה
+    "two_rows_same_name": ({"edited_rows": {"3": {"שם המצרך": "מצרך"}, "1": {"שם המצרך": "מצרך"}}},
+                           {"קמח": DB["קמח"], "מצרך": DB["שמן"], "חלב": DB["חלב"]},
+                           {"ביצה": "מצרך", "שמן": "מצרך"}),
+    # שורה שנמחקה ושורה חדשה עם אותו שם: הערכים מהחדשה, המקום של הישנה
+    "delete_and_add_same_name": ({"deleted_rows": [0], "added_rows": [{"שם המצרך": "קמח", "חלבון": 12,
+                                                                       "סוג חישוב": "100 גרם"}]},
+                                 {"קמח": item(12, 0, 0), "ביצה": DB["ביצה"], "חלב": DB["חלב"], "שמן": DB["שמן"]}, {}),
+    "renamed_row_deleted": ({"edited_rows": {"1": {"שם המצרך": "ביצים"}}, "deleted_rows": [1]},
+                            {"קמח": DB["קמח"], "חלב": DB["חלב"], "שמן": DB["שמן"]}, {}),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_ingredient_edits(name):
+    delta, expected, expected_renames = CASES[name]
+    merged, renames = apply(DB, delta)
+    assert list(merged.items()) == list(expected.items())
+    assert renames == expected_renames
+    assert merged == full_save(DB, delta)
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_full_save(tmp_path, seed):
+    rng = random.Random(seed)
+    names = ["א", "ב", "ג", "ד", "ה", "ו", "ז"]
+    ingredients_db = {name: item(rng.randint(0, 30), rng.randint(0, 80), rng.randint(0, 40),
+                                 rng.choice(["100g", "unit"])) for name in rng.sample(names, 5)}
+    delta = {"edited_rows": {}, "added_rows": [], "deleted_rows": rng.sample(range(5), rng.randint(0, 2))}
+    for pos in rng.sample(range(5), rng.randint(0, 4)):
+        changes = {}
+        if rng.random() < 0.5:
+            changes["שם המצרך"] = rng.choice(names + [""])
+        if rng.random() < 0.5:
+            changes["חלבון"] = rng.choice([None, rng.randint(0, 30)])
+        if rng.random() < 0.3:
+            changes["סוג חישוב"] = rng.choice(["100 גרם", "יחידה"])
+        delta["edited_rows"][str(pos)] = changes
+    for _ in range(rng.randint(0, 2)):
+        delta["added_rows"].append({"שם המצרך": rng.choice(names + [""]), "שומן": rng.randint(0, 40),
+                                    "סוג חישוב": rng.choice(["100 גרם", "יחידה"])})
+    merged, _ = apply(ingredients_db, delta)
+    assert merged == full_save(ingredients_db, delta)
+
+    store = SqliteStore(str(tmp_path / "recipes.db"))
+    store.save("ingredients", ingredients_db)
+    store.apply_ingredients(*ingredient_edits(ingredients_db, list(ingredients_db), delta))
+    assert list(store.load("ingredients", {}).items()) == list(merged.items())
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_sqlite_applies_the_same_edits(tmp_path, name):
+    delta = CASES[name][0]
+    store = SqliteStore(str(tmp_path / "recipes.db"))
+    store.save("ingredients", DB)
+    store.apply_ingredients(*ingredient_edits(DB, NAMES, delta))
+    assert list(store.load("ingredients", {}).items()) == list(apply(DB, delta)[0].items())
+
+
+def test_rename_recipe_ingredients():
+    recipe = {"id": "r1", "name": "עוגה", "calories": 300,
+              "ingredients": [{"amount": 200, "unit": "גרם", "ingredient": "קמח"},
+                              {"amount": 2, "unit": "יחידה", "ingredient": "ביצה"},
+                              {"amount": 1, "unit": "כף", "ingredient": "שמן"}]}
+    renamed = rename_recipe_ingredients(recipe, {"קמח": "שמן", "שמן": "קמח", "חלב": "חלב 3%"})
+    assert [ing["ingredient"] for ing in renamed["ingredients"]] == ["שמן", "ביצה", "קמח"]
+    assert [ing["amount"] for ing in renamed["ingredients"]] == [200, 2, 1]
+    assert {k: v for k, v in renamed.items() if k != "ingredients"} == {"id": "r1", "name": "עוגה", "calories": 300}
+    # המקור לא השתנה
+    assert [ing["ingredient"] for ing in recipe["ingredients"]] == ["קמח", "ביצה", "שמן"]
+
+
+@pytest.mark.parametrize("delta, expected, changed", [
+    ({}, ["בוקר", "צהריים", "ערב"], False),
+    ({"edited_rows": {"0": {"קטגוריה": "ארוחת בוקר"}}}, ["ארוחת בוקר", "צהריים", "ערב"], True),
+    ({"edited_rows": {"1": {"קטגוריה": ""}}}, ["בוקר", "ערב"], True),
+    ({"deleted_rows": [0, 2]}, ["צהריים"], True),
+    ({"added_rows": [{"קטגוריה": "קינוח"}, {"קטגוריה": ""}, {}]}, ["בוקר", "צהריים", "ערב", "קינוח"], True),
+    ({"edited_rows": {"1": {"קטגוריה": "צהריים"}}}, ["בוקר", "צהריים", "ערב"], False),
+    ({"edited_rows": {"2": {"קטגוריה": "לילה"}}, "deleted_rows": [2]}, ["בוקר", "צהריים"], True),
+])
+def test_category_edits(delta, expected, changed):
+    assert category_edits(["בוקר", "צהריים", "ערב"], delta) == (expected, changed)
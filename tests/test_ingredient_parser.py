@@ -0,0 +1,74 @@
+"""
+פענוח שורות מצרכים חופשיות (כמות, יחידה, שם) והתאמת השם למאגר דרך אינדקס הטריגרמות.
+"""
+import pytest
+
+from recipe_core import (DEFAULT_INGREDIENTS, build_ingredient_matcher, match_ingredient, parse_imported_ingredients,
+                         parse_ingredient_text)
+
+PARSE_CASES = [
+    # שורה, כמות, יחידה, שם
+    ("2 ביצים", 2, "יחידה", "ביצים"),
+    ("100 גרם חזה עוף", 100, "גרם", "חזה עוף"),
+    ("100 גר' אורז", 100, "גרם", "אורז"),
+    ("1.5 כוסות קמח", 360, "מ''ל", "קמח"),
+    ("1,5 כוסות קמח", 360, "מ''ל", "קמח"),
+    ("1,000 גרם קמח", 1000, "גרם", "קמח"),
+    ("2,500 מ\"ל מים", 2500, "מ''ל", "מים"),
+    ("1,250.5 גרם קמח", 1250.5, "גרם", "קמח"),
+    ("1/2 כוס חלב", 120, "מ''ל", "חלב"),
+    ("1 1/2 כוס חלב", 360, "מ''ל", "חלב"),
+    ("1½ כפות סוכר", 1.5, "כף", "סוכר"),
+    ("½ tsp salt", 0.5, "כפית", "salt"),
+    ("1 וחצי כוסות קמח", 360, "מ''ל", "קמח"),
+    ("כוס וחצי קמח", 360, "מ''ל", "קמח"),
+    ("שלוש ביצים", 3, "יחידה", "ביצים"),
+    ("חצי כוס שמן", 120, "מ''ל", "שמן"),
+    ("1 ק\"ג תפוחי אדמה", 1000, "גרם", "תפוחי אדמה"),
+    ("1 קילו של עגבניות", 1000, "גרם", "עגבניות"),
+    ("2-3 שיני שום", 2, "יחידה", "שיני שום"),
+    ("2 כפות + 1 כפית סוכר", 2.33, "כף", "סוכר"),
+    ("2 כפות+1 כפית סוכר", 2.33, "כף", "סוכר"),
+    ("2 כפות + כפית סוכר", 2.33, "כף", "סוכר"),
+    ("1 ק\"ג ועוד 200 גרם קמח", 1200, "גרם", "קמח"),
+    ("1 + 1/2 כוס קמח", 360, "מ''ל", "קמח"),
+    ("1 כוס + 2 כפות חלב", 270, "מ''ל", "חלב"),
+    ("2 tbsp olive oil", 2, "כף", "olive oil"),
+    ("קורט מלח", 1, "יחידה", "קורט מלח"),
+    ("מלח ופלפל", 1, "יחידה", "מלח ופלפל"),
+]
+
+
+@pytest.mark.parametrize("line, amount, unit, name", PARSE_CASES)
+def test_parse_ingredient_text(line, amount, unit, name):
+    assert parse_ingredient_text(line) == {"amount": amount, "unit": unit, "ingredient": name}
+
+
+MATCH_CASES = [
+    ("חזה עוף (חי)", "חזה עוף (חי)"),
+    ("חזה עוף", "חזה עוף (חי)"),
+    ("חזה עוף טרי חתוך לקוביות", "חזה עוף (חי)"),
+    ("שמן זית כתית", "שמן זית"),
+    ("עגבניות", "עגבניה"),
+    ("מלפפונים", "מלפפון"),
+    ("ביצה", "ביצה (L)"),
+    ("טונה במים", "טונה במים (מסונן)"),
+    ("שיבולת שועל דקה", "שיבולת שועל"),
+    ("אבוקדו", None),
+    ("", None),
+]
+
+
+@pytest.mark.parametrize("name, expected", MATCH_CASES)
+def test_match_ingredient(name, expected):
+    assert match_ingredient(build_ingredient_matcher(DEFAULT_INGREDIENTS), name) == expected
+
+
+def test_parse_imported_ingredients_maps_to_db_names():
+    lines = ["200 גרם חזה עוף", "", "2 כפות + 1 כפית שמן זית", "1,000 גרם עגבניות", "קורט מלח"]
+    assert parse_imported_ingredients(lines, build_ingredient_matcher(DEFAULT_INGREDIENTS)) == [
+        {"amount": 200, "unit": "גרם", "ingredient": "חזה עוף (חי)"},
+        {"amount": 2.33, "unit": "כף", "ingredient": "שמן זית"},
+        {"amount": 1000, "unit": "גרם", "ingredient": "עגבניה"},
+        {"amount": 1, "unit": "יחידה", "ingredient": "קורט מלח"},
+    ]
@@ -0,0 +1,130 @@
+"""
+תכנון התפריט (plan_meals) על ספרייה אקראית עם seed קבוע: התפריט קרוב ליעד, המנות על הגריד,
+כל ארוחה מהקטגוריה שלה בלי חזרות, ומקרי קצה - ספרייה ריקה, ארוחה בלי מתכונים ויעד שאי אפשר להגיע אליו.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from recipe_core import MACRO_FIELDS, MEAL_PLAN_SERVINGS, build_recipe_summary, plan_meals
+
+SLOTS = ["בוקר", "צהריים", "ערב", "נשנוש"]
+TARGETS = {"calories": 2000, "protein": 150, "carbs": 200, "fats": 65}
+
+
+def make_recipe(i, rng, category):
+    protein, carbs, fats = rng.uniform(2, 45), rng.uniform(0, 90), rng.uniform(1, 35)
+    return {"id": f"r{i}", "name": f"מתכון {i}", "image": "🥘", "category": category,
+            "calories": round(protein * 4 + carbs * 4 + fats * 9), "protein": round(protein, 1),
+            "carbs": round(carbs, 1), "fats": round(fats, 1)}
+
+
+def library(size, seed=0):
+    rng = random.Random(seed)
+    return build_recipe_summary([make_recipe(i, rng, rng.choice(SLOTS)) for i in range(size)])
+
+
+def random_plan_deviation(summary, rng):
+    """הבסיס להשוואה: מתכון אקראי מכל קטגוריה, מנה אחת."""
+    totals = np.zeros(4)
+    for slot in SLOTS:
+        rows = summary[summary["category"] == slot]
+        totals += rows.iloc[rng.randrange(len(rows))][MACRO_FIELDS].to_numpy(dtype=float)
+    target = np.array([TARGETS[k] for k in MACRO_FIELDS], dtype=float)
+    return float(np.sqrt((((totals - target) / target) ** 2).mean()) * 100)
+
+
+def test_plan_fits_targets():
+    summary = library(400)
+    plan = plan_meals(summary, TARGETS, SLOTS, days=7)
+    by_id = summary.set_index("id")
+    low, high, step = MEAL_PLAN_SERVINGS
+
+    assert [day["day"] for day in plan] == list(range(1, 8))
+    ids = [meal["id"] for day in plan for meal in day["meals"]]
+    assert None not in ids and len(set(ids)) == len(ids)
+    for day in plan:
+        assert [meal["slot"] for meal in day["meals"]] == SLOTS
+        for meal in day["meals"]:
+            assert by_id.loc[meal["id"], "category"] == meal["slot"]
+            assert low <= meal["servings"] <= high and (meal["servings"] / step).is_integer()
+            for key in MACRO_FIELDS:
+                assert meal[key] == pytest.approx(by_id.loc[meal["id"], key] * meal["servings"])
+        for key in MACRO_FIELDS:
+            assert day["totals"][key] == pytest.approx(sum(meal[key] for meal in day["meals"]))
+            assert day["totals"][key] == pytest.approx(TARGETS[key], rel=0.15)
+        assert day["deviation"] < 3
+
+    rng = random.Random(1)
+    baseline = np.mean([random_plan_deviation(summary, rng) for _ in range(50)])
+    assert max(day["deviation"] for day in plan) < baseline / 3
+
+
+def test_plan_is_deterministic():
+    summary = library(300)
+    assert plan_meals(summary, TARGETS, SLOTS, days=3) == plan_meals(summary, TARGETS, SLOTS, days=3)
+
+
+def test_exact_fit():
+    # מנה אחת מכל מתכון נותנת בדיוק את היעד. לכל ארוחה יחס מאקרו אחר, כך שזה הפתרון המדויק היחיד
+    exact = {"בוקר": (500, 20, 80, 10), "צהריים": (700, 70, 50, 20),
+             "ערב": (600, 50, 30, 30), "נשנוש": (200, 10, 40, 5)}
+    recipes = [dict(zip(MACRO_FIELDS, values), id=slot, name=slot, image="🥘", category=slot)
+               for slot, values in exact.items()]
+    day = plan_meals(build_recipe_summary(recipes), TARGETS, SLOTS, days=1)[0]
+    assert [(meal["id"], meal["servings"]) for meal in day["meals"]] == [(slot, 1.0) for slot in SLOTS]
+    assert day["deviation"] == pytest.approx(0, abs=1e-9)
+
+
+def test_repeats_only_when_recipes_run_out():
+    summary = library(40)
+    per_slot = summary["category"].value_counts()
+    plan = plan_meals(summary, TARGETS, SLOTS, days=30)
+    for slot in SLOTS:
+        ids = [meal["id"] for day in plan for meal in day["meals"] if meal["slot"] == slot]
+        # כל מתכון בקטגוריה מופיע לפני שמתכון כלשהו חוזר
+        assert len(set(ids[:per_slot[slot]])) == per_slot[slot]
+        assert all(len({m["id"] for m in day["meals"]}) == len(SLOTS) for day in plan)
+
+
+def test_empty_library():
+    plan = plan_meals(build_recipe_summary([]), TARGETS, SLOTS, days=2)
+    assert len(plan) == 2
+    for day in plan:
+        assert day["meals"] == [{"slot": slot, "id": None} for slot in SLOTS]
+        assert day["totals"] == {k: 0.0 for k in MACRO_FIELDS}
+        assert day["deviation"] == pytest.approx(100)
+
+
+def test_slot_without_recipes_stays_empty():
+    summary = library(200)
+    summary = summary[summary["category"] != "נשנוש"].reset_index(drop=True)
+    # מתכונים בלי קלוריות לא נכנסים לתפריט
+    summary.loc[summary["category"] == "ערב", "calories"] = 0
+    plan = plan_meals(summary, TARGETS, SLOTS, days=3)
+    for day in plan:
+        meals = {meal["slot"]: meal for meal in day["meals"]}
+        assert meals["נשנוש"] == {"slot": "נשנוש", "id": None}
+        assert meals["ערב"] == {"slot": "ערב", "id": None}
+        assert meals["בוקר"]["id"] is not None and meals["צהריים"]["id"] is not None
+
+
+def test_unreachable_target_caps_servings():
+    summary = library(200)
+    targets = {"calories": 100000, "protein": 0, "carbs": 0, "fats": 0}
+    high = MEAL_PLAN_SERVINGS[1]
+    for day in plan_meals(summary, targets, SLOTS, days=2):
+        assert all(meal["servings"] == high for meal in day["meals"])
+        # הארוחות הכי עתירות קלוריות בקטגוריה
+        for meal in day["meals"]:
+            top = summary[summary["category"] == meal["slot"]]["calories"].nlargest(2)
+            assert meal["calories"] / high in set(top)
+        assert day["deviation"] > 90
+
+
+def test_no_targets():
+    # בלי יעדים כל תפריט טוב באותה מידה: מנה אחת מכל ארוחה, סטייה 0
+    for day in plan_meals(library(100), {}, SLOTS, days=2):
+        assert all(meal["servings"] == 1.0 for meal in day["meals"])
+        assert day["deviation"] == 0
@@ -0,0 +1,110 @@
+"""
+מנוע החישוב בבת אחת (calculate_nutrition_batch / recalc_all_recipes) והחישוב למתכון בודד
+נותנים בדיוק את אותם מספרים שלמים כמו הלולאה המקורית על השורות.
+"""
+import copy
+import random
+
+import pandas as pd
+import pytest
+
+from recipe_core import (WEIGHT_CONVERTER, calculate_nutrition, calculate_nutrition_batch, flatten_ingredient_lines,
+                         parse_ingredients_list, recalc_all_recipes)
+
+UNITS = ["גרם", "מ''ל", "כף", "כפית", "יחידה", "כוס"]
+
+
+def old_calculate_nutrition(df_ingredients, ingredients_db):
+    """העתק של הלולאה המקורית מ-main.py (iterrows), כמקור אמת."""
+    total = {"pro": 0, "carb": 0, "fat": 0}
+    if df_ingredients.empty: return {"cal": 0, "pro": 0, "carb": 0, "fat": 0}
+
+    for _, row in df_ingredients.iterrows():
+        name = row["שם המצרך"]
+        amount = row["כמות"]
+        unit = row["יחידה"]
+
+        if name in ingredients_db and amount > 0:
+            db_item = ingredients_db[name]
+            measure_type = db_item.get("measure_type", "100g")
+            vals = db_item["vals"]
+            ratio = 0
+
+            if measure_type == "unit":
+                if unit == "יחידה":
+                    ratio = amount
+                else:
+                    ratio = 0
+            else:
+                weight_in_grams = amount * WEIGHT_CONVERTER.get(unit, 1)
+                ratio = weight_in_grams / 100
+
+            if ratio > 0:
+                total["pro"] += vals[1] * ratio
+                total["carb"] += vals[2] * ratio
+                total["fat"] += vals[3] * ratio
+
+    total_cal = (total["pro"] * 4) + (total["carb"] * 4) + (total["fat"] * 9)
+    return {
+        "cal": int(total_cal),
+        "pro": int(total["pro"]),
+        "carb": int(total["carb"]),
+        "fat": int(total["fat"])
+    }
+
+
+def make_db(rng, n=40):
+    db = {}
+    for i in range(n):
+        item = {"vals": [0] + [round(rng.uniform(0, high), 1) for high in (40, 80, 30)]}
+        if rng.random() < 0.3:
+            item["measure_type"] = "unit"
+        elif rng.random() < 0.5:
+            item["measure_type"] = "100g"
+        db[f"מצרך {i}"] = item
+    return db
+
+
+def make_recipes(rng, db, n=300):
+    names = list(db) + ["לא במאגר", "עוד מצרך לא מוכר"]
+    recipes = []
+    for i in range(n):
+        lines = []
+        for _ in range(rng.randint(0, 8)):
+            amount = rng.choice([0.0, -1.0, 1.0, 2.5, 0.5, float(rng.randint(1, 500)), round(rng.uniform(0, 300), 2)])
+            lines.append({"amount": amount, "unit": rng.choice(UNITS), "ingredient": rng.choice(names)})
+        recipes.append({"id": f"r{i}", "name": f"מתכון {i}", "ingredients": lines})
+    return recipes
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_and_single_match_the_old_loop(seed):
+    rng = random.Random(seed)
+    db = make_db(rng)
+    recipes = make_recipes(rng, db)
+    expected = [old_calculate_nutrition(parse_ingredients_list(r["ingredients"]), db) for r in recipes]
+
+    recalculated = copy.deepcopy(recipes)
+    assert recalc_all_recipes(recalculated, db) == len(recipes)
+    assert [{"cal": r["calories"], "pro": r["protein"], "carb": r["carbs"], "fat": r["fats"]}
+            for r in recalculated] == expected
+
+    batch = calculate_nutrition_batch(flatten_ingredient_lines(r["ingredients"] for r in recipes), len(recipes), db)
+    assert batch.to_dict("records") == expected
+
+    assert [calculate_nutrition(parse_ingredients_list(r["ingredients"]), db) for r in recipes] == expected
+
+
+def test_unit_items_count_only_in_units():
+    db = {"ביצה": {"vals": [70, 6, 0.5, 5], "measure_type": "unit"}, "קמח": {"vals": [364, 10, 76, 1]}}
+    df = pd.DataFrame({"שם המצרך": ["ביצה", "ביצה", "קמח"], "כמות": [2.0, 100.0, 2.0],
+                       "יחידה": ["יחידה", "גרם", "כף"]})
+    # 2 ביצים + 30 גרם קמח. 100 גרם ביצה לא נספרים
+    expected = {"cal": 247, "pro": 15, "carb": 23, "fat": 10}
+    assert calculate_nutrition(df, db) == old_calculate_nutrition(df, db) == expected
+
+
+def test_empty_inputs():
+    assert calculate_nutrition(parse_ingredients_list([]), {}) == {"cal": 0, "pro": 0, "carb": 0, "fat": 0}
+    assert calculate_nutrition_batch(flatten_ingredient_lines([[], []]), 2, {}).to_dict("records") == \
+        [{"cal": 0, "pro": 0, "carb": 0, "fat": 0}] * 2
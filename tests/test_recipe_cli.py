@@ -0,0 +1,179 @@
+"""
+כלי האצווה recipe_cli על ספרייה קטנה בתיקייה זמנית: recalc / import / export / unmatched,
+הקריאה והכתיבה בזרימה של מערכי JSON, והחלפת הקובץ רק אם לא השתנה בינתיים.
+"""
+import copy
+import csv
+import io
+import json
+
+import pytest
+
+import recipe_cli
+from recipe_core import (CATEGORIES_FILE, DEFAULT_INGREDIENTS, RECIPES_FILE, TRASH_FILE, DataStore, _file_stat,
+                         iter_json_array, load_json, recalc_all_recipes, replace_if_unchanged, save_json,
+                         write_json_array)
+
+
+def make_recipe(recipe_id, name, ingredients, category="ערב"):
+    return {"id": recipe_id, "name": name, "image": "🥘", "category": category,
+            "ingredients": [{"amount": amount, "unit": unit, "ingredient": ing} for amount, unit, ing in ingredients],
+            "calories": 0, "protein": 0, "carbs": 0, "fats": 0, "instructions": ""}
+
+
+RECIPES = [
+    make_recipe("r1", "עוף ואורז", [(200, "גרם", "חזה עוף (חי)"), (100, "גרם", "אורז בסמטי (לפני בישול)")]),
+    make_recipe("r2", "חביתה", [(2, "יחידה", "ביצה (L)"), (1, "כף", "שמן זית"), (1, "יחידה", "עירית")], "בוקר"),
+    make_recipe("r3", "סלט", [(150, "גרם", "מלפפון"), (150, "גרם", "עגבניה"), (1, "יחידה", "עירית"),
+                              (1, "כפית", "סומק")], "צהריים"),
+]
+
+
+@pytest.fixture(autouse=True)
+def library(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_json(RECIPES_FILE, RECIPES)
+    save_json(CATEGORIES_FILE, ["בוקר", "צהריים", "ערב"])
+    return tmp_path
+
+
+def run(capsys, *argv):
+    recipe_cli.main(["--dir", "."] + list(argv))
+    return capsys.readouterr()
+
+
+def read(filename):
+    with open(filename, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def expected_recalc(recipes):
+    recipes = copy.deepcopy(recipes)
+    recalc_all_recipes(recipes, DEFAULT_INGREDIENTS)
+    return recipes
+
+
+def test_recalc(capsys):
+    out = run(capsys, "recalc", "--workers", "2", "--chunk-size", "2").out
+    assert out.strip() == "חושבו מחדש 3 מתכונים, 3 השתנו"
+    assert load_json(RECIPES_FILE, []) == expected_recalc(RECIPES)
+    assert run(capsys, "recalc", "--workers", "1").out.strip() == "חושבו מחדש 3 מתכונים, 0 השתנו"
+
+
+def test_recalc_keeps_journal_records_on_top(capsys):
+    store = DataStore()
+    store.load(RECIPES_FILE, [])
+    store.load(TRASH_FILE, [])
+    store.update_recipes([dict(RECIPES[0], name="עוף ואורז מהיומן")])
+    store.trash_recipes(["r2"])
+
+    run(capsys, "recalc", "--workers", "1")
+    run(capsys, "export", "--out", "out.jsonl")
+    exported = [json.loads(line) for line in read("out.jsonl").splitlines()]
+    assert [(r["id"], r["name"]) for r in exported] == [("r1", "עוף ואורז מהיומן"), ("r3", "סלט")]
+    # ה-snapshot חושב מחדש, והרשומות ביומן נשארו כפי שנשמרו
+    assert exported[1] == expected_recalc(RECIPES)[2]
+
+
+def test_import_jsonl_skips_duplicates(capsys, library):
+    records = [
+        {"name": "שקשוקה", "ingredients": ["4 ביצים", "1,000 גרם עגבניות", "2 כפות + 1 כפית שמן זית"]},
+        {"name": "חביתה", "category": "בוקר", "ingredients": [
+            {"amount": 3, "unit": "יחידה", "ingredient": "ביצה (L)"},
+            {"amount": 5, "unit": "כפית", "ingredient": "שמן זית"},
+            {"amount": 1, "unit": "יחידה", "ingredient": "עירית"}]},
+        {"name": "שקשוקה", "ingredients": "2 ביצים; 500 גרם עגבניות; 1 כף שמן זית"},
+    ]
+    (library / "new.jsonl").write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records),
+                                       encoding="utf-8")
+    out = run(capsys, "import", "new.jsonl", "--category", "ערב", "--workers", "1", "--chunk-size", "1").out
+    assert out.strip() == "נוספו 1 מתכונים, 2 כפולים דולגו"
+
+    recipes = load_json(RECIPES_FILE, [])
+    assert recipes[:3] == RECIPES
+    added = recipes[3]
+    assert (added["name"], added["category"]) == ("שקשוקה", "ערב")
+    assert added["ingredients"] == [{"amount": 4, "unit": "יחידה", "ingredient": "ביצה (L)"},
+                                    {"amount": 1000, "unit": "גרם", "ingredient": "עגבניה"},
+                                    {"amount": 2.33, "unit": "כף", "ingredient": "שמן זית"}]
+    assert added == expected_recalc([added])[0] and added["calories"] > 0
+
+
+def test_import_csv_uses_first_category(capsys, library):
+    with open(library / "new.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["name", "ingredients", "instructions"])
+        writer.writeheader()
+        writer.writerow({"name": "אורז", "ingredients": "100 גרם אורז בסמטי\n1 כף שמן זית", "instructions": "מבשלים."})
+    assert run(capsys, "import", "new.csv", "--workers", "1").out.strip() == "נוספו 1 מתכונים, 0 כפולים דולגו"
+    added = load_json(RECIPES_FILE, [])[-1]
+    assert (added["category"], added["instructions"]) == ("בוקר", "מבשלים.")
+    assert [ing["ingredient"] for ing in added["ingredients"]] == ["אורז בסמטי (לפני בישול)", "שמן זית"]
+
+
+def test_export_csv(capsys):
+    assert run(capsys, "export", "--format", "csv", "--out", "out.csv").err.strip() == "יוצאו 3 מתכונים"
+    rows = list(csv.DictReader(io.StringIO(read("out.csv"))))
+    assert [row["id"] for row in rows] == ["r1", "r2", "r3"]
+    assert rows[1]["ingredients"].splitlines() == ["2 יחידה ביצה (L)", "1 כף שמן זית", "1 יחידה עירית"]
+
+
+def test_unmatched(capsys):
+    run(capsys, "unmatched", "--out", "unmatched.tsv")
+    rows = [line.split("\t") for line in read("unmatched.tsv").splitlines()]
+    assert rows == [["ingredient", "recipes", "suggestion"], ["עירית", "2", ""], ["סומק", "1", ""]]
+    run(capsys, "unmatched", "--limit", "1", "--out", "unmatched.tsv")
+    assert len(read("unmatched.tsv").splitlines()) == 2
+
+
+@pytest.mark.parametrize("items", [
+    [],
+    [{}],
+    RECIPES,
+    [{"text": "מחרוזת עם ] , [ ו-\"מרכאות\"", "n": i, "nested": [[], {"a": [1, 2]}]} for i in range(50)],
+])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_json_array_round_trip(items, chunk_size):
+    assert write_json_array("items.json", iter(items)) == len(items)
+    assert list(iter_json_array("items.json", chunk_size=chunk_size)) == items
+    # אותו פורמט כמו save_json, כך שהאפליקציה קוראת את הקובץ כרגיל
+    save_json("saved.json", items)
+    with open("items.json", encoding="utf-8") as a, open("saved.json", encoding="utf-8") as b:
+        assert a.read() == b.read()
+
+
+@pytest.mark.parametrize("content", ['{"a": 1}', '[{"a": 1}, {"b":', "[1, 2"])
+def test_iter_json_array_rejects_bad_files(content):
+    with open("bad.json", "w", encoding="utf-8") as f:
+        f.write(content)
+    with pytest.raises(ValueError):
+        list(iter_json_array("bad.json", chunk_size=4))
+
+
+def test_replace_if_unchanged():
+    expected_stat = _file_stat(RECIPES_FILE)
+    write_json_array("recipes.tmp", RECIPES[:1])
+    assert replace_if_unchanged(RECIPES_FILE, "recipes.tmp", expected_stat)
+    assert load_json(RECIPES_FILE, []) == RECIPES[:1]
+
+    # הקובץ השתנה מאז שהתחלנו: לא מחליפים, והקובץ הזמני נמחק
+    expected_stat = _file_stat(RECIPES_FILE)
+    save_json(RECIPES_FILE, RECIPES)
+    write_json_array("recipes.tmp", [])
+    assert not replace_if_unchanged(RECIPES_FILE, "recipes.tmp", expected_stat)
+    assert load_json(RECIPES_FILE, []) == RECIPES
+    with pytest.raises(FileNotFoundError):
+        open("recipes.tmp")
+
+
+def test_recalc_refuses_when_library_changed_meanwhile(capsys, monkeypatch):
+    real_write = recipe_cli.write_json_array
+
+    def write_and_touch(filename, items):
+        count = real_write(filename, items)
+        save_json(RECIPES_FILE, RECIPES[:2])
+        return count
+
+    monkeypatch.setattr(recipe_cli, "write_json_array", write_and_touch)
+    with pytest.raises(SystemExit):
+        run(capsys, "recalc", "--workers", "1")
+    assert load_json(RECIPES_FILE, []) == RECIPES[:2]
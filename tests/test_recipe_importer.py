@@ -0,0 +1,145 @@
+"""
+ייבוא מתכונים מול שרת מקומי שמגיש דפים שמורים (tests/pages): דף מתכון שמפוענח עד הסוף,
+ניסיון חוזר אחרי תקלה זמנית, קידוד לא מוכר, חיבור שנקטע באמצע, וקישור אחד שנכשל
+בלי להפיל את שאר הייבוא.
+"""
+import http.server
+import os
+import threading
+
+import pytest
+
+import recipe_importer
+from recipe_importer import fetch_html, import_urls
+
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # נתיב -> כמה פעמים ביקשו אותו (לדף שנכשל בפעם הראשונה)
+    hits = {}
+
+    def do_GET(self):
+        body = "<html>שלום</html>".encode("utf-8")
+        hits = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        page = os.path.join(PAGES_DIR, os.path.basename(self.path.split("?")[0]))
+        if self.path.startswith("/pages/") and os.path.isfile(page):
+            if "flaky" in self.path and hits == 1:
+                self.send_response(503)
+                self.end_headers()
+                return
+            with open(page, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/bad-charset":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=no-such-charset")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/cut":
+            # מבטיח יותר ממה שנשלח ונסגר - read() זורק IncompleteRead
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body) + 100))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.hits = {}
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+SHAKSHUKA = {
+    "name": "שקשוקה ביתית",
+    "raw_ingredients": ["4 ביצים", "2 כפות שמן זית", "1 בצל", "400 גרם עגבניות מרוסקות"],
+    "instructions": "מטגנים את הבצל בשמן זית.\nמוסיפים את העגבניות ומבשלים 10 דקות.\n"
+                    "שוברים פנימה את הביצים ומכסים עד שהן מתייצבות.",
+}
+
+
+@pytest.mark.skipif(not recipe_importer.HAS_SCRAPER, reason="חסרה ספריית recipe-scrapers")
+def test_saved_recipe_page_is_imported(server):
+    url = f"{server}/pages/shakshuka.html"
+    [result] = import_urls([url], retries=0)
+    assert result["ok"] and result["attempts"] == 1 and not result["cached"]
+    assert result["recipe"] == SHAKSHUKA
+    with open(os.path.join(PAGES_DIR, "shakshuka.html"), encoding="utf-8") as f:
+        assert recipe_importer.parse_recipe_html(f.read(), url) == SHAKSHUKA
+
+
+@pytest.mark.skipif(not recipe_importer.HAS_SCRAPER, reason="חסרה ספריית recipe-scrapers")
+def test_batch_import_retries_and_keeps_input_order(server):
+    urls = [f"{server}/pages/shakshuka.html?flaky=1", f"{server}/missing", f"{server}/pages/shakshuka.html"]
+    progress = []
+    results = import_urls(urls, workers=3, retries=1, backoff=0.01,
+                          on_result=lambda done, total, result: progress.append((done, total)))
+    assert [r["url"] for r in results] == urls
+    assert [r["ok"] for r in results] == [True, False, True]
+    assert results[0]["attempts"] == 2 and results[0]["recipe"]["name"] == SHAKSHUKA["name"]
+    assert results[1]["error"] == "HTTP 404"
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_unknown_charset_falls_back_to_utf8(server):
+    html, attempts = fetch_html(f"{server}/bad-charset", retries=0)
+    assert html == "<html>שלום</html>" and attempts == 1
+
+
+def test_os_error_while_reading_is_retried(monkeypatch):
+    calls = []
+
+    def broken_urlopen(request, timeout):
+        calls.append(request)
+        raise OSError("ssl: bad record mac")
+
+    monkeypatch.setattr(recipe_importer.urllib.request, "urlopen", broken_urlopen)
+    with pytest.raises(recipe_importer.FetchError) as info:
+        fetch_html("http://example.com/r", retries=2, backoff=0)
+    assert info.value.attempts == 3 and len(calls) == 3
+
+
+def test_cut_connection_becomes_error_result(server):
+    [result] = import_urls([f"{server}/cut"], retries=0, backoff=0)
+    assert result["ok"] is False and result["attempts"] == 1
+
+
+def test_one_crashing_url_does_not_stop_the_batch(monkeypatch):
+    def flaky_import_one(url, *args):
+        if "bad" in url:
+            raise RuntimeError("boom")
+        return {"url": url, "ok": True, "attempts": 1, "cached": False, "recipe": {}}
+
+    monkeypatch.setattr(recipe_importer, "import_one", flaky_import_one)
+    seen = []
+    results = import_urls(["http://a.com/1", "http://a.com/bad", "http://a.com/2"],
+                          on_result=lambda done, total, result: seen.append(result["url"]))
+    assert [r["ok"] for r in results] == [True, False, True]
+    assert results[1]["url"] == "http://a.com/bad" and results[1]["error"] == "boom"
+    assert len(seen) == 3
+
+
+@pytest.mark.parametrize("bad", ["http://x.com:abc/", "http://[::1/recipe", "https://x.com:99999/"])
+def test_unparsable_url_is_kept_and_reported(bad):
+    assert recipe_importer.normalize_url(bad) == bad
+    assert recipe_importer.read_url_list(f"{bad}\nhttp://www.x.com/r?utm_source=a\nhttp://x.com/r/") == \
+        [bad, "http://www.x.com/r?utm_source=a"]
+    [result] = import_urls([bad], retries=0, backoff=0)
+    assert result["ok"] is False and result["error"]
@@ -0,0 +1,80 @@
+"""
+אינדקס החיפוש החופשי מול סריקה פשוטה של הטקסט: ניקוד, אותיות סופיות, חיפוש לפי תחילית,
+ועדכון האינדקס אחרי הוספה, עריכה והעברה לפח.
+"""
+import random
+
+import pytest
+
+from recipe_core import RecordList, build_search_index, normalize_text, search_recipes, tokenize
+
+WORDS = ["עוף", "עופות", "שקשוקה", "שַׁקְשׁוּקָה", "לחם", "לחמניה", "סלט", "סלמון", "ביצה", "ביצים",
+         "קמח", "קמחים", "Pasta", "pastry", "תפוח", "תפוחים", "אדמה", "בצל", "שום", "שמן"]
+
+
+def make_recipe(i, rng):
+    return {
+        "id": f"r{i}",
+        "name": " ".join(rng.sample(WORDS, 2)),
+        "instructions": " ".join(rng.choices(WORDS, k=rng.randint(0, 5))) + ".",
+        "ingredients": [{"amount": 1.0, "unit": "יחידה", "ingredient": w} for w in rng.sample(WORDS, 2)],
+    }
+
+
+def scan(recipes, query):
+    """הדרך הפשוטה: כל מילה בשאילתה מופיעה כתחילת מילה בטקסט המנורמל של המתכון."""
+    terms = tokenize(query)
+    result = set()
+    for recipe in recipes:
+        fields = [recipe["name"], recipe["instructions"]] + [ing["ingredient"] for ing in recipe["ingredients"]]
+        text = " " + " ".join(" ".join(tokenize(field)) for field in fields)
+        if all(" " + term in text for term in terms):
+            result.add(recipe["id"])
+    return result if terms else set()
+
+
+QUERIES = ["עוף", "עופ", "ע", "שקשוקה", "שַׁקְשׁוּקָה", "לחמ", "לחם", "סל", "סלט עוף", "PAST", "pasta",
+           "תפוח אדמה", "ביצ שום", "אין כזה", "", "!!"]
+
+
+def test_normalization():
+    assert normalize_text("שַׁקְשׁוּקָה") == "שקשוקה"
+    assert normalize_text("לחם ועוף") == "לחמ ועופ"
+    assert tokenize("Pasta, עם  שמן!") == ["pasta", "עמ", "שמנ"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_scan(query):
+    rng = random.Random(0)
+    recipes = [make_recipe(i, rng) for i in range(200)]
+    assert search_recipes(build_search_index(recipes), query) == scan(recipes, query)
+
+
+def test_niqqud_and_final_letters():
+    recipes = [{"id": "a", "name": "שַׁקְשׁוּקָה", "instructions": "", "ingredients": []},
+               {"id": "b", "name": "מרק עופות", "instructions": "", "ingredients": []}]
+    index = build_search_index(recipes)
+    assert search_recipes(index, "שקשוקה") == {"a"}
+    # "עוף" עם ף סופית היא תחילית של "עופות"
+    assert search_recipes(index, "עוף") == {"b"}
+
+
+def test_index_follows_add_update_and_trash():
+    rng = random.Random(1)
+    records = RecordList([make_recipe(i, rng) for i in range(100)])
+    records.index("search")
+    next_id = 100
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.4:
+            records.append(make_recipe(next_id, rng))
+            next_id += 1
+        elif op < 0.7 and len(records):
+            recipe_id = rng.choice(records.items)["id"]
+            records.replace(recipe_id, dict(make_recipe(0, rng), id=recipe_id))
+        elif len(records):
+            records.pop(rng.choice(records.items)["id"])
+    index = records.index("search")
+    assert index["vocab"] == sorted(index["postings"])
+    for query in QUERIES:
+        assert search_recipes(index, query) == scan(records.items, query), query
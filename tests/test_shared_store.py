@@ -0,0 +1,166 @@
+"""
+פעולות על המתכונים והפח מכמה ת'רדים במקביל (כמו כמה סשנים של streamlit על אותו DataStore):
+כל מזהה נשאר בדיוק פעם אחת, והמיקומים, האינדקסים והקבצים מתאימים לרשימות.
+"""
+import random
+import threading
+
+import pytest
+
+import recipe_core
+from recipe_core import RECIPES_FILE, TRASH_FILE, RECIPE_INDEXES, DataStore, save_json
+
+N_RECIPES = 120
+N_THREADS = 6
+OPS_PER_THREAD = 150
+
+
+def make_recipe(i):
+    return {
+        "id": f"r{i}",
+        "name": f"מתכון {i}",
+        "image": "🥘",
+        "category": ["בוקר", "צהריים", "ערב"][i % 3],
+        "ingredients": [{"amount": 100.0, "unit": "גרם", "ingredient": f"מצרך {i % 7}"},
+                        {"amount": 1.0, "unit": "יחידה", "ingredient": f"מצרך {i % 5 + 10}"}],
+        "instructions": "",
+        "calories": 0, "protein": 0, "carbs": 0, "fats": 0,
+    }
+
+
+def _non_empty(index):
+    # הסרה משאירה לפעמים קבוצה ריקה, בנייה מאפס לא
+    if "postings" in index:
+        index = index["postings"]
+    return {key: ids for key, ids in index.items() if ids}
+
+
+@pytest.fixture(params=["journal", "snapshot"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(recipe_core, "PERSISTENCE_MODE", request.param)
+    # דחיסה של היומן תוך כדי הבדיקה
+    monkeypatch.setattr(recipe_core, "JOURNAL_COMPACT_EVERY", 40)
+    save_json(RECIPES_FILE, [make_recipe(i) for i in range(N_RECIPES)])
+    save_json(TRASH_FILE, [])
+    store = DataStore()
+    store.load(RECIPES_FILE, [])
+    store.load(TRASH_FILE, [])
+    with store.locked():
+        for name in RECIPE_INDEXES:
+            store.records(RECIPES_FILE).index(name)
+    return store
+
+
+def test_concurrent_trash_restore_purge(store):
+    all_ids = [f"r{i}" for i in range(N_RECIPES)]
+    purged = set()
+    purged_lock = threading.Lock()
+    errors = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(OPS_PER_THREAD):
+                picked = rng.sample(all_ids, 3)
+                op = rng.random()
+                if op < 0.45:
+                    store.trash_recipes(picked)
+                elif op < 0.9:
+                    store.restore_recipes(picked)
+                else:
+                    done, _ = store.purge_recipes(picked[:1])
+                    with purged_lock:
+                        purged.update(r['id'] for r in done)
+        except Exception as e:  # noqa: BLE001 - מועבר לת'רד הראשי
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(N_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+
+    with store._compact_lock, store.locked():
+        live, trash = store.records(RECIPES_FILE), store.records(TRASH_FILE)
+        live_ids = [r['id'] for r in live.items]
+        trash_ids = [r['id'] for r in trash.items]
+
+        # כל מזהה פעם אחת בדיוק: בספרייה, בפח, או נמחק סופית
+        assert len(live_ids) + len(trash_ids) + len(purged) == N_RECIPES
+        assert set(live_ids) | set(trash_ids) | purged == set(all_ids)
+        assert all('deleted_at' in r for r in trash.items)
+        assert not any('deleted_at' in r for r in live.items)
+
+        assert live.positions() == {rid: pos for pos, rid in enumerate(live_ids)}
+        assert trash.positions() == {rid: pos for pos, rid in enumerate(trash_ids)}
+        for name, (build, _, _) in RECIPE_INDEXES.items():
+            assert _non_empty(live.index(name)) == _non_empty(build(live.items)), name
+
+    # מה שבדיסק (snapshot + יומן) זהה למה שבזיכרון
+    fresh = DataStore()
+    disk_live, _ = fresh.load(RECIPES_FILE, [])
+    disk_trash, _ = fresh.load(TRASH_FILE, [])
+    assert sorted(r['id'] for r in disk_live) == sorted(live_ids)
+    assert sorted(r['id'] for r in disk_trash) == sorted(trash_ids)
+
+
+def test_missing_ids_are_skipped(store):
+    moved, _ = store.trash_recipes(["r1", "r1", "nope"])
+    assert [r['id'] for r in moved] == ["r1"]
+    restored, _ = store.restore_recipes(["r1", "r2"])
+    assert [r['id'] for r in restored] == ["r1"]
+    updated, _ = store.update_recipes([make_recipe(10_000)])
+    assert updated == []
+
+
+def test_journal_records_from_another_process_are_replayed(tmp_path, monkeypatch):
+    # שני DataStore על אותה תיקייה מתנהגים כמו שני תהליכים: כל אחד עם העותק שלו בזיכרון
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(recipe_core, "PERSISTENCE_MODE", "journal")
+    save_json(RECIPES_FILE, [make_recipe(i) for i in range(10)])
+    save_json(TRASH_FILE, [])
+    mine, other = DataStore(), DataStore()
+    for store in (mine, other):
+        store.load(RECIPES_FILE, [])
+        store.load(TRASH_FILE, [])
+    with mine.locked():
+        records = mine.records(RECIPES_FILE)
+        for name in RECIPE_INDEXES:
+            records.index(name)
+    _, version = mine.load(RECIPES_FILE, [])
+
+    other.add_recipes([make_recipe(100)])
+    other.trash_recipes(["r3"])
+    other.update_recipes([dict(make_recipe(5), name="שונה בתהליך אחר")])
+
+    # ה-snapshot לא השתנה, רק היומן
+    data, new_version = mine.load(RECIPES_FILE, [])
+    assert new_version > version
+    assert [r['id'] for r in data] == [r['id'] for r in other.load(RECIPES_FILE, [])[0]]
+    with mine.locked():
+        # העדכון נעשה על אותה רשימה ועל אותם אינדקסים, בלי טעינה מחדש
+        assert mine.records(RECIPES_FILE) is records
+        assert records.get("r5")['name'] == "שונה בתהליך אחר"
+        for name, (build, _, _) in RECIPE_INDEXES.items():
+            assert _non_empty(records.index(name)) == _non_empty(build(records.items)), name
+
+    # שינויים דרך המאגר הזה רואים את מה שהתהליך האחר כתב, בלי טעינה מפורשת
+    other.restore_recipes(["r3"])
+    updated, _ = mine.update_recipes([dict(make_recipe(100), name="עודכן")])
+    assert [r['id'] for r in updated] == ["r100"]
+    restored_again, _ = mine.trash_recipes(["r3"])
+    assert [r['id'] for r in restored_again] == ["r3"]
+
+    # שמירה מלאה (דחיסה מיידית) לא מוחקת רשומות של התהליך האחר שעוד לא נקראו
+    other.add_recipes([make_recipe(200)])
+    with mine.locked():
+        trash_items = list(mine.records(TRASH_FILE).items)
+    mine.save(TRASH_FILE, trash_items)
+    fresh = DataStore()
+    fresh_recipes, _ = fresh.load(RECIPES_FILE, [])
+    fresh_trash, _ = fresh.load(TRASH_FILE, [])
+    assert {"r100", "r200", "r5"} <= {r['id'] for r in fresh_recipes}
+    assert [r['id'] for r in fresh_trash] == ["r3"]
+    assert next(r for r in fresh_recipes if r['id'] == "r100")['name'] == "עודכן"
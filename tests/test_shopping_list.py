@@ -0,0 +1,108 @@
+"""
+רשימת הקניות המצטברת מול לולאה פשוטה על השורות: המרת יחידות לגרמים / מ''ל, מצרכי "יחידה",
+יחידות שאי אפשר להמיר, ומכפיל המנות של כל מתכון.
+"""
+import random
+
+import pytest
+
+from recipe_core import (SHOPPING_COLUMNS, WEIGHT_CONVERTER, build_shopping_list, shopping_list_csv,
+                         shopping_list_text)
+
+DB = {
+    "קמח": {"vals": [364, 10, 76, 1], "measure_type": "100g"},
+    "חלב": {"vals": [60, 3.2, 4.7, 3], "measure_type": "100g"},
+    "שמן זית": {"vals": [882, 0, 0, 98], "measure_type": "100g"},
+    "ביצה": {"vals": [86, 7.5, 0.6, 6], "measure_type": "unit"},
+    "פיתה": {"vals": [260, 9, 52, 1.5], "measure_type": "unit"},
+}
+NAMES = list(DB) + ["מלח", "כמון", ""]
+UNITS = ["גרם", "מ''ל", "כף", "כפית", "יחידה", "כוס", "קורט"]
+
+
+def line(amount, unit, name):
+    return {"amount": amount, "unit": unit, "ingredient": name}
+
+
+def expected_list(items, ingredients_db):
+    """הדרך הפשוטה: שורה אחרי שורה למילון (מצרך, יחידה) -> כמות."""
+    converted = []
+    for pos, (recipe, servings) in enumerate(items):
+        for ing in recipe["ingredients"]:
+            name, unit, amount = ing["ingredient"], ing["unit"], ing["amount"] * servings
+            is_unit = ingredients_db.get(name, {}).get("measure_type") == "unit"
+            if not is_unit and unit in WEIGHT_CONVERTER:
+                converted.append((pos, name, "גרם", amount * WEIGHT_CONVERTER[unit], unit))
+            else:
+                converted.append((pos, name, unit, amount, None))
+    # מצרך שכל השורות הניתנות להמרה שלו במ''ל נשאר במ''ל
+    ml_names = {name for _, name, _, _, original in converted if original == "מ''ל"}
+    ml_names -= {name for _, name, _, _, original in converted if original not in (None, "מ''ל")}
+
+    totals, recipes = {}, {}
+    for pos, name, unit, amount, original in converted:
+        if not name:
+            continue
+        if original is not None and name in ml_names:
+            unit = "מ''ל"
+        totals[(name, unit)] = totals.get((name, unit), 0.0) + amount
+        recipes.setdefault((name, unit), set()).add(pos)
+    return [(name, round(totals[key], 2), unit, len(recipes[key]))
+            for key in sorted(totals) for name, unit in [key]]
+
+
+def rows(shopping):
+    assert list(shopping.columns) == SHOPPING_COLUMNS
+    return [(name, float(amount), unit, int(count)) for name, amount, unit, count in shopping.itertuples(index=False)]
+
+
+def test_groups_units_and_scales_servings():
+    omelette = {"ingredients": [line(2, "יחידה", "ביצה"), line(1, "כף", "שמן זית"), line(1, "קורט", "מלח")]}
+    pancakes = {"ingredients": [line(200, "גרם", "קמח"), line(2, "כפות", "קמח"), line(250, "מ''ל", "חלב"),
+                                line(1, "יחידה", "ביצה"), line(1, "כפית", "שמן זית"), line(2, "קורט", "מלח")]}
+    shakshuka = {"ingredients": [line(4, "יחידה", "ביצה"), line(2, "יחידה", "פיתה"), line(50, "מ''ל", "חלב")]}
+    shopping = build_shopping_list([(omelette, 2), (pancakes, 0.5), (shakshuka, 1)], DB)
+    assert rows(shopping) == [
+        # ביצה היא מצרך "unit": 2*2 + 1*0.5 + 4*1
+        ("ביצה", 8.5, "יחידה", 3),
+        # כל השורות של חלב במ''ל, ולכן הוא נשאר במ''ל: 250*0.5 + 50
+        ("חלב", 175.0, "מ''ל", 2),
+        ("מלח", 3.0, "קורט", 2),
+        ("פיתה", 2.0, "יחידה", 1),
+        ("קמח", 100.0, "גרם", 1),
+        # "כפות" אינה ב-WEIGHT_CONVERTER ונשארת בנפרד
+        ("קמח", 1.0, "כפות", 1),
+        # כף וכפית מומרות לגרמים: 15*2 + 5*0.5
+        ("שמן זית", 32.5, "גרם", 2),
+    ]
+    assert shopping_list_text(shopping).splitlines()[:2] == ["☐ 8.5 יחידה ביצה", "☐ 175 מ''ל חלב"]
+    csv_bytes = shopping_list_csv(shopping)
+    assert csv_bytes.startswith(b"\xef\xbb\xbf")
+    assert csv_bytes.decode("utf-8-sig").splitlines()[0] == ",".join(SHOPPING_COLUMNS)
+
+
+def test_same_recipe_twice_counts_twice():
+    soup = {"ingredients": [line(100, "גרם", "קמח")]}
+    assert rows(build_shopping_list([(soup, 1), (soup, 2)], DB)) == [("קמח", 300.0, "גרם", 2)]
+
+
+def test_mixed_ml_and_spoons_go_to_grams():
+    recipe = {"ingredients": [line(200, "מ''ל", "חלב"), line(2, "כף", "חלב")]}
+    assert rows(build_shopping_list([(recipe, 1)], DB)) == [("חלב", 230.0, "גרם", 1)]
+
+
+def test_empty():
+    for items in ([], [({"ingredients": []}, 1)], [({}, 2)]):
+        shopping = build_shopping_list(items, DB)
+        assert shopping.empty and list(shopping.columns) == SHOPPING_COLUMNS
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_loop(seed):
+    rng = random.Random(seed)
+    items = []
+    for _ in range(rng.randint(1, 30)):
+        recipe = {"ingredients": [line(rng.choice([0, 0.5, 1, 2, 3.3, 100, 250]), rng.choice(UNITS), rng.choice(NAMES))
+                                  for _ in range(rng.randint(0, 8))]}
+        items.append((recipe, rng.choice([0.5, 1, 1.5, 2, 3])))
+    assert rows(build_shopping_list(items, DB)) == expected_list(items, DB)
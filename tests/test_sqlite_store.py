@@ -0,0 +1,42 @@
+"""
+טווחי המאקרו בשאילתת SQLite נותנים את אותם מתכונים כמו הסינון על המערכים הממוינים
+(כולל מתכונים בלי ערך או עם ערך לא מספרי, שנחשבים 0).
+"""
+import random
+
+import pytest
+
+from recipe_core import build_macro_index, build_recipe_summary, macro_range_positions
+from sqlite_store import MACRO_COLUMNS, SqliteStore
+
+
+def make_recipe(i, rng):
+    recipe = {"id": f"r{i}", "name": f"מתכון {i}", "category": "ערב", "ingredients": []}
+    for column in MACRO_COLUMNS:
+        recipe[column] = rng.choice([None, "", "abc", 0, -5, rng.randint(0, 800), rng.random() * 60])
+        if recipe[column] is None:
+            del recipe[column]
+    return recipe
+
+
+@pytest.fixture
+def library(tmp_path):
+    rng = random.Random(7)
+    recipes = [make_recipe(i, rng) for i in range(300)]
+    store = SqliteStore(str(tmp_path / "recipes.db"))
+    store.save("recipes", recipes)
+    return store, recipes, build_macro_index(build_recipe_summary(recipes))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_sql_ranges_match_macro_index(library, seed):
+    store, recipes, index = library
+    rng = random.Random(seed)
+    ranges = {}
+    for column in rng.sample(MACRO_COLUMNS, rng.randint(1, len(MACRO_COLUMNS))):
+        low = rng.choice([None, -10, 0, 5, 30, 200])
+        high = rng.choice([None, -1, 0, 20, 50, 600])
+        ranges[column] = (low, high)
+    positions = macro_range_positions(index, ranges)
+    expected = [recipes[p]["id"] for p in sorted(positions)]
+    assert store.query_recipe_ids(ranges=ranges) == expected
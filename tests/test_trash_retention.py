@@ -0,0 +1,101 @@
+"""
+מדיניות השמירה בפח: trash_expired לפי גיל ולפי מספר פריטים (כולל פריטים ישנים בלי deleted_at),
+ו-enforce_trash_retention שמוחק אותם סופית כשהאפליקציה נפתחת.
+"""
+import os
+import time
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import recipe_core
+from recipe_core import DataStore, RECIPES_FILE, TRASH_FILE, save_json, trash_expired, trash_order
+
+DAY = 24 * 3600
+NOW = 1_700_000_000.0
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def item(recipe_id, age_days=None):
+    recipe = {"id": recipe_id, "name": recipe_id, "ingredients": []}
+    if age_days is not None:
+        recipe["deleted_at"] = NOW - age_days * DAY
+    return recipe
+
+
+@pytest.mark.parametrize("trash, max_age, max_items, expected", [
+    ([], 30 * DAY, 10, []),
+    # ישן מהגבול נמחק, חדש ממנו נשאר
+    ([item("old", 31), item("new", 29), item("fresh", 0)], 30 * DAY, None, ["old"]),
+    ([item("a", 30.001), item("b", 29.999)], 30 * DAY, None, ["a"]),
+    # בלי deleted_at (מלפני שנשמר זמן המחיקה) או deleted_at ריק - לא פג לפי גיל
+    ([item("legacy"), dict(item("none"), deleted_at=None), item("old", 400)], 30 * DAY, None, ["old"]),
+    ([item("old", 400), item("new", 1)], None, None, []),
+    # מעבר ל-max_items נמחקים הישנים ביותר, והפריט בלי זמן נחשב הישן מכולם
+    ([item("d3", 3), item("legacy"), item("d1", 1), item("d2", 2)], None, 2, ["d3", "legacy"]),
+    ([item("d3", 3), item("d1", 1)], None, 2, []),
+    ([item("d1", 1), item("d2", 2)], None, 0, ["d1", "d2"]),
+    # שני הכללים יחד: איחוד, בסדר הפח
+    ([item("old", 40), item("d1", 1), item("d2", 2), item("d3", 3), item("legacy")], 30 * DAY, 2,
+     ["old", "d3", "legacy"]),
+])
+def test_trash_expired(trash, max_age, max_items, expected):
+    assert trash_expired(trash, max_age, max_items, now=NOW) == expected
+
+
+def test_trash_expired_ties_keep_list_order():
+    trash = [item(f"r{i}", 5) for i in range(5)]
+    assert trash_expired(trash, max_items=3, now=NOW) == ["r3", "r4"]
+    assert list(trash_order([0, 5, 5, 0, 7])) == [4, 1, 2, 0, 3]
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # המאגר המשותף של האפליקציה (st.cache_resource) נבנה מחדש מהתיקייה של הבדיקה
+    st.cache_resource.clear()
+    yield tmp_path
+    st.cache_resource.clear()
+
+
+def run_app():
+    at = AppTest.from_file(MAIN, default_timeout=60).run()
+    assert not at.exception
+    return at
+
+
+def stored_trash_ids():
+    store = DataStore()
+    store.load(RECIPES_FILE, [])
+    return sorted(recipe["id"] for recipe in store.load(TRASH_FILE, [])[0])
+
+
+@pytest.mark.parametrize("mode", ["journal", "snapshot"])
+def test_enforce_trash_retention_on_open(library, monkeypatch, mode):
+    monkeypatch.setattr(recipe_core, "PERSISTENCE_MODE", mode)
+    monkeypatch.setattr(recipe_core, "TRASH_RETENTION_DAYS", 30)
+    monkeypatch.setattr(recipe_core, "TRASH_MAX_ITEMS", 3)
+    now = time.time()
+    trash = [dict(item("old"), deleted_at=now - 31 * DAY), dict(item("recent"), deleted_at=now - 29 * DAY),
+             item("legacy")]
+    trash += [dict(item(f"new{i}"), deleted_at=now - i * 60) for i in range(2)]
+    save_json(RECIPES_FILE, [item("kept")])
+    save_json(TRASH_FILE, trash)
+
+    run_app()
+    # "old" פג לפי גיל, ומתוך ארבעת הנותרים נמחק הישן ביותר - הפריט בלי זמן מחיקה
+    assert stored_trash_ids() == ["new0", "new1", "recent"]
+
+    # כשאין מה למחוק - שום דבר לא משתנה
+    run_app()
+    assert stored_trash_ids() == ["new0", "new1", "recent"]
+
+
+def test_retention_disabled(library, monkeypatch):
+    monkeypatch.setattr(recipe_core, "TRASH_RETENTION_DAYS", None)
+    monkeypatch.setattr(recipe_core, "TRASH_MAX_ITEMS", None)
+    save_json(RECIPES_FILE, [])
+    save_json(TRASH_FILE, [dict(item("old"), deleted_at=time.time() - 400 * DAY), item("legacy")])
+    run_app()
+    assert stored_trash_ids() == ["legacy", "old"]